@@ -9,6 +9,64 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     RESTX_MASK_SWAGGER = False
     AZURE_STORAGE_BLOB_NAME_FOR_STAC_ITEMS = os.getenv('AZURE_STORAGE_BLOB_NAME_FOR_STAC_ITEMS', "stac-items")
+    PUBLIC_CATALOGS_LOOKUP_API = os.getenv('PUBLIC_CATALOGS_LOOKUP_API', "https://stacindex.org/api/catalogs")
+    PUBLIC_CATALOGS_SYNC_WORKERS = int(os.getenv('PUBLIC_CATALOGS_SYNC_WORKERS', 8))
+    PUBLIC_CATALOGS_SYNC_PER_HOST_LIMIT = int(os.getenv('PUBLIC_CATALOGS_SYNC_PER_HOST_LIMIT', 8))
+    PUBLIC_CATALOGS_SYNC_TIMEOUT = int(os.getenv('PUBLIC_CATALOGS_SYNC_TIMEOUT', 30))
+    PUBLIC_CATALOGS_SYNC_PRUNE_COLLECTIONS = os.getenv('PUBLIC_CATALOGS_SYNC_PRUNE_COLLECTIONS',
+                                                       "false").lower() == "true"
+    PUBLIC_CATALOGS_PROBE_WORKERS = int(os.getenv('PUBLIC_CATALOGS_PROBE_WORKERS', 8))
+    PUBLIC_CATALOGS_PROBE_TIMEOUT = int(os.getenv('PUBLIC_CATALOGS_PROBE_TIMEOUT', 10))
+    PAGINATION_DEFAULT_LIMIT = int(os.getenv('PAGINATION_DEFAULT_LIMIT', 100))
+    PAGINATION_MAX_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', 1000))
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 32))
+    HTTP_MAX_UPSTREAMS = int(os.getenv('HTTP_MAX_UPSTREAMS', 64))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 3))
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.3))
+    REDIS_URL = os.getenv('REDIS_URL', "redis://localhost:6379/0")
+    STAC_CACHE_BACKEND = os.getenv('STAC_CACHE_BACKEND', "local")
+    STAC_CACHE_MAX_ENTRIES = int(os.getenv('STAC_CACHE_MAX_ENTRIES', 1024))
+    STAC_CACHE_TTL_COLLECTIONS = int(os.getenv('STAC_CACHE_TTL_COLLECTIONS', 30))
+    STAC_CACHE_TTL_COLLECTION = int(os.getenv('STAC_CACHE_TTL_COLLECTION', 60))
+    STAC_CACHE_TTL_ITEMS = int(os.getenv('STAC_CACHE_TTL_ITEMS', 30))
+    STAC_CACHE_TTL_ITEM = int(os.getenv('STAC_CACHE_TTL_ITEM', 300))
+    STAC_SEARCH_MAX_ITEMS = int(os.getenv('STAC_SEARCH_MAX_ITEMS', 10000))
+    STAC_BULK_ITEMS_CHUNK_SIZE = int(os.getenv('STAC_BULK_ITEMS_CHUNK_SIZE', 500))
+    STAC_BULK_ITEMS_WORKERS = int(os.getenv('STAC_BULK_ITEMS_WORKERS', 8))
+    STAC_GENERATOR_WORKERS = int(os.getenv('STAC_GENERATOR_WORKERS', 0))
+    STAC_PROXY_CHUNK_SIZE = int(os.getenv('STAC_PROXY_CHUNK_SIZE', 64 * 1024))
+    INGESTION_QUEUE_NAME = os.getenv('INGESTION_QUEUE_NAME', "ingestion")
+    INGESTION_PRIORITY_QUEUE_NAME = os.getenv('INGESTION_PRIORITY_QUEUE_NAME', "ingestion_priority")
+    INGESTION_MAX_CONCURRENCY_PER_SOURCE = int(os.getenv('INGESTION_MAX_CONCURRENCY_PER_SOURCE', 2))
+    INGESTION_SOURCE_BUSY_DELAY = int(os.getenv('INGESTION_SOURCE_BUSY_DELAY', 30))
+    INGESTION_SOURCE_RATE_PER_MINUTE = float(os.getenv('INGESTION_SOURCE_RATE_PER_MINUTE', 60))
+    INGESTION_SOURCE_BURST = int(os.getenv('INGESTION_SOURCE_BURST', 2))
+    INGESTION_JOB_RETRIES = int(os.getenv('INGESTION_JOB_RETRIES', 3))
+    INGESTION_RETRY_INTERVALS = [int(i) for i in os.getenv('INGESTION_RETRY_INTERVALS', "60,300,900").split(",")]
+    INGESTION_JOB_TIMEOUT = int(os.getenv('INGESTION_JOB_TIMEOUT', 6 * 60 * 60))
+    INGESTION_RECOVERY_GRACE_SECONDS = int(os.getenv('INGESTION_RECOVERY_GRACE_SECONDS', 300))
+    INGESTION_RECOVERY_LOCK_TTL = int(os.getenv('INGESTION_RECOVERY_LOCK_TTL', 600))
+    INGESTION_DEDUP_WINDOW = int(os.getenv('INGESTION_DEDUP_WINDOW', 60 * 60))
+    INGESTION_DISPATCH_BATCH_SIZE = int(os.getenv('INGESTION_DISPATCH_BATCH_SIZE', 100))
+    INGESTION_PLAN_MAX_COLLECTIONS_PER_REQUEST = int(os.getenv('INGESTION_PLAN_MAX_COLLECTIONS_PER_REQUEST', 10))
+    INGESTION_PLAN_MERGE_SLACK = float(os.getenv('INGESTION_PLAN_MERGE_SLACK', 0))
+    REFRESH_SCHEDULER_POLL_INTERVAL = int(os.getenv('REFRESH_SCHEDULER_POLL_INTERVAL', 60))
+    REFRESH_SCHEDULE_JITTER = int(os.getenv('REFRESH_SCHEDULE_JITTER', 300))
+    REFRESH_UPSTREAM_WORKERS = int(os.getenv('REFRESH_UPSTREAM_WORKERS', 4))
+    PRIVATE_COLLECTION_WRITES_VIA_OUTBOX = os.getenv('PRIVATE_COLLECTION_WRITES_VIA_OUTBOX',
+                                                     "false").lower() == "true"
+    STAC_OUTBOX_BATCH_SIZE = int(os.getenv('STAC_OUTBOX_BATCH_SIZE', 50))
+    STAC_OUTBOX_WORKERS = int(os.getenv('STAC_OUTBOX_WORKERS', 8))
+    STAC_OUTBOX_POLL_INTERVAL = float(os.getenv('STAC_OUTBOX_POLL_INTERVAL', 1))
+    STAC_OUTBOX_LEASE_SECONDS = int(os.getenv('STAC_OUTBOX_LEASE_SECONDS', 300))
+    STAC_OUTBOX_MAX_ATTEMPTS = int(os.getenv('STAC_OUTBOX_MAX_ATTEMPTS', 10))
+    STAC_OUTBOX_BACKOFF = float(os.getenv('STAC_OUTBOX_BACKOFF', 5))
+    STATUS_EVENTS_HEARTBEAT = float(os.getenv('STATUS_EVENTS_HEARTBEAT', 15))
+    STATUS_RETENTION_DAYS = int(os.getenv('STATUS_RETENTION_DAYS', 90))
+    STATUS_RETENTION_BATCH_SIZE = int(os.getenv('STATUS_RETENTION_BATCH_SIZE', 5000))
 
 
 class DevelopmentConfig(Config):
@@ -5,7 +5,9 @@ from flask_restx import Resource
 
 from ..custom_exceptions import *
 from ..service import private_catalog_service
+from ..service import stac_outbox_service
 from ..service import stac_service
+from ..util import pagination
 from ..util.dto import PrivateCatalogDto
 
 api = PrivateCatalogDto.api
@@ -15,12 +17,13 @@ collections = PrivateCatalogDto.collection
 @api.route("/collections/search/")
 @api.expect(PrivateCatalogDto.collection_search, validate=True)
 class Collections(Resource):
-    @api.doc(description='Search for collections in all catalogs')
+    @api.doc(description='Search for collections in all catalogs', params={'geometry_format': 'Format of the spatial extents: wkt (default) or geojson'})
     @api.response(200, 'Success')
     def post(self):
         spatial_extent: list[float] = request.json['bbox']
         temporal_extent: str = request.json['datetime']
-        return (private_catalog_service.search_collections(spatial_extent, temporal_extent)), 200
+        geojson = request.args.get('geometry_format', 'wkt').lower() == 'geojson'
+        return (private_catalog_service.search_collections(spatial_extent, temporal_extent, geojson)), 200
 
 
 @api.route("/collections/")
@@ -28,10 +31,12 @@ class CollectionsList(Resource):
     @api.doc(description="Create a new private collection")
     @api.expect(PrivateCatalogDto.collection_dto, validate=True)
     @api.response(200, "Success")
+    @api.response(202, "Stored, the STAC API write is pending, see /operations/<operation_id>/")
     @api.response(400, "Validation Error")
     def post(self):
         try:
-            return private_catalog_service.add_collection(request.json)
+            return private_catalog_service.add_collection(request.json), \
+                202 if private_catalog_service.writes_via_outbox() else 200
         except PrivateCollectionAlreadyExistsError:
             return {
                        "message": "Collection with this ID already exists",
@@ -44,12 +49,14 @@ class CollectionsList(Resource):
     @api.doc(description="Update a private collection")
     @api.expect(PrivateCatalogDto.collection_dto, validate=True)
     @api.response(200, "Success")
+    @api.response(202, "Stored, the STAC API write is pending, see /operations/<operation_id>/")
     @api.response(400, "Validation Error")
     @api.response(404, "Collection not found")
     @api.response("4xx", "Stac API reported error")
     def put(self):
         try:
-            return private_catalog_service.update_collection(request.json), 200
+            return private_catalog_service.update_collection(request.json), \
+                202 if private_catalog_service.writes_via_outbox() else 200
         except PrivateCollectionDoesNotExistError:
             return {
                        "message": "Collection with this ID not found",
@@ -59,24 +66,59 @@ class CollectionsList(Resource):
                        "message": f"Error converting timestamp: {e}",
                    }, 400
 
+    @api.doc(description="Get all private collections",
+             params={'geometry_format': 'Format of the spatial extents: wkt (default) or geojson',
+                     'limit': 'Page size, enables keyset pagination',
+                     'next': 'Token of the next page, as returned with the previous page',
+                     'format': 'ndjson to stream the rows as newline delimited JSON'})
+    @api.response(200, 'Success')
+    @api.response(400, 'Invalid pagination arguments')
     def get(self):
-        return private_catalog_service.get_all_collections(), 200
+        geojson = request.args.get('geometry_format', 'wkt').lower() == 'geojson'
+        try:
+            limit, next_token, ndjson = pagination.parse_pagination_arguments(request.args)
+            if ndjson:
+                return pagination.ndjson_response(
+                    private_catalog_service.iterate_collections(limit, next_token, geojson))
+            if limit is not None or next_token is not None:
+                return private_catalog_service.get_collections_page(limit, next_token, geojson), 200
+            return private_catalog_service.get_all_collections(geojson), 200
+        except InvalidPaginationArgumentsError as e:
+            return {
+                       "message": str(e),
+                   }, 400
 
 
 @api.route("/collections/<collection_id>/")
 class Collection(Resource):
     @api.doc(description="Remove private collection by id")
     @api.response(200, "Collection removed successfully.")
+    @api.response(202, "Removed, the STAC API write is pending, see /operations/<operation_id>/")
     @api.response(404, "Collection not found")
     def delete(self, collection_id: str) -> Tuple[Dict[str, str], int]:
         try:
-            return private_catalog_service.remove_collection(collection_id), 200
+            return private_catalog_service.remove_collection(collection_id), \
+                202 if private_catalog_service.writes_via_outbox() else 200
         except PrivateCollectionDoesNotExistError:
             return {
                        "message": "Collection with this ID not found",
                    }, 404
 
 
+@api.route("/operations/<int:operation_id>/")
+class Operation(Resource):
+    @api.doc(description="Get the delivery to the STAC API of a collection write")
+    @api.response(200, "Success")
+    @api.response(404, "Operation not found")
+    def get(self, operation_id: int):
+        try:
+            return stac_outbox_service.get_stac_outbox_operation_by_id(operation_id), 200
+        except StacOutboxOperationDoesNotExistError:
+            return {
+                       "message": "Operation with this ID not found",
+                   }, 404
+
+
 @api.route("/collections/<collection_id>/items/")
 class CollectionItems(Resource):
 
@@ -103,6 +145,29 @@ class CollectionItems(Resource):
                    }, 400
 
 
+@api.route("/collections/<collection_id>/items/bulk/")
+class CollectionItemsBulk(Resource):
+
+    @api.doc(description="Add many items to private collection, sent as a FeatureCollection or as newline "
+                         "delimited JSON. The result of every item is streamed back as newline delimited JSON.",
+             params={'format': 'ndjson when the items are sent as newline delimited JSON, which is also '
+                               'detected from the application/x-ndjson content type'})
+    @api.response(200, "Success, see the result of every item")
+    @api.response(400, "Items are neither a FeatureCollection nor newline delimited JSON")
+    def post(self, collection_id: str):
+        if request.mimetype == pagination.NDJSON_MIMETYPE or request.args.get('format', '').lower() == 'ndjson':
+            items = pagination.iterate_ndjson(request.stream)
+        else:
+            feature_collection = request.get_json(silent=True)
+            if not isinstance(feature_collection, dict) or feature_collection.get("type") != "FeatureCollection" \
+                    or not isinstance(feature_collection.get("features"), list):
+                return {
+                           "message": "Items must be sent as a FeatureCollection or as newline delimited JSON",
+                       }, 400
+            items = feature_collection["features"]
+        return pagination.ndjson_response(stac_service.add_items_to_collection_on_stac_api(collection_id, items))
+
+
 @api.route("/collections/<collection_id>/items/<item_id>/")
 class CollectionItem(Resource):
 
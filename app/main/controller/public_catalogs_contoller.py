@@ -3,6 +3,8 @@ from flask_restx import Resource
 
 from ..custom_exceptions import *
 from ..service import public_catalogs_service
+from ..service import refresh_schedule_service
+from ..util import pagination
 from ..util.dto import PublicCatalogsDto
 
 api = PublicCatalogsDto.api
@@ -48,47 +50,73 @@ class PublicCatalogs(Resource):
 
 @api.route('/sync/')
 class PublicCatalogsUpdate(Resource):
-    @api.doc(description='Get all public catalogs and update them')
+    @api.doc(description='Get all public catalogs and update them',
+             params={'prune': 'Remove stored collections which disappeared upstream (true/false)',
+                     'force': 'Ignore stored fingerprints and rewrite everything (true/false)'})
     @api.response(200, 'Success')
     def get(self):
-        public_catalogs_service.store_publicly_available_catalogs()
+        prune = request.args.get('prune')
+        if prune is not None:
+            prune = prune.lower() == 'true'
+        force = request.args.get('force', 'false').lower() == 'true'
+        sync_run_id = public_catalogs_service.store_publicly_available_catalogs(prune, force)
         return {
-                   'message': "Sync operation started"
+                   'message': "Sync operation started",
+                   'sync_run_id': sync_run_id
                }, 200
 
 
 @api.route('/collections/')
 class PublicCatalogsCollections(Resource):
-    @api.doc("Get all public collections stored in the database")
+    @api.doc("Get all public collections stored in the database",
+             params={'geometry_format': 'Format of the spatial extents: wkt (default) or geojson',
+                     'limit': 'Page size, enables keyset pagination',
+                     'next': 'Token of the next page, as returned with the previous page',
+                     'format': 'ndjson to stream the rows as newline delimited JSON'})
     @api.response(200, 'Success')
+    @api.response(400, 'Invalid pagination arguments')
     def get(self):
-        return public_catalogs_service.get_all_stored_public_collections_as_list_of_dict()
+        geojson = request.args.get('geometry_format', 'wkt').lower() == 'geojson'
+        try:
+            limit, next_token, ndjson = pagination.parse_pagination_arguments(request.args)
+            if ndjson:
+                return pagination.ndjson_response(
+                    public_catalogs_service.iterate_public_collections(limit, next_token, geojson=geojson))
+            if limit is not None or next_token is not None:
+                return public_catalogs_service.get_public_collections_page(limit, next_token, geojson=geojson), 200
+            return public_catalogs_service.get_all_stored_public_collections_as_list_of_dict(geojson)
+        except InvalidPaginationArgumentsError as e:
+            return {
+                       'message': str(e),
+                   }, 400
 
 
 @api.route("/collections/search/")
 class PublicCatalogsCollections(Resource):
-    @api.doc(description='Get all collections of all public catalogs')
+    @api.doc(description='Get all collections of all public catalogs', params={'geometry_format': 'Format of the spatial extents: wkt (default) or geojson'})
     @api.response(200, 'Success')
     @api.expect(PublicCatalogsDto.collection_search, validate=True)
     def post(self):
         spatial_extent: list[float] = request.json['bbox']
         temporal_extent: str = request.json['datetime']
+        geojson = request.args.get('geometry_format', 'wkt').lower() == 'geojson'
         return (public_catalogs_service.search_collections(spatial_extent, temporal_extent,
-                                                           )), 200
+                                                           geojson=geojson)), 200
 
 
 @api.route("/<int:public_catalog_id>/collections/search/")
 class SpecificPublicCatalogCollections(Resource):
-    @api.doc(description="Get all collections for specified public catalog")
+    @api.doc(description="Get all collections for specified public catalog", params={'geometry_format': 'Format of the spatial extents: wkt (default) or geojson'})
     @api.response(200, "Success")
     @api.response(404, "Not Found - Catalog does not exist")
     @api.expect(PublicCatalogsDto.collection_search, validate=True)
     def post(self, public_catalog_id):
         spatial_extent: list[float] = request.json['bbox']
         temporal_extent: str = request.json['datetime']
+        geojson = request.args.get('geometry_format', 'wkt').lower() == 'geojson'
         try:
             return (public_catalogs_service.search_collections(spatial_extent, temporal_extent,
-                                                               public_catalog_id)), 200
+                                                               public_catalog_id, geojson)), 200
         except CatalogDoesNotExistError:
             return {
                        'message': 'Catalog with this id does not exist',
@@ -111,12 +139,29 @@ class PublicCatalogLoadHistory(Resource):
 
 @api.route("/<int:public_catalog_id>/collections/")
 class PublicCatalogCollections(Resource):
-    @api.doc(description="Get all collections for specified public catalog")
+    @api.doc(description="Get all collections for specified public catalog",
+             params={'geometry_format': 'Format of the spatial extents: wkt (default) or geojson',
+                     'limit': 'Page size, enables keyset pagination',
+                     'next': 'Token of the next page, as returned with the previous page',
+                     'format': 'ndjson to stream the rows as newline delimited JSON'})
     @api.response(200, "Success")
+    @api.response(400, "Invalid pagination arguments")
     @api.response(404, "Not Found - Catalog does not exist")
     def get(self, public_catalog_id):
+        geojson = request.args.get('geometry_format', 'wkt').lower() == 'geojson'
         try:
-            return public_catalogs_service.get_collections_from_public_catalog_id(public_catalog_id), 200
+            limit, next_token, ndjson = pagination.parse_pagination_arguments(request.args)
+            if ndjson:
+                return pagination.ndjson_response(
+                    public_catalogs_service.iterate_public_collections(limit, next_token, public_catalog_id, geojson))
+            if limit is not None or next_token is not None:
+                return public_catalogs_service.get_public_collections_page(limit, next_token, public_catalog_id,
+                                                                           geojson), 200
+            return public_catalogs_service.get_collections_from_public_catalog_id(public_catalog_id, geojson), 200
+        except InvalidPaginationArgumentsError as e:
+            return {
+                       'message': str(e),
+                   }, 400
         except PublicCatalogDoesNotExistError:
             return {
                        'message': 'Catalog with this id does not exist',
@@ -266,3 +311,56 @@ class RunSearchParameters(Resource):
             return {
                        'message': 'Search param with this id does not exist',
                    }, 404
+
+
+@api.route('/schedules/')
+class RefreshSchedules(Resource):
+    @api.doc(description='Get all refresh schedules of stored search parameters')
+    def get(self):
+        return refresh_schedule_service.get_all_refresh_schedules()
+
+    @api.doc(description='Schedule the refresh of the stored search parameters of a public catalog, or of a '
+                         'single one of them')
+    @api.expect(PublicCatalogsDto.refresh_schedule, validate=True)
+    @api.response(201, 'Success')
+    @api.response(400, 'Invalid cron expression or scope')
+    @api.response(404, 'Public catalog or search parameters not found')
+    def post(self):
+        data = request.json
+        try:
+            return refresh_schedule_service.make_refresh_schedule(
+                data['cron'], data.get('public_catalog_id'), data.get('stored_search_parameters_id'),
+                data.get('window_seconds', 0), data.get('enabled', True)), 201
+        except (InvalidCronExpressionError, ValueError) as e:
+            return {'message': str(e)}, 400
+        except CatalogDoesNotExistError:
+            return {'message': 'Public catalog with specified id not found'}, 404
+        except StoredSearchParametersDoesNotExistError:
+            return {'message': 'Search param with this id does not exist'}, 404
+
+
+@api.route('/schedules/<int:schedule_id>/')
+class RefreshScheduleViaId(Resource):
+    @api.doc(description='Get a refresh schedule')
+    def get(self, schedule_id):
+        try:
+            return refresh_schedule_service.get_refresh_schedule_by_id(schedule_id), 200
+        except RefreshScheduleDoesNotExistError:
+            return {'message': 'No result found'}, 404
+
+    @api.doc(description='Delete a refresh schedule and its run history')
+    def delete(self, schedule_id):
+        try:
+            return refresh_schedule_service.remove_refresh_schedule(schedule_id), 200
+        except RefreshScheduleDoesNotExistError:
+            return {'message': 'No result found to delete'}, 404
+
+
+@api.route('/schedules/<int:schedule_id>/runs/')
+class RefreshScheduleRuns(Resource):
+    @api.doc(description='Get the run history of a refresh schedule, newest first')
+    def get(self, schedule_id):
+        try:
+            return refresh_schedule_service.get_refresh_runs(schedule_id), 200
+        except RefreshScheduleDoesNotExistError:
+            return {'message': 'No result found'}, 404
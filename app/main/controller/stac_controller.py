@@ -1,7 +1,9 @@
+from flask import request
 from flask_restx import Resource
 
 from ..service.stac_service import *
-from ..util.dto import StacDto
+from ..util.dto import StacDto, StacGeneratorDto
+from ..util.response_cache import cached_response, collection_scope
 
 api = StacDto.api
 
@@ -10,15 +12,59 @@ api = StacDto.api
 class CollectionsList(Resource):
     @api.doc(description="List all collections on the stac-api server")
     @api.response(200, "Success")
+    @api.response(304, "Not Modified")
+    @cached_response("collections", lambda: "collections")
     def get(self):
         return get_all_collections(), 200
 
 
+@api.route("/search/")
+class ItemSearch(Resource):
+    @api.doc(description="Search items across collections on the stac-api server, following its pages as the "
+                         "results are streamed",
+             params={'max_items': 'Maximum number of items, 0 for no limit',
+                     'aggregations': 'Comma separated aggregations: collection (counts per collection) and '
+                                     'datetime (temporal histogram)',
+                     'interval': 'Interval of the temporal histogram: year, month, day (default) or hour',
+                     'features': 'false to only return the aggregations',
+                     'format': 'ndjson to stream the items as newline delimited JSON'})
+    @api.expect(StacGeneratorDto.item_search)
+    @api.response(200, "Success")
+    @api.response(400, "Invalid search arguments")
+    @api.response(502, "Search failed on the stac-api server")
+    def post(self):
+        aggregations = [i.strip() for i in request.args.get('aggregations', '').split(',') if i.strip()]
+        try:
+            max_items = request.args.get('max_items')
+            if max_items is not None:
+                try:
+                    max_items = int(max_items)
+                except ValueError:
+                    raise InvalidSearchArgumentsError("max_items must be an integer")
+            result = search_items(request.json or {}, max_items, aggregations,
+                                  request.args.get('interval', 'day').lower(),
+                                  request.args.get('features', 'true').lower() == 'true',
+                                  request.args.get('format', '').lower() == 'ndjson')
+            if isinstance(result, dict):
+                return result, 200
+            return result
+        except InvalidSearchArgumentsError as e:
+            return {
+                       "message": str(e),
+                   }, 400
+        except StacSearchFailedError as e:
+            return {
+                       "message": str(e),
+                   }, 502
+
+
 @api.route("/<collection_id>/")
 class Collection(Resource):
     @api.doc(description="get_collection")
     @api.response(200, "Success")
+    @api.response(304, "Not Modified")
     @api.response(404, "Collection not found")
+    @cached_response("collection", lambda collection_id: collection_scope(collection_id))
     def get(self, collection_id: str):
         try:
             return get_collection_by_id(collection_id), 200
@@ -31,12 +77,23 @@ class Collection(Resource):
 @api.route("/<collection_id>/items/")
 class CollectionItems(Resource):
 
-    @api.doc(description="get_collection_items")
+    @api.doc(description="get_collection_items",
+             params={'limit': 'Page size, forwarded to the stac-api server',
+                     'token': 'Token of the page, as found in the next link of the previous page',
+                     'bbox': 'Bounding box filter, forwarded to the stac-api server',
+                     'datetime': 'Datetime filter, forwarded to the stac-api server',
+                     'stream': 'true to forward the page as it arrives, without caching it'})
     @api.response(200, "Success")
+    @api.response(304, "Not Modified")
     @api.response(404, "Collection not found")
+    # the links to other pages are rewritten to the host of the request
+    @cached_response("items", lambda collection_id: collection_scope(collection_id), per_host=True)
     def get(self, collection_id: str) -> Tuple[Dict[str, str], int]:
+        parameters = {k: request.args[k] for k in ITEMS_QUERY_PARAMETERS if k in request.args}
         try:
-            return get_items_by_collection_id(collection_id), 200
+            if request.args.get('stream', 'false').lower() == 'true':
+                return stream_items_by_collection_id(collection_id, parameters, request.base_url)
+            return get_items_by_collection_id(collection_id, parameters, request.base_url), 200
         except CollectionDoesNotExistError:
             return {
                        "message": "Collection with this ID not found",
@@ -50,6 +107,8 @@ class CollectionItem(Resource):
     @api.response(200, "Success")
     @api.response(404, "Collection not found")
     @api.response(404, "Item not found")
+    @api.response(304, "Not Modified")
+    @cached_response("item", lambda collection_id, item_id: collection_scope(collection_id))
     def get(self, collection_id: str,
             item_id: str) -> Tuple[Dict[str, str], int]:
         try:
@@ -3,7 +3,8 @@ import logging
 from flask import request
 from flask_restx import Resource
 
-from ..service.stac_generator_service import create_STAC_Item
+from ..service.stac_generator_service import create_STAC_Item, generate_STAC_Items
+from ..util import pagination
 from ..util.dto import StacGeneratorDto
 
 api = StacGeneratorDto.api
@@ -22,5 +23,30 @@ class StacGenerator(Resource):
             return create_STAC_Item(data["metadata"])
         except Exception as e:
             logging.error(e)
+            return {
+                       "message": f"{type(e).__name__}: {e}",
+                   }, 500
 
-        return None
+
+@api.route("/batch/")
+class StacGeneratorBatch(Resource):
+    @api.doc(description="Generate STAC items from many metadata documents, sent as a JSON array or as newline "
+                         "delimited JSON, over a pool of processes. The item, or the error, of every document is "
+                         "streamed back as newline delimited JSON.",
+             params={'format': 'ndjson when the documents are sent as newline delimited JSON, which is also '
+                               'detected from the application/x-ndjson content type',
+                     'order': 'input (default) to return the results in the order of the documents, completed '
+                              'to return them as they are generated'})
+    @api.response(200, "Success, see the result of every document")
+    @api.response(400, "Documents are neither a JSON array nor newline delimited JSON")
+    def post(self):
+        if request.mimetype == pagination.NDJSON_MIMETYPE or request.args.get('format', '').lower() == 'ndjson':
+            documents = pagination.iterate_ndjson(request.stream)
+        else:
+            documents = request.get_json(silent=True)
+            if not isinstance(documents, list):
+                return {
+                           "message": "Documents must be sent as a JSON array or as newline delimited JSON",
+                       }, 400
+        ordered = request.args.get('order', 'input').lower() != 'completed'
+        return pagination.ndjson_response(generate_STAC_Items(documents, ordered))
@@ -1,7 +1,11 @@
 import sqlalchemy
+from flask import request
 from flask_restx import Resource
 
+from ..custom_exceptions import InvalidPaginationArgumentsError
 from ..service import status_reporting_service
+from ..util import pagination
+from ..util import server_sent_events
 from ..util.dto import StatusReportingDto
 
 api = StatusReportingDto.api
@@ -9,9 +13,74 @@ api = StatusReportingDto.api
 
 @api.route('/loading_public_stac_records/')
 class StacIngestionStatus(Resource):
-    @api.doc(description='Get all statuses of stac ingestion statuses')
+    @api.doc(description='Get all statuses of stac ingestion statuses',
+             params={'limit': 'Page size, enables keyset pagination',
+                     'next': 'Token of the next page, as returned with the previous page',
+                     'format': 'ndjson to stream the rows as newline delimited JSON'})
     def get(self):
-        return status_reporting_service.get_all_stac_ingestion_statuses()
+        try:
+            limit, next_token, ndjson = pagination.parse_pagination_arguments(request.args)
+            if ndjson:
+                return pagination.ndjson_response(
+                    status_reporting_service.iterate_stac_ingestion_statuses(limit, next_token))
+            if limit is not None or next_token is not None:
+                return status_reporting_service.get_stac_ingestion_statuses_page(limit, next_token), 200
+            return status_reporting_service.get_all_stac_ingestion_statuses()
+        except InvalidPaginationArgumentsError as e:
+            return {'message': str(e)}, 400
+
+
+@api.route('/loading_public_stac_records/summary/')
+class StacIngestionSummary(Resource):
+    @api.doc(description='Get the totals of the stac ingestions of every source catalog: runs, failures, '
+                         'stored items, mean duration, queued and running ingestions')
+    def get(self):
+        return status_reporting_service.get_stac_ingestion_summary(), 200
+
+
+@api.route('/loading_public_stac_records/events/')
+class StacIngestionStatusEvents(Resource):
+    @api.doc(description='Stream the changes of stac ingestion statuses as Server-Sent Events, starting with '
+                         'the unfinished ingestions',
+             params={'status_id': 'Only stream the changes of this stac ingestion status'})
+    @api.response(404, 'No result found')
+    def get(self):
+        status_id = request.args.get('status_id', type=int)
+        try:
+            return server_sent_events.event_stream_response(
+                status_reporting_service.stream_stac_ingestion_statuses(status_id))
+        except AttributeError:
+            return {'message': 'No result found'}, 404
+
+
+@api.route('/loading_public_stac_records/<int:status_id>/progress/')
+class StacIngestionStatusProgress(Resource):
+    @api.doc(description='Report the progress of a running stac ingestion, called by the ingestion microservice '
+                         'with its callback_id')
+    @api.expect(StatusReportingDto.stac_ingestion_progress_post, validate=True)
+    @api.response(400, 'Invalid progress')
+    @api.response(404, 'No result found')
+    def post(self, status_id):
+        data = request.json
+
+        def is_count(value) -> bool:
+            return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+        counts = {name: data[name] for name in status_reporting_service.PROGRESS_COUNT_FIELDS
+                  if data.get(name) is not None}
+        lists = {name: data[name] for name in status_reporting_service.PROGRESS_LIST_FIELDS
+                 if data.get(name) is not None}
+        if not is_count(data.get('items_processed')) or \
+                (data.get('items_total') is not None and not is_count(data['items_total'])) or \
+                not all(is_count(value) for value in counts.values()):
+            return {'message': 'items_processed, items_total and the counts must be non-negative integers'}, 400
+        if not all(isinstance(value, list) and all(isinstance(i, str) for i in value) for value in lists.values()):
+            return {'message': 'Collections must be lists of collection ids'}, 400
+        try:
+            return status_reporting_service.report_stac_ingestion_progress(
+                status_id, data['items_processed'], data.get('items_total'), **counts, **lists), 200
+        except AttributeError:
+            return {'message': 'No result found'}, 404
 
 
 @api.route('/loading_public_stac_records/<string:status_id>/')
@@ -32,3 +101,21 @@ class StacIngestionStatusViaId(Resource):
                 status_id), 200
         except sqlalchemy.orm.exc.UnmappedInstanceError:
             return {'message': 'No result found to delete'}, 404
+
+
+@api.route('/public_catalogs_sync/')
+class PublicCatalogsSyncRuns(Resource):
+    @api.doc(description='Get all public catalogs sync runs, newest first')
+    def get(self):
+        return status_reporting_service.get_all_public_catalogs_sync_runs()
+
+
+@api.route('/public_catalogs_sync/<string:sync_run_id>/')
+class PublicCatalogsSyncRunViaId(Resource):
+    @api.doc(description='Get the progress of a public catalogs sync run via sync_run_id')
+    def get(self, sync_run_id):
+        try:
+            return status_reporting_service.get_public_catalogs_sync_run_by_id(
+                sync_run_id), 200
+        except AttributeError:
+            return {'message': 'No result found'}, 404
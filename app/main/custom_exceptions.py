@@ -64,3 +64,27 @@ class PrivateItemAlreadyExistsError(ItemAlreadyExistsError):
 
 class ItemDoesNotExistError(Error):
     pass
+
+
+class InvalidPaginationArgumentsError(Error):
+    pass
+
+
+class RefreshScheduleDoesNotExistError(Error):
+    pass
+
+
+class InvalidCronExpressionError(Error):
+    pass
+
+
+class StacOutboxOperationDoesNotExistError(Error):
+    pass
+
+
+class InvalidSearchArgumentsError(Error):
+    pass
+
+
+class StacSearchFailedError(Error):
+    pass
@@ -1,6 +1,9 @@
+import json
+
 import shapely
 from geoalchemy2 import Geometry
 from geoalchemy2.shape import to_shape
+from sqlalchemy import and_, func
 
 from .. import db
 
@@ -13,9 +16,59 @@ class Collection(db.Model):
     type = db.Column(db.Text, nullable=False, default="Collection")
     title = db.Column(db.Text, nullable=True, default="")
     description = db.Column(db.Text, nullable=True, default="")
-    temporal_extent_start = db.Column(db.DateTime, nullable=True, default=None)
-    temporal_extent_end = db.Column(db.DateTime, nullable=True, default=None)
+    temporal_extent_start = db.Column(db.DateTime, nullable=True, default=None, index=True)
+    temporal_extent_end = db.Column(db.DateTime, nullable=True, default=None, index=True)
     spatial_extent = db.Column(Geometry(geometry_type="MULTIPOLYGON"), nullable=True, default=None)
+    # columns left out of the serialized collection
+    hidden_columns = ("_id", "spatial_extent")
+
+    @classmethod
+    def spatial_extent_intersects(cls, bbox: shapely.geometry.polygon.Polygon or list[float]):
+        """
+        Filter clause matching collections whose spatial extent intersects the bbox.
+
+        The && operator is spelled out so the GiST index on spatial_extent prefilters the rows
+        before the exact ST_Intersects check runs.
+
+        :param bbox: Bounding box as [min_x, min_y, max_x, max_y] or a shapely polygon
+        """
+        if isinstance(bbox, list):
+            geometry = func.ST_MakeEnvelope(*bbox, 4326)
+        else:
+            geometry = func.ST_GeomFromEWKT(f"SRID=4326;{bbox.wkt}")
+        return and_(cls.spatial_extent.intersects(geometry), cls.spatial_extent.ST_Intersects(geometry))
+
+    @classmethod
+    def serialization_columns(cls, geojson: bool = False) -> list:
+        """
+        Columns to select for row_as_dict.
+
+        Rows can be serialized without loading ORM objects. The spatial extent is rendered as GeoJSON by
+        PostGIS, or as WKT by shapely from its binary form, in the same format as as_dict.
+
+        :param geojson: Render the spatial extent as GeoJSON instead of WKT
+        """
+        columns = [getattr(cls, c.name) for c in cls.__table__.columns if c.name not in cls.hidden_columns]
+        if geojson:
+            columns.append(func.ST_AsGeoJSON(cls.spatial_extent).label("spatial_extent_geojson"))
+        else:
+            # PostGIS writes WKT differently, e.g. POLYGON((0 0,1 0,...)) instead of POLYGON ((0 0, 1 0, ...))
+            columns.append(cls.spatial_extent.label("spatial_extent_wkt"))
+        return columns
+
+    @classmethod
+    def row_as_dict(cls, row) -> dict:
+        """
+        Serialize a row selected with serialization_columns, in the format of as_dict.
+
+        Hidden columns selected alongside, like the _id used as a pagination cursor, are left out.
+        """
+        data = {key: str(value) for key, value in row._mapping.items() if key not in cls.hidden_columns}
+        if "spatial_extent_wkt" in data and row.spatial_extent_wkt is not None:
+            data["spatial_extent_wkt"] = to_shape(row.spatial_extent_wkt).wkt
+        if "spatial_extent_geojson" in data and row.spatial_extent_geojson is not None:
+            data["spatial_extent_geojson"] = json.loads(row.spatial_extent_geojson)
+        return data
 
     def as_dict(self):
         data = {
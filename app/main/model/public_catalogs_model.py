@@ -1,5 +1,6 @@
 import datetime
-import json
+
+from sqlalchemy.dialects.postgresql import JSONB
 
 from .. import db
 from ..model.collection_model import Collection
@@ -14,6 +15,10 @@ class PublicCatalog(db.Model):
     added_on: datetime.datetime = db.Column(db.DateTime,
                                             nullable=False,
                                             default=datetime.datetime.utcnow)
+    # fingerprint of the /collections document as of the last sync
+    collections_etag: str = db.Column(db.Text, nullable=True)
+    collections_last_modified: str = db.Column(db.Text, nullable=True)
+    collections_hash: str = db.Column(db.Text, nullable=True)
     stored_search_parameters = db.relationship("StoredSearchParameters", backref="public_catalogs", lazy="dynamic",
                                                cascade="all, delete-orphan")
     stored_ingestion_statuses = db.relationship("StacIngestionStatus", backref="public_catalogs", lazy="dynamic",
@@ -25,15 +30,19 @@ class PublicCatalog(db.Model):
         return StoredSearchParameters.query.filter_by(
             associated_catalog_id=self.id).count()
 
-    def as_dict(self):
+    def as_dict(self, number_of_stored_search_parameters: int = None):
+        """
+        :param number_of_stored_search_parameters: Already known number of stored search parameters,
+            counted with an extra query when not given
+        """
         data = {
             c.name: str(getattr(self, c.name))
             for c in self.__table__.columns
         }
 
-        data[
-            "number_of_stored_search_parameters_associated"] = self.get_number_of_stored_search_parameters(
-        )
+        if number_of_stored_search_parameters is None:
+            number_of_stored_search_parameters = self.get_number_of_stored_search_parameters()
+        data["number_of_stored_search_parameters_associated"] = number_of_stored_search_parameters
         return data
 
 
@@ -43,23 +52,40 @@ class PublicCollection(Collection):
         'polymorphic_identity': 'PublicCollection',
     }
     parent_catalog = db.Column(db.Integer, db.ForeignKey("public_catalogs.id", ondelete='CASCADE'), nullable=False)
+    # hash of the canonical collection JSON as of the last sync
+    content_hash = db.Column(db.Text, nullable=True)
     __table_args__ = (db.UniqueConstraint('id', 'parent_catalog', name='_id_parent_catalog_uc'),)
+    hidden_columns = Collection.hidden_columns + ("content_hash",)
+
+    @classmethod
+    def row_as_dict(cls, row) -> dict:
+        data = super().row_as_dict(row)
+        data["parent_catalog"] = row.parent_catalog
+        return data
 
     def as_dict(self):
         data = super().as_dict()
+        data.pop("content_hash")
         data["parent_catalog"] = self.parent_catalog
         return data
 
 
 class StoredSearchParameters(db.Model):
     __tablename__ = "stored_search_parameters"
+    __table_args__ = (
+        # serves the containment queries on the parameters, e.g. by collection
+        db.Index("ix_stored_search_parameters_used_search_parameters", "used_search_parameters",
+                 postgresql_using="gin", postgresql_ops={"used_search_parameters": "jsonb_path_ops"}),
+    )
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    bbox = db.Column(db.Text, nullable=True, default="[]")
-    datetime = db.Column(db.Text, nullable=True, default="")
+    bbox = db.Column(JSONB, nullable=True)
+    datetime = db.Column(JSONB, nullable=True)
     collection = db.Column(db.Text, nullable=True, default="")
-    used_search_parameters: str = db.Column(db.Text,
-                                            nullable=False,
-                                            unique=True)
+    used_search_parameters = db.Column(JSONB, nullable=False)
+    # canonical hash of used_search_parameters, which identifies the same search whatever its key order
+    parameters_hash: str = db.Column(db.Text, nullable=False, unique=True)
+    # upstream `updated` of the collection when it was last refreshed successfully by a schedule
+    upstream_updated: str = db.Column(db.Text, nullable=True)
     associated_catalog_id: int = db.Column(db.Integer,
                                            db.ForeignKey('public_catalogs.id',
                                                          ondelete='CASCADE'),
@@ -69,18 +95,9 @@ class StoredSearchParameters(db.Model):
     def as_dict(self):
         data = {}
         data["collection"] = self.collection
-        try:
-            data["bbox"] = json.loads(self.bbox)
-        except json.decoder.JSONDecodeError:
-            data["bbox"] = []
-        try:
-            data["datetime"] = json.loads(self.datetime)
-        except json.decoder.JSONDecodeError:
-            data["datetime"] = ""
-        try:
-            data["used_search_parameters"] = json.loads(self.used_search_parameters)
-        except json.decoder.JSONDecodeError:
-            data["used_search_parameters"] = ""
+        data["bbox"] = self.bbox if self.bbox is not None else []
+        data["datetime"] = self.datetime if self.datetime is not None else ""
+        data["used_search_parameters"] = self.used_search_parameters
         data["associated_catalog_id"] = self.associated_catalog_id
         data["id"] = self.id
         return data
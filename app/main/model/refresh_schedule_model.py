@@ -0,0 +1,61 @@
+import datetime
+
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .. import db
+
+
+class RefreshSchedule(db.Model):
+    """
+    Cron schedule refreshing the stored search parameters of a public catalog, or a single one of them.
+    """
+    __tablename__ = "refresh_schedules"
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    public_catalog_id: int = db.Column(db.Integer, db.ForeignKey('public_catalogs.id', ondelete='CASCADE'),
+                                       nullable=True, index=True)
+    stored_search_parameters_id: int = db.Column(db.Integer,
+                                                 db.ForeignKey('stored_search_parameters.id', ondelete='CASCADE'),
+                                                 nullable=True, index=True)
+    cron: str = db.Column(db.Text, nullable=False)
+    # the ingestions of a run are spread over this many seconds after it fires
+    window_seconds: int = db.Column(db.Integer, nullable=False, default=0)
+    enabled: bool = db.Column(db.Boolean, nullable=False, default=True)
+    next_run_at: datetime.datetime = db.Column(db.DateTime, nullable=True, index=True)
+    last_run_at: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    added_on: datetime.datetime = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def as_dict(self):
+        return {
+            c.name: str(getattr(self, c.name))
+            for c in self.__table__.columns
+        }
+
+
+class RefreshRun(db.Model):
+    """
+    Run of a refresh schedule, finished once all the ingestions it queued are finished.
+    """
+    __tablename__ = "refresh_runs"
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    schedule_id: int = db.Column(db.Integer, db.ForeignKey('refresh_schedules.id', ondelete='CASCADE'),
+                                 nullable=False, index=True)
+    time_started: datetime.datetime = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    time_finished: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    parameters_scheduled: int = db.Column(db.Integer, nullable=False, default=0)
+    parameters_skipped: int = db.Column(db.Integer, nullable=False, default=0)
+    ingestions_succeeded: int = db.Column(db.Integer, nullable=True)
+    ingestions_failed: int = db.Column(db.Integer, nullable=True)
+    # ids of the stac ingestion statuses of the queued ingestions, comma separated
+    callback_ids: str = db.Column(db.Text, nullable=True, default="")
+    # upstream `updated` of the collection of every scheduled search parameter, stored on the search
+    # parameters covered by the successful ingestions once the run finishes
+    upstream_updated = db.Column(JSONB, nullable=True)
+    error_message: str = db.Column(db.Text, nullable=True)
+
+    def as_dict(self):
+        data = {
+            c.name: str(getattr(self, c.name))
+            for c in self.__table__.columns
+        }
+        data["upstream_updated"] = self.upstream_updated
+        return data
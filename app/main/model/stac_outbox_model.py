@@ -0,0 +1,45 @@
+import datetime
+
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .. import db
+
+# states of an outbox operation
+PENDING = "pending"
+DELIVERING = "delivering"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+
+class StacOutboxOperation(db.Model):
+    """
+    Write to the STAC API recorded in the transaction of the matching database write, and delivered later
+    by the outbox relay.
+    """
+    __tablename__ = "stac_outbox"
+    __table_args__ = (
+        # the relay only looks at the operations left to deliver
+        db.Index("ix_stac_outbox_undelivered", "next_attempt_at",
+                 postgresql_where=db.text("state IN ('pending', 'delivering')")),
+    )
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # create_collection, update_collection or remove_collection
+    operation: str = db.Column(db.Text, nullable=False)
+    collection_id: str = db.Column(db.Text, nullable=False, index=True)
+    payload = db.Column(JSONB, nullable=True)
+    state: str = db.Column(db.Text, nullable=False, default=PENDING)
+    attempts: int = db.Column(db.Integer, nullable=False, default=0)
+    # pending operations wait until then, delivering ones are given back to the relays then
+    next_attempt_at: datetime.datetime = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    time_created: datetime.datetime = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    time_delivered: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    last_error: str = db.Column(db.Text, nullable=True)
+    response = db.Column(JSONB, nullable=True)
+
+    def as_dict(self):
+        data = {
+            c.name: str(getattr(self, c.name))
+            for c in self.__table__.columns if c.name not in ("payload", "response")
+        }
+        data["response"] = self.response
+        return data
@@ -2,12 +2,26 @@ import datetime
 
 from .. import db
 
+# states of a stac ingestion
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+
 
 class StacIngestionStatus(db.Model):
     __tablename__ = "stac_ingestion_status"
+    __table_args__ = (
+        # unfinished ingestions are looked up often, and are few
+        db.Index("ix_stac_ingestion_status_unfinished", "source_stac_api_url",
+                 postgresql_where=db.text("time_finished IS NULL")),
+        # at most one unfinished ingestion per dedup key, duplicates join it
+        db.Index("ix_stac_ingestion_status_dedup_key", "dedup_key", unique=True,
+                 postgresql_where=db.text("time_finished IS NULL")),
+    )
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
     time_started: datetime.datetime = db.Column(
-        db.DateTime, nullable=True, default=datetime.datetime.utcnow)
+        db.DateTime, nullable=True, default=datetime.datetime.utcnow, index=True)
     time_finished: datetime.datetime = db.Column(db.DateTime, nullable=True)
     source_stac_api_url: str = db.Column(db.Text, db.ForeignKey('public_catalogs.url', ondelete='CASCADE'), index=True)
     target_stac_api_url: str = db.Column(db.Text, nullable=True)
@@ -30,6 +44,85 @@ class StacIngestionStatus(db.Model):
     already_stored_items_count: int = db.Column(db.Integer,
                                                 nullable=True,
                                                 default=0)
+    # parameters sent to the ingestion microservice, kept to requeue the ingestion after a crash
+    ingestion_parameters: str = db.Column(db.Text, nullable=True)
+    # ids of the stored search parameters covered by the ingestion, comma separated
+    covered_search_parameters: str = db.Column(db.Text, nullable=True, default="")
+    # progress reported by the ingestion microservice while it runs
+    items_processed: int = db.Column(db.Integer, nullable=True, default=0)
+    items_total: int = db.Column(db.Integer, nullable=True)
+    items_per_second: float = db.Column(db.Float, nullable=True)
+    estimated_time_finished: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    time_updated: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    # queued until an ingestion worker takes it, time_started is then reset to when it actually started
+    state: str = db.Column(db.Text, nullable=True, default=QUEUED)
+    time_queued: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    # identical requests made before dedup_expires join this ingestion instead of starting a new one
+    dedup_key: str = db.Column(db.Text, nullable=True)
+    dedup_expires: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    coalesced_requests: int = db.Column(db.Integer, nullable=True, default=0)
+
+    def as_dict(self):
+        return {
+            c.name: str(getattr(self, c.name))
+            for c in self.__table__.columns
+        }
+
+    @classmethod
+    def row_as_dict(cls, row) -> dict:
+        """
+        Serialize a row selected with all table columns, in the format of as_dict.
+        """
+        return {key: str(value) for key, value in row._mapping.items()}
+
+
+class StacIngestionRollup(db.Model):
+    """
+    Totals of the finished ingestions of a source catalog, kept up to date as ingestions finish.
+
+    Survives the removal of old StacIngestionStatus rows.
+    """
+    __tablename__ = "stac_ingestion_rollups"
+    source_stac_api_url: str = db.Column(db.Text, db.ForeignKey('public_catalogs.url', ondelete='CASCADE'),
+                                         primary_key=True)
+    runs: int = db.Column(db.Integer, nullable=False, default=0)
+    failures: int = db.Column(db.Integer, nullable=False, default=0)
+    newly_stored_items_count: int = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_items_count: int = db.Column(db.BigInteger, nullable=False, default=0)
+    total_duration_seconds: float = db.Column(db.Float, nullable=False, default=0)
+    last_time_finished: datetime.datetime = db.Column(db.DateTime, nullable=True)
+
+    def as_dict(self):
+        data = {
+            c.name: str(getattr(self, c.name))
+            for c in self.__table__.columns
+        }
+        data["mean_duration_seconds"] = str(self.total_duration_seconds / self.runs if self.runs else None)
+        return data
+
+
+class PublicCatalogsSyncRun(db.Model):
+    __tablename__ = "public_catalogs_sync_runs"
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    time_started: datetime.datetime = db.Column(
+        db.DateTime, nullable=True, default=datetime.datetime.utcnow)
+    time_finished: datetime.datetime = db.Column(db.DateTime, nullable=True)
+    max_workers: int = db.Column(db.Integer, nullable=True)
+    per_host_limit: int = db.Column(db.Integer, nullable=True)
+    catalogs_total: int = db.Column(db.Integer, nullable=True, default=0)
+    catalogs_fetched: int = db.Column(db.Integer, nullable=True, default=0)
+    catalogs_skipped: int = db.Column(db.Integer, nullable=True, default=0)
+    catalogs_unchanged: int = db.Column(db.Integer, nullable=True, default=0)
+    catalogs_stored: int = db.Column(db.Integer, nullable=True, default=0)
+    collections_stored: int = db.Column(db.Integer, nullable=True, default=0)
+    collections_inserted: int = db.Column(db.Integer, nullable=True, default=0)
+    collections_updated: int = db.Column(db.Integer, nullable=True, default=0)
+    collections_unchanged: int = db.Column(db.Integer, nullable=True, default=0)
+    collections_pruned: int = db.Column(db.Integer, nullable=True, default=0)
+    error_message: str = db.Column(db.Text, nullable=True, default="")
+    # validators of the catalogs lookup api response, sent back on the next sync
+    lookup_etag: str = db.Column(db.Text, nullable=True)
+    lookup_last_modified: str = db.Column(db.Text, nullable=True)
 
     def as_dict(self):
         return {
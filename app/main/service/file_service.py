@@ -8,6 +8,8 @@ from azure.storage.blob import BlobServiceClient
 from azure.storage.blob import generate_blob_sas, BlobSasPermissions
 from flask import current_app
 
+from ..util import http_client
+
 
 def check_blob_status():
     """Check if the blob storage is available.
@@ -69,7 +71,7 @@ def return_file_url(filename: str):
 def retrieve_file(file_url: str):
     try:
         _, file_url_with_sas_read_token = get_read_sas_token(file_url)
-        response = requests.get(file_url_with_sas_read_token)
+        response = http_client.get(file_url_with_sas_read_token)
         response.raise_for_status()
         try:
             return response.json()
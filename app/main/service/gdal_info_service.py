@@ -1,7 +1,7 @@
-import requests
 from flask import current_app
 
 from ..custom_exceptions import *
+from ..util import http_client
 
 
 def get_gdal_info(url: str) -> str:
@@ -10,7 +10,7 @@ def get_gdal_info(url: str) -> str:
     """
     gdal_info_api_endpoint = current_app.config["GDAL_INFO_API_ENDPOINT"]
     try:
-        response = requests.post(gdal_info_api_endpoint, json={"file_url": url})
+        response = http_client.post(gdal_info_api_endpoint, json={"file_url": url})
         response_code = response.status_code
         if response_code == 404:
             raise FileNotFoundError
@@ -0,0 +1,280 @@
+import json
+import logging
+import math
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from flask import current_app
+from rq import Queue, Retry, Worker, get_current_job
+from rq.job import JobStatus
+from rq.registry import ScheduledJobRegistry, StartedJobRegistry
+
+from .status_reporting_service import set_stac_ingestion_status_entry, get_unfinished_stac_ingestion_statuses, \
+    set_stac_ingestion_status_running, set_stac_ingestion_status_queued
+from .. import db
+from ..custom_exceptions import *
+from ..util import response_cache
+from ..util.canonical_json import canonical_hash
+from ..util.http_client import get_http_client
+from ..util.redis_connection import get_redis_connection
+from ..util.redis_semaphore import RedisSemaphore
+from ..util.redis_token_bucket import RedisTokenBucket
+
+JOB_ID_PREFIX = "ingestion-"
+SOURCE_SEMAPHORE_PREFIX = "ingestion:source:"
+SOURCE_RATE_PREFIX = "ingestion:rate:"
+RECOVERY_LOCK_KEY = "ingestion:recovery"
+
+
+def get_ingestion_queue(priority: bool = False) -> Queue:
+    """
+    Get the queue of the ingestions, or the one of the priority ingestions, which workers empty first.
+    """
+    name = current_app.config['INGESTION_PRIORITY_QUEUE_NAME' if priority else 'INGESTION_QUEUE_NAME']
+    return Queue(name, connection=get_redis_connection())
+
+
+def _get_ingestion_queues() -> List[Queue]:
+    return [get_ingestion_queue(priority=True), get_ingestion_queue()]
+
+
+def _job_options(callback_id: int) -> Dict[str, any]:
+    retry = None
+    if current_app.config['INGESTION_JOB_RETRIES'] > 0:
+        retry = Retry(max=current_app.config['INGESTION_JOB_RETRIES'],
+                      interval=current_app.config['INGESTION_RETRY_INTERVALS'])
+    return dict(job_id=f"{JOB_ID_PREFIX}{callback_id}-{uuid.uuid4().hex}", retry=retry,
+                timeout=current_app.config['INGESTION_JOB_TIMEOUT'], result_ttl=3600, failure_ttl=86400)
+
+
+def enqueue_ingestion(callback_id: int, parameters: Dict[any, any], delay: float = None,
+                      priority: bool = False) -> str:
+    """
+    Queue a call to the ingestion microservice, to be run by an ingestion worker.
+
+    Failed calls are retried with the backoff of INGESTION_RETRY_INTERVALS.
+
+    :param callback_id: Id of the stac ingestion status of the ingestion
+    :param parameters: Parameters to send to the ingestion microservice
+    :param delay: Seconds to wait before the job can run
+    :param priority: Run before the ingestions of the normal queue, for ingestions a user waits for
+    :return: Id of the queued job
+    """
+    queue = get_ingestion_queue(priority)
+    options = _job_options(callback_id)
+    options["job_timeout"] = options.pop("timeout")
+    if delay:
+        queue.enqueue_in(timedelta(seconds=delay), run_ingestion_job, args=(callback_id, parameters), **options)
+    else:
+        queue.enqueue(run_ingestion_job, args=(callback_id, parameters), **options)
+    return options["job_id"]
+
+
+def enqueue_ingestions(ingestions: List[Tuple[int, Dict[any, any]]], spread_seconds: float = 0) -> List[str]:
+    """
+    Queue many calls to the ingestion microservice, INGESTION_DISPATCH_BATCH_SIZE per Redis round trip.
+
+    :param ingestions: Callback ids and parameters of the ingestions
+    :param spread_seconds: Schedule the ingestions evenly over this many seconds instead of queuing them at once
+    :return: Ids of the queued jobs
+    """
+    queue = get_ingestion_queue()
+    batch_size = max(1, current_app.config['INGESTION_DISPATCH_BATCH_SIZE'])
+    job_ids = []
+    if spread_seconds > 0 and ingestions:
+        now = datetime.now(timezone.utc)
+        interval = spread_seconds / len(ingestions)
+        for i in range(0, len(ingestions), batch_size):
+            with queue.connection.pipeline() as pipeline:
+                for j, (callback_id, parameters) in enumerate(ingestions[i:i + batch_size], start=i):
+                    job = queue.create_job(run_ingestion_job, args=(callback_id, parameters),
+                                           status=JobStatus.SCHEDULED, **_job_options(callback_id))
+                    queue.schedule_job(job, now + timedelta(seconds=j * interval), pipeline=pipeline)
+                    job_ids.append(job.id)
+                pipeline.execute()
+        return job_ids
+    for i in range(0, len(ingestions), batch_size):
+        job_datas = [Queue.prepare_data(run_ingestion_job, args=(callback_id, parameters),
+                                        **_job_options(callback_id))
+                     for callback_id, parameters in ingestions[i:i + batch_size]]
+        job_ids += [job.id for job in queue.enqueue_many(job_datas)]
+    return job_ids
+
+
+def _source_semaphore(source_stac_catalog_url: str) -> RedisSemaphore:
+    return RedisSemaphore(get_redis_connection(),
+                          SOURCE_SEMAPHORE_PREFIX + canonical_hash(source_stac_catalog_url),
+                          current_app.config['INGESTION_MAX_CONCURRENCY_PER_SOURCE'],
+                          current_app.config['INGESTION_JOB_TIMEOUT'])
+
+
+def _source_rate_limit(source_stac_catalog_url: str) -> Optional[RedisTokenBucket]:
+    rate = current_app.config['INGESTION_SOURCE_RATE_PER_MINUTE']
+    if rate <= 0:
+        return None
+    return RedisTokenBucket(get_redis_connection(), SOURCE_RATE_PREFIX + canonical_hash(source_stac_catalog_url),
+                            rate / 60, current_app.config['INGESTION_SOURCE_BURST'])
+
+
+def _defer(callback_id: int, parameters: Dict[any, any], job, delay: float) -> Dict[any, any]:
+    # the job is queued again in the queue it came from, without using one of its retries
+    priority = job is not None and job.origin == current_app.config['INGESTION_PRIORITY_QUEUE_NAME']
+    enqueue_ingestion(callback_id, parameters, delay=max(1, math.ceil(delay)), priority=priority)
+    return {"deferred": True}
+
+
+def run_ingestion_job(callback_id: int, parameters: Dict[any, any]) -> Dict[any, any]:
+    """
+    Call the ingestion microservice and record the result on the stac ingestion status.
+
+    Runs in an ingestion worker. The ingestions of a source catalog are limited to
+    INGESTION_MAX_CONCURRENCY_PER_SOURCE at once and, unless INGESTION_SOURCE_RATE_PER_MINUTE is 0, to that
+    rate with bursts of INGESTION_SOURCE_BURST. Jobs over a limit stay queued and try again once the limit
+    allows it, as do jobs the microservice answers with 429 Too Many Requests.
+    Unreachable or failing microservice calls raise, so the queue retries them; the error is only recorded
+    on the status once no retry is left.
+
+    :param callback_id: Id of the stac ingestion status of the ingestion
+    :param parameters: Parameters to send to the ingestion microservice
+    :return: Response of the microservice
+    """
+    job = get_current_job()
+    holder = job.id if job is not None else str(callback_id)
+    semaphore = _source_semaphore(parameters['source_stac_catalog_url'])
+    if not semaphore.acquire(holder):
+        return _defer(callback_id, parameters, job, current_app.config['INGESTION_SOURCE_BUSY_DELAY'])
+    rate_limit = _source_rate_limit(parameters['source_stac_catalog_url'])
+    wait = rate_limit.take() if rate_limit is not None else 0
+    if wait > 0:
+        semaphore.release(holder)
+        return _defer(callback_id, parameters, job, wait)
+    try:
+        parameters['callback_id'] = callback_id
+        set_stac_ingestion_status_running(int(callback_id))
+        try:
+            response = get_http_client().post(current_app.config['STAC_SELECTIVE_INGESTER_ENDPOINT'],
+                                              json=parameters, timeout=None)
+        except Exception as e:
+            _record_failure(callback_id, job, str({"error": "Unable to reach ingestion microservice"}), e)
+            raise MicroserviceIsNotAvailableError(str(e))
+        if response.status_code == 429:
+            # the ingestion did not start, it waits in the queue again
+            set_stac_ingestion_status_queued(int(callback_id))
+            retry_after = response.headers.get("Retry-After", "")
+            return _defer(callback_id, parameters, job, int(retry_after) if retry_after.isdigit()
+                          else current_app.config['INGESTION_SOURCE_BUSY_DELAY'])
+        if response.status_code >= 500:
+            _record_failure(callback_id, job, response.text)
+            raise MicroserviceIsNotAvailableError(response.text)
+        if response.status_code != 200:
+            # the microservice refused the parameters, retrying would not help
+            set_stac_ingestion_status_entry(int(callback_id), error_message=response.text)
+            return {"error": response.text}
+        response_json = response.json()
+        set_stac_ingestion_status_entry(int(callback_id), response_json['newly_stored_collections_count'],
+                                        response_json['newly_stored_collections'],
+                                        response_json['updated_collections_count'],
+                                        response_json['updated_collections'],
+                                        response_json['newly_stored_items_count'],
+                                        response_json['updated_items_count'],
+                                        response_json['already_stored_items_count'])
+        # the microservice wrote to the stac api directly
+        response_cache.invalidate(response_cache.GLOBAL_SCOPE)
+        return response_json
+    finally:
+        semaphore.release(holder)
+        db.session.remove()
+
+
+def _record_failure(callback_id: int, job, error_message: str, exception: Exception = None):
+    if job is not None and job.retries_left:
+        logging.warning(f"Ingestion {callback_id} failed, {job.retries_left} retries left: "
+                        + str(exception or error_message))
+        return
+    logging.error(f"Ingestion {callback_id} failed: " + str(exception or error_message))
+    set_stac_ingestion_status_entry(int(callback_id), error_message=error_message)
+
+
+def _get_live_callback_ids(queues: List[Queue]) -> Set[int]:
+    """
+    Get the ids of the ingestions which are queued, scheduled or running on a live worker.
+    """
+    job_ids = []
+    for queue in queues:
+        started_registry = StartedJobRegistry(queue=queue)
+        # jobs of dead workers are moved to the failed registry
+        started_registry.cleanup()
+        job_ids += queue.get_job_ids() + ScheduledJobRegistry(queue=queue).get_job_ids() + \
+            started_registry.get_job_ids()
+    return {int(job_id[len(JOB_ID_PREFIX):].split("-")[0]) for job_id in job_ids if job_id.startswith(JOB_ID_PREFIX)}
+
+
+def _release_recovery_lock(connection, token: str):
+    def release(pipeline):
+        if pipeline.get(RECOVERY_LOCK_KEY) == token.encode():
+            pipeline.multi()
+            pipeline.delete(RECOVERY_LOCK_KEY)
+
+    connection.transaction(release, RECOVERY_LOCK_KEY)
+
+
+def recover_ingestions() -> List[int]:
+    """
+    Queue again the ingestions which are not finished but have no live job, e.g. after a worker crashed.
+
+    Ingestions started before they were queued with their parameters cannot be requeued, and are marked
+    as failed instead. Source catalog slots held by jobs which are no longer running are given back.
+
+    Ingestions queued less than INGESTION_RECOVERY_GRACE_SECONDS ago are left alone, as their job may not be
+    queued yet. Only one recovery runs at once, others return without doing anything.
+
+    :return: Callback ids of the requeued ingestions
+    """
+    connection = get_redis_connection()
+    token = uuid.uuid4().hex
+    if not connection.set(RECOVERY_LOCK_KEY, token, nx=True, ex=current_app.config['INGESTION_RECOVERY_LOCK_TTL']):
+        logging.info("Another recovery of the ingestions is running")
+        return []
+    try:
+        queues = _get_ingestion_queues()
+        live_callback_ids = _get_live_callback_ids(queues)
+        grace_cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['INGESTION_RECOVERY_GRACE_SECONDS'])
+        requeued = []
+        for status in get_unfinished_stac_ingestion_statuses():
+            if status.id in live_callback_ids:
+                continue
+            if status.time_queued is not None and status.time_queued > grace_cutoff:
+                continue
+            if not status.ingestion_parameters:
+                set_stac_ingestion_status_entry(status.id, error_message="Ingestion was interrupted")
+                continue
+            enqueue_ingestion(status.id, json.loads(status.ingestion_parameters))
+            requeued.append(status.id)
+        running_job_ids = {job_id for queue in queues for job_id in StartedJobRegistry(queue=queue).get_job_ids()}
+        for key in connection.scan_iter(match=SOURCE_SEMAPHORE_PREFIX + "*"):
+            semaphore = RedisSemaphore(connection, key, 1, 0)
+            for holder in semaphore.holders():
+                if holder not in running_job_ids:
+                    semaphore.release(holder)
+    finally:
+        _release_recovery_lock(connection, token)
+    if requeued:
+        logging.warning("Requeued interrupted ingestions: " + ", ".join(str(i) for i in requeued))
+    return requeued
+
+
+def run_ingestion_worker(burst: bool = False):
+    """
+    Run a worker processing the ingestion queues, after recovering interrupted ingestions.
+
+    The priority queue is emptied before any job of the normal queue is started.
+
+    :param burst: Stop once the queue is empty
+    """
+    recover_ingestions()
+    # every job runs in a forked process, which must not share the database connections of this one
+    db.session.remove()
+    db.engine.dispose()
+    worker = Worker(_get_ingestion_queues(), connection=get_redis_connection())
+    worker.work(with_scheduler=True, burst=burst)
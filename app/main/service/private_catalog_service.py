@@ -1,15 +1,19 @@
-from typing import Dict
+from typing import Dict, Iterator
 
 import geoalchemy2
 import shapely
+from flask import current_app
 from shapely.geometry import box, MultiPolygon
 from sqlalchemy import or_
 
+from .stac_outbox_service import add_stac_outbox_operation, CREATE_COLLECTION, UPDATE_COLLECTION, \
+    REMOVE_COLLECTION
 from .stac_service import update_existing_collection_on_stac_api, create_new_collection_on_stac_api, \
     remove_private_collection_by_id_on_stac_api
 from .. import db
 from ..custom_exceptions import *
 from ..model.private_catalog_model import PrivateCollection
+from ..util import pagination
 from ..util import process_timestamp
 from ..util.process_timestamp import *
 
@@ -23,6 +27,14 @@ def _does_collection_exist_in_database(collection_id: str) -> bool:
     return PrivateCollection.query.filter_by(id=collection_id).first() is not None
 
 
+def writes_via_outbox() -> bool:
+    """
+    Whether collection writes return once stored in the database, leaving the STAC API write to the outbox
+    relay, see stac_outbox_service.
+    """
+    return current_app.config['PRIVATE_COLLECTION_WRITES_VIA_OUTBOX']
+
+
 def add_collection(collection: Dict[str, any]) -> Dict[str, any]:
     collection_id = collection["id"]
     if _does_collection_exist_in_database(collection_id):
@@ -56,6 +68,10 @@ def add_collection(collection: Dict[str, any]) -> Dict[str, any]:
         private_collection.temporal_extent_start = process_timestamp_single_string(temporal_extent_start)
         private_collection.temporal_extent_end = process_timestamp_single_string(temporal_extent_end)
         db.session.add(private_collection)
+        if writes_via_outbox():
+            operation = add_stac_outbox_operation(CREATE_COLLECTION, collection_id, collection)
+            db.session.commit()
+            return operation.as_dict()
         try:
             status = create_new_collection_on_stac_api(collection)
             db.session.commit()
@@ -90,6 +106,10 @@ def update_collection(collection: Dict[str, any]) -> Dict[str, any]:
     temporal_extent_end = collection['extent']['temporal']['interval'][0][1]
     private_collection.temporal_extent_start = process_timestamp_single_string(temporal_extent_start)
     private_collection.temporal_extent_end = process_timestamp_single_string(temporal_extent_end)
+    if writes_via_outbox():
+        operation = add_stac_outbox_operation(UPDATE_COLLECTION, collection_id, collection)
+        db.session.commit()
+        return operation.as_dict()
     try:
         status = update_existing_collection_on_stac_api(collection)
         db.session.commit()
@@ -108,17 +128,19 @@ def remove_collection(collection_id: str) -> Dict[str, any]:
         raise PrivateCollectionDoesNotExistError
     private_collection = PrivateCollection.query.filter_by(id=collection_id).first()
     db.session.delete(private_collection)
+    if writes_via_outbox():
+        operation = add_stac_outbox_operation(REMOVE_COLLECTION, collection_id)
+        db.session.commit()
+        return operation.as_dict()
     db.session.commit()
     remove_private_collection_by_id_on_stac_api(collection_id)
     return {"status": "success"}
 
 
 def search_collections(bbox: shapely.geometry.polygon.Polygon or list[float], time_interval_timestamp: str,
-                       ) -> dict[str, any] or list[any]:
-    if isinstance(bbox, list):
-        bbox = shapely.geometry.box(*bbox)
-    a = db.session.query(PrivateCollection).filter(PrivateCollection.spatial_extent.ST_Intersects(
-        f"SRID=4326;{bbox.wkt}"))
+                       geojson: bool = False) -> dict[str, any] or list[any]:
+    a = db.session.query(*PrivateCollection.serialization_columns(geojson)).filter(
+        PrivateCollection.spatial_extent_intersects(bbox))
 
     time_start, time_end = process_timestamp.process_timestamp_dual_string(time_interval_timestamp)
     if time_start:
@@ -128,18 +150,35 @@ def search_collections(bbox: shapely.geometry.polygon.Polygon or list[float], ti
         a = a.filter(
             or_(PrivateCollection.temporal_extent_end == None, PrivateCollection.temporal_extent_end >= time_end
                 ))
-    data = a.all()
-    grouped_data = []
-    for item in data:
-        item: PrivateCollection
-        grouped_data.append(item.as_dict())
-    return grouped_data
-
-
-def get_all_collections():
-    data = db.session.query(PrivateCollection).all()
-    grouped_data = []
-    for item in data:
-        item: PrivateCollection
-        grouped_data.append(item.as_dict())
-    return grouped_data
+    return [PrivateCollection.row_as_dict(row) for row in a]
+
+
+def get_all_collections(geojson: bool = False):
+    data = db.session.query(*PrivateCollection.serialization_columns(geojson))
+    return [PrivateCollection.row_as_dict(row) for row in data]
+
+
+def get_collections_page(limit: int = None, next_token: str = None, geojson: bool = False) -> Dict[str, any]:
+    """
+    Get a page of the private collections.
+
+    :param limit: Page size
+    :param next_token: Token of the page to get, as returned with the previous page
+    :param geojson: Render the spatial extents as GeoJSON instead of WKT
+    :return: Dict with the collections as `items` and the `next` token
+    """
+    query = db.session.query(*PrivateCollection.serialization_columns(geojson), PrivateCollection._id)
+    return pagination.paginate(query, PrivateCollection._id, PrivateCollection.row_as_dict, limit, next_token)
+
+
+def iterate_collections(limit: int = None, next_token: str = None, geojson: bool = False) -> Iterator[Dict[any, any]]:
+    """
+    Iterate over the private collections using a server-side cursor.
+
+    :param limit: Maximum number of collections, all when None
+    :param next_token: Start after the page this token was returned with
+    :param geojson: Render the spatial extents as GeoJSON instead of WKT
+    :return: Iterator of collections
+    """
+    query = db.session.query(*PrivateCollection.serialization_columns(geojson), PrivateCollection._id)
+    return pagination.iterate(query, PrivateCollection._id, PrivateCollection.row_as_dict, limit, next_token)
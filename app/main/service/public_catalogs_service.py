@@ -1,7 +1,8 @@
-import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Thread
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
 import geoalchemy2
 import requests
@@ -10,15 +11,25 @@ import sqlalchemy
 from flask import current_app
 from shapely.geometry import MultiPolygon
 from shapely.geometry import box
-from sqlalchemy import or_
+from sqlalchemy import or_, func
+from sqlalchemy.dialects.postgresql import insert
 
 from app.main.model.public_catalogs_model import PublicCatalog, PublicCollection
-from .status_reporting_service import make_stac_ingestion_status_entry, set_stac_ingestion_status_entry
+from .status_reporting_service import make_stac_ingestion_status_entry, make_stac_ingestion_status_entries, \
+    make_or_join_stac_ingestion_status_entry, \
+    make_public_catalogs_sync_run_entry, set_public_catalogs_sync_run_entry, \
+    get_last_public_catalogs_lookup_validators
 from .. import db
 from ..custom_exceptions import *
 from ..model.public_catalogs_model import StoredSearchParameters
+from ..service import ingestion_queue_service
 from ..service import stac_service
 from ..util import process_timestamp
+from ..util.canonical_json import canonical_hash
+from ..util.host_limiter import HostConcurrencyLimiter
+from ..util.ingestion_planning import plan_ingestions
+from ..util.http_client import get_http_client
+from ..util import pagination
 
 
 def store_new_public_catalog(name: str, url: str, description: str, return_as_dict=True) -> Dict[
@@ -49,34 +60,288 @@ def store_new_public_catalog(name: str, url: str, description: str, return_as_di
         raise CatalogAlreadyExistsError
 
 
-def store_publicly_available_catalogs() -> None:
+class _SyncContext:
     """
-    Get all publicly available catalogs and store them in the database.
+    Settings and shared resources of a public catalogs sync.
 
-    :return: The number of catalogs stored
+    Sync workers run without an app context, so everything they need from the config is read up front.
     """
-    lookup_api: str = "https://stacindex.org/api/catalogs"
-    response = requests.get(lookup_api)
-    response_result = response.json()
-    filtered_response_result = [i for i in response_result if i['isPrivate'] == False and i['isApi'] == True]
-    results = []
 
-    def run_async(title, catalog_url, catalog_summary, results_list, app_for_context):
-        with app_for_context.app_context():
+    def __init__(self, config, fingerprints: Dict[str, Dict[any, any]]):
+        self.fingerprints = fingerprints
+        self.timeout = config['PUBLIC_CATALOGS_SYNC_TIMEOUT']
+        self.probe_workers = config['PUBLIC_CATALOGS_PROBE_WORKERS']
+        self.probe_timeout = config['PUBLIC_CATALOGS_PROBE_TIMEOUT']
+        self.limiter = HostConcurrencyLimiter(config['PUBLIC_CATALOGS_SYNC_PER_HOST_LIMIT'])
+        self.http_client = get_http_client(config)
+
+    def get(self, url: str, timeout: int = None, etag: str = None, last_modified: str = None) -> requests.Response:
+        """
+        Make a GET request through the shared HTTP client, respecting the per-host limit.
+
+        When validators of an earlier response are given the request is conditional, and an unchanged
+        document is answered with a 304 and no body.
+
+        :param url: Url to get
+        :param timeout: Timeout in seconds, defaults to the sync timeout
+        :param etag: ETag of an earlier response
+        :param last_modified: Last-Modified of an earlier response
+        :return: The response
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        with self.limiter.limit(url):
+            return self.http_client.get(url, timeout=timeout or self.timeout, headers=headers)
+
+
+def store_publicly_available_catalogs(prune: bool = None, force: bool = False) -> int:
+    """
+    Start a sync of all publicly available catalogs and store them in the database.
+
+    Catalogs are fetched by a bounded worker pool which never runs more than the configured number of requests
+    against a single host at once. Everything fetched is written to the database afterwards, in a single write
+    phase from one thread. Progress is recorded on a PublicCatalogsSyncRun entry.
+
+    The sync is incremental: documents are requested conditionally using the validators stored by the last sync,
+    and catalogs or collections whose canonical JSON hash did not change are neither probed nor rewritten.
+
+    :param prune: Remove stored collections which disappeared upstream, defaults to
+        PUBLIC_CATALOGS_SYNC_PRUNE_COLLECTIONS
+    :param force: Ignore the stored fingerprints and fetch and write everything
+    :return: Id of the sync run which can be used to check its progress
+    """
+    if prune is None:
+        prune = current_app.config['PUBLIC_CATALOGS_SYNC_PRUNE_COLLECTIONS']
+    max_workers = current_app.config['PUBLIC_CATALOGS_SYNC_WORKERS']
+    per_host_limit = current_app.config['PUBLIC_CATALOGS_SYNC_PER_HOST_LIMIT']
+    sync_run_id = make_public_catalogs_sync_run_entry(max_workers, per_host_limit)
+
+    def run_async(_sync_run_id, _prune, _force, _app):
+        with _app.app_context():
             try:
-                results_list.append(_store_catalog_and_collections(title, catalog_url, catalog_summary))
-            except:
-                results_list.append(None)
+                fetched_catalogs = _fetch_publicly_available_catalogs(_sync_run_id, _force)
+                _write_public_catalogs(_sync_run_id, fetched_catalogs, _prune)
+                set_public_catalogs_sync_run_entry(_sync_run_id, finished=True)
+            except Exception as e:
+                logging.error("Public catalogs sync failed: " + str(e))
+                db.session.rollback()
+                set_public_catalogs_sync_run_entry(_sync_run_id, finished=True, error_message=str(e))
 
     app = current_app._get_current_object()  # TODO: Is there a better way to do this?
-    for catalog in filtered_response_result:
-        t = Thread(target=run_async, args=(catalog['title'], catalog['url'], catalog['summary'], results, app))
-        t.start()
-    # while len(results) < len(filtered_response_result):
-    #     time.sleep(0.1)
-    # number_of_catalogs = len([i for i in results if i is not None])
-    # number_of_collections = sum([i for i in results if i is not None])
-    # return number_of_catalogs, number_of_collections
+    thread = Thread(target=run_async, args=(sync_run_id, prune, force, app))
+    thread.start()
+    return sync_run_id
+
+
+def _fetch_publicly_available_catalogs(sync_run_id: int, force: bool = False) -> List[Dict[any, any]]:
+    """
+    Fetch all publicly available catalogs and their collections, without touching the database.
+
+    :param sync_run_id: Id of the sync run to report progress to
+    :param force: Ignore the stored fingerprints
+    :return: List of fetched catalogs, see _fetch_public_catalog
+    """
+    fingerprints = {} if force else _load_catalog_fingerprints()
+    sync_context = _SyncContext(current_app.config, fingerprints)
+    lookup_etag, lookup_last_modified = (None, None) if force else get_last_public_catalogs_lookup_validators()
+    response = sync_context.get(current_app.config['PUBLIC_CATALOGS_LOOKUP_API'], etag=lookup_etag,
+                                last_modified=lookup_last_modified)
+    if response.status_code == 304:
+        # the list did not change, so it is the list of catalogs stored by the earlier syncs
+        catalogs = [{"title": catalog.name, "url": catalog.url, "summary": catalog.description}
+                    for catalog in PublicCatalog.query.all()]
+    else:
+        response_result = response.json()
+        catalogs = [i for i in response_result if i['isPrivate'] == False and i['isApi'] == True]
+        lookup_etag = response.headers.get('ETag')
+        lookup_last_modified = response.headers.get('Last-Modified')
+    set_public_catalogs_sync_run_entry(sync_run_id, catalogs_total=len(catalogs), lookup_etag=lookup_etag,
+                                       lookup_last_modified=lookup_last_modified)
+    return _fetch_public_catalogs_concurrently(sync_run_id, catalogs, sync_context)
+
+
+def _load_catalog_fingerprints() -> Dict[str, Dict[any, any]]:
+    """
+    Load the fingerprints stored by earlier syncs for all stored catalogs and their collections.
+
+    :return: Fingerprints keyed by catalog url
+    """
+    fingerprints = {}
+    urls_by_id = {}
+    for catalog_id, url, etag, last_modified, collections_hash in db.session.query(
+            PublicCatalog.id, PublicCatalog.url, PublicCatalog.collections_etag,
+            PublicCatalog.collections_last_modified, PublicCatalog.collections_hash):
+        urls_by_id[catalog_id] = url
+        fingerprints[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "collections_hash": collections_hash,
+            "collection_hashes": {}
+        }
+    for parent_catalog, collection_id, content_hash in db.session.query(
+            PublicCollection.parent_catalog, PublicCollection.id, PublicCollection.content_hash).filter(
+            PublicCollection.content_hash != None):
+        fingerprints[urls_by_id[parent_catalog]]["collection_hashes"][collection_id] = content_hash
+    return fingerprints
+
+
+def _fetch_public_catalogs_concurrently(sync_run_id: int, catalogs: List[Dict[any, any]],
+                                        sync_context: _SyncContext) -> List[Dict[any, any]]:
+    """
+    Fetch the given stacindex.org catalog entries on the sync worker pool.
+
+    :param sync_run_id: Id of the sync run to report progress to
+    :param catalogs: Catalog entries from the lookup api
+    :param sync_context: Context of the sync
+    :return: List of fetched catalogs
+    """
+    fetched_catalogs = []
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=current_app.config['PUBLIC_CATALOGS_SYNC_WORKERS']) as executor:
+        futures = [executor.submit(_fetch_public_catalog, catalog['title'], catalog['url'], catalog['summary'],
+                                   sync_context) for catalog in catalogs]
+        for future in as_completed(futures):
+            try:
+                fetched_catalog = future.result()
+            except Exception as e:
+                logging.error("Skipping catalog with error: " + str(e))
+                fetched_catalog = None
+            if fetched_catalog is None:
+                skipped += 1
+            else:
+                fetched_catalogs.append(fetched_catalog)
+            set_public_catalogs_sync_run_entry(sync_run_id, catalogs_fetched=len(fetched_catalogs),
+                                               catalogs_skipped=skipped)
+    return fetched_catalogs
+
+
+def _fetch_public_catalog(title: str, url: str, summary: str,
+                          sync_context: _SyncContext) -> Dict[any, any] or None:
+    """
+    Fetch a catalog and all its collections. Runs on a sync worker, so it must not use the database.
+
+    Only collections which are new or changed since the last sync are probed for items and returned.
+
+    :param title: Title of the catalog
+    :param url: Url of the catalog
+    :param summary: Summary of the catalog
+    :param sync_context: Context of the sync
+    :return: The fetched catalog, None if the catalog is not public or valid. The catalog is flagged as
+        unchanged when its /collections document did not change, otherwise it carries the collections to store,
+        the hashes of all collections and the ids of the collections which did not change.
+    """
+    fingerprint = sync_context.fingerprints.get(url)
+    if fingerprint is None and not _is_catalog_public_and_valid(url, sync_context):
+        return None
+    fingerprint = fingerprint or {"etag": None, "last_modified": None, "collections_hash": None,
+                                  "collection_hashes": {}}
+    url_removed_slash = url[:-1] if url.endswith('/') else url
+    response = sync_context.get(url_removed_slash + '/collections', etag=fingerprint["etag"],
+                                last_modified=fingerprint["last_modified"])
+    fetched_catalog = {
+        "title": title,
+        "url": url,
+        "summary": summary,
+        "unchanged": False,
+        "etag": response.headers.get('ETag') or fingerprint["etag"],
+        "last_modified": response.headers.get('Last-Modified') or fingerprint["last_modified"],
+        "collections_hash": fingerprint["collections_hash"],
+        "collections": [],
+        "collection_hashes": {},
+        "unchanged_collection_ids": list(fingerprint["collection_hashes"].keys()),
+        "retry_collection_ids": []
+    }
+    if response.status_code == 304:
+        fetched_catalog["unchanged"] = True
+        return fetched_catalog
+    if response.status_code != 200:
+        return None
+
+    collections = [collection for collection in response.json()['collections'] if 'id' in collection]
+    collection_hashes = {collection['id']: canonical_hash(collection) for collection in collections}
+    fetched_catalog["collections_hash"] = canonical_hash(collection_hashes)
+    if fetched_catalog["collections_hash"] == fingerprint["collections_hash"]:
+        fetched_catalog["unchanged"] = True
+        return fetched_catalog
+
+    stored_hashes = fingerprint["collection_hashes"]
+    changed_collections = [collection for collection in collections
+                           if stored_hashes.get(collection['id']) != collection_hashes[collection['id']]]
+    fetched_catalog["collections"], failed_collection_ids = _get_available_collections(changed_collections,
+                                                                                        sync_context)
+    fetched_catalog["collection_hashes"] = collection_hashes
+    fetched_catalog["unchanged_collection_ids"] = [collection_id for collection_id, content_hash in
+                                                   collection_hashes.items()
+                                                   if stored_hashes.get(collection_id) == content_hash]
+    # stored collections whose probe failed are kept as they are and probed again by the next sync
+    fetched_catalog["retry_collection_ids"] = [collection_id for collection_id in failed_collection_ids
+                                               if collection_id in stored_hashes]
+    if failed_collection_ids:
+        # without a fingerprint the next sync compares every collection hash, and the failed collections have
+        # no stored hash matching theirs
+        fetched_catalog["etag"] = None
+        fetched_catalog["last_modified"] = None
+        fetched_catalog["collections_hash"] = None
+    return fetched_catalog
+
+
+def _write_public_catalogs(sync_run_id: int, fetched_catalogs: List[Dict[any, any]], prune: bool = False) -> None:
+    """
+    Write all fetched catalogs and their collections to the database, one transaction per catalog.
+
+    Catalogs which did not change only get their validators refreshed.
+
+    :param sync_run_id: Id of the sync run to report progress to
+    :param fetched_catalogs: Catalogs returned by _fetch_publicly_available_catalogs
+    :param prune: Remove stored collections which are no longer offered by their catalog
+    """
+    catalogs_stored = 0
+    catalogs_unchanged = 0
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "pruned": 0}
+    for fetched_catalog in fetched_catalogs:
+        try:
+            if fetched_catalog["unchanged"]:
+                _store_catalog_fingerprint(fetched_catalog)
+                totals["unchanged"] += len(fetched_catalog["unchanged_collection_ids"])
+                catalogs_unchanged += 1
+                continue
+            counts = _store_catalog_and_collections(fetched_catalog, prune)
+            for key in totals:
+                totals[key] += counts[key]
+            catalogs_stored += 1
+        except Exception as e:
+            logging.error("Unable to store catalog " + fetched_catalog['url'] + ": " + str(e))
+            db.session.rollback()
+    set_public_catalogs_sync_run_entry(sync_run_id, catalogs_stored=catalogs_stored,
+                                       catalogs_unchanged=catalogs_unchanged,
+                                       collections_stored=totals["inserted"] + totals["updated"] + totals[
+                                           "unchanged"],
+                                       collections_inserted=totals["inserted"],
+                                       collections_updated=totals["updated"],
+                                       collections_unchanged=totals["unchanged"],
+                                       collections_pruned=totals["pruned"])
+
+
+def _store_catalog_fingerprint(fetched_catalog: Dict[any, any]) -> None:
+    """
+    Store the validators and hash of an unchanged catalog, without writing anything if they are already stored.
+
+    :param fetched_catalog: Catalog returned by _fetch_public_catalog
+    """
+    db.session.query(PublicCatalog).filter(
+        PublicCatalog.url == fetched_catalog["url"],
+        or_(PublicCatalog.collections_etag.is_distinct_from(fetched_catalog["etag"]),
+            PublicCatalog.collections_last_modified.is_distinct_from(fetched_catalog["last_modified"]),
+            PublicCatalog.collections_hash.is_distinct_from(fetched_catalog["collections_hash"]))
+    ).update({
+        PublicCatalog.collections_etag: fetched_catalog["etag"],
+        PublicCatalog.collections_last_modified: fetched_catalog["last_modified"],
+        PublicCatalog.collections_hash: fetched_catalog["collections_hash"]
+    }, synchronize_session=False)
+    db.session.commit()
 
 
 def remove_all_public_catalogs() -> None:
@@ -88,28 +353,43 @@ def remove_all_public_catalogs() -> None:
 
 
 def get_public_collections():
-    public_collections = PublicCollection.query.all()
-    out = []
-    for public_collection in public_collections:
-        out.append(public_collection.as_dict())
-    return out
+    data = db.session.query(*PublicCollection.serialization_columns())
+    return [PublicCollection.row_as_dict(row) for row in data]
+
+
+def get_parent_catalogs_of_public_collections(collection_ids: List[str]) -> Dict[str, int]:
+    """
+    Get the public catalog of each of the given collection ids which is a public collection.
 
+    Only the ids and catalogs are read, through the index of the (id, parent_catalog) unique constraint.
+    A collection id found in several public catalogs gets the one with the lowest id.
 
-def _is_catalog_public_and_valid(url: str) -> bool:
+    :param collection_ids: Collection ids
+    :return: Parent catalog id by collection id
+    """
+    if not collection_ids:
+        return {}
+    rows = db.session.query(PublicCollection.id, PublicCollection.parent_catalog).filter(
+        PublicCollection.id.in_(set(collection_ids))).order_by(PublicCollection.parent_catalog.desc())
+    return {collection_id: parent_catalog for collection_id, parent_catalog in rows}
+
+
+def _is_catalog_public_and_valid(url: str, sync_context: _SyncContext) -> bool:
     """
     Check if a catalog is public and valid.
 
     For the catalog to be valid it must have at least one collection with at least one item.
     :param url: Url of the catalog
+    :param sync_context: Context of the sync
     :return: True if the catalog is public and valid, False otherwise
     """
     url_removed_slash = url[:-1] if url.endswith('/') else url
-    response = requests.get(url_removed_slash + '/collections')
+    response = sync_context.get(url_removed_slash + '/collections')
     if response.status_code != 200:
         return False
     if len(response.json()['collections']) == 0:
         return False
-    response_2 = requests.get(url_removed_slash + '/search?limit=1')
+    response_2 = sync_context.get(url_removed_slash + '/search?limit=1')
     if response_2.status_code != 200:
         return False
     if len(response_2.json()['features']) != 1:
@@ -117,95 +397,132 @@ def _is_catalog_public_and_valid(url: str) -> bool:
     return True
 
 
-def _store_collections(public_catalog_entry: PublicCatalog) -> int:
+def _public_collection_row(parent_catalog_id: int, collection: Dict[any, any],
+                           content_hash: str = None) -> Dict[str, any]:
     """
-    Store all collections for a catalog in the database.
-    :param public_catalog_entry: PublicCatalog object
-    :return: The number of collections stored
+    Convert a collection fetched from a catalog into a row of the public collections table.
+
+    :param parent_catalog_id: Id of the catalog the collection belongs to
+    :param collection: Collection as returned by the catalog
+    :param content_hash: Hash of the canonical collection JSON
+    :return: Column values of the row
     """
-    count_added = 0
-    try:
-        collections_for_new_catalog: List[
-            Dict[any, any]] = _get_all_available_collections_from_public_catalog(public_catalog_entry)
-        for collection in collections_for_new_catalog:
-            public_collection: PublicCollection
-            public_collection: PublicCollection = PublicCollection.query.filter_by(
-                parent_catalog=public_catalog_entry.id, id=collection['id']).first()
-            if public_collection:
-                pass
+    start_time_string = collection['extent']['temporal']['interval'][0][0]
+    end_time_string = collection['extent']['temporal']['interval'][0][1]
+    shapely_boxes = [box(*bbox) for bbox in collection['extent']['spatial']['bbox']]
+    return {
+        "id": collection['id'],
+        "type": collection.get('type', "Collection"),
+        "title": collection.get('title'),
+        "description": collection.get('description'),
+        "temporal_extent_start": process_timestamp.process_timestamp_single_string(start_time_string),
+        "temporal_extent_end": process_timestamp.process_timestamp_single_string(end_time_string),
+        "spatial_extent": geoalchemy2.shape.from_shape(MultiPolygon(shapely_boxes), srid=4326),
+        "parent_catalog": parent_catalog_id,  # TODO: Rename to parent_catalog_id
+        "content_hash": content_hash,
+    }
 
-            else:
-                public_collection: PublicCollection = PublicCollection()
-                public_collection.id = collection['id']
-            try:
-                public_collection.type = collection['type']
-            except KeyError:
-                public_collection.type = "Collection"
-            try:
-                public_collection.title = collection['title']
-            except KeyError:
-                public_collection.title = None
-            try:
-                public_collection.description = collection['description']
-            except:
-                public_collection.description = None
-            start_time_string = collection['extent']['temporal']['interval'][0][0]
-            end_time_string = collection['extent']['temporal']['interval'][0][1]
-            public_collection.temporal_extent_start = process_timestamp.process_timestamp_single_string(
-                start_time_string)
-            public_collection.temporal_extent_end = process_timestamp.process_timestamp_single_string(end_time_string)
-            bboxes = collection['extent']['spatial']['bbox']
-            shapely_boxes = []
-            for i in range(0, len(bboxes)):
-                shapely_box = box(*(collection['extent']['spatial']['bbox'][i]))
-                shapely_boxes.append(shapely_box)
-            shapely_multi_polygon = geoalchemy2.shape.from_shape(MultiPolygon(shapely_boxes), srid=4326)
-            public_collection.spatial_extent = shapely_multi_polygon
-            public_collection.parent_catalog = public_catalog_entry.id  # TODO: Rename to parent_catalog_id
-            db.session.add(public_collection)
-            count_added += 1
-        db.session.commit()
 
-    except ConvertingTimestampError:
-        db.session.commit()
-        raise ConvertingTimestampError
-    except KeyError:
-        db.session.commit()
+def _store_collections(public_catalog_entry: PublicCatalog, collections: List[Dict[any, any]],
+                       prune: bool = False, collection_hashes: Dict[str, str] = None,
+                       unchanged_collection_ids: List[str] = None,
+                       retry_collection_ids: List[str] = None) -> Dict[str, int]:
+    """
+    Store all collections for a catalog in the database.
+
+    All collections are written with a single INSERT ... ON CONFLICT DO UPDATE on the
+    _id_parent_catalog_uc constraint, in one transaction together with the optional pruning.
+    Rows whose values did not change are not rewritten.
 
-    return count_added
+    :param public_catalog_entry: PublicCatalog object
+    :param collections: Collections fetched from the catalog
+    :param prune: Remove stored collections of the catalog which are not in collections or unchanged_collection_ids
+    :param collection_hashes: Hashes of the canonical collection JSON, keyed by collection id
+    :param unchanged_collection_ids: Ids of stored collections which did not change upstream and are not written
+    :param retry_collection_ids: Ids of stored collections which could not be fetched, kept but not written
+    :return: Number of inserted, updated, unchanged and pruned collections
+    """
+    collection_hashes = collection_hashes or {}
+    unchanged_collection_ids = unchanged_collection_ids or []
+    rows = {}
+    for collection in collections:
+        try:
+            rows[collection['id']] = _public_collection_row(public_catalog_entry.id, collection,
+                                                            collection_hashes.get(collection['id']))
+        except (KeyError, IndexError, TypeError, ValueError, ConvertingTimestampError) as e:
+            logging.error("Skipping collection with invalid extent: " + str(collection.get('id')))
+            logging.error(e)
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": len(unchanged_collection_ids), "pruned": 0}
+    table = PublicCollection.__table__
+    if rows:
+        statement = insert(table).values(list(rows.values()))
+        updatable_columns = ["type", "title", "description", "temporal_extent_start", "temporal_extent_end",
+                             "spatial_extent", "content_hash"]
+        statement = statement.on_conflict_do_update(
+            constraint='_id_parent_catalog_uc',
+            set_={column: statement.excluded[column] for column in updatable_columns},
+            where=or_(*[table.c[column].is_distinct_from(statement.excluded[column])
+                        for column in updatable_columns])
+        ).returning(sqlalchemy.literal_column("xmax = 0").label("inserted"))
+        # rows skipped by the where clause are not returned, so they are the unchanged ones
+        written = db.session.execute(statement).fetchall()
+        counts["inserted"] = sum(1 for row in written if row.inserted)
+        counts["updated"] = len(written) - counts["inserted"]
+        counts["unchanged"] += len(rows) - len(written)
+    collection_ids_to_keep = list(rows.keys()) + unchanged_collection_ids + (retry_collection_ids or [])
+    if prune and collection_ids_to_keep:
+        counts["pruned"] = db.session.query(PublicCollection).filter(
+            PublicCollection.parent_catalog == public_catalog_entry.id,
+            PublicCollection.id.notin_(collection_ids_to_keep)).delete(synchronize_session=False)
+    db.session.commit()
+    return counts
 
 
-def _store_catalog_and_collections(title, url, summary) -> int or None:
+def _store_catalog_and_collections(fetched_catalog: Dict[any, any], prune: bool = False) -> Dict[str, int]:
     """
-    Store a catalog and all its collections in the database.
+    Store a catalog, its fingerprint and all its collections in the database.
 
-    :param title: Title of the catalog
-    :param url: Url of the catalog
-    :param summary: Summary of the catalog
-    :return: Number of collections stored, None if the catalog is not public or valid
+    :param fetched_catalog: Catalog returned by _fetch_public_catalog
+    :param prune: Remove stored collections which are no longer offered by the catalog
+    :return: Number of inserted, updated, unchanged and pruned collections
     """
-    if not _is_catalog_public_and_valid(url):
-        return None
+    url = fetched_catalog['url']
     try:
-        new_catalog: PublicCatalog = store_new_public_catalog(title, url, summary, return_as_dict=False)
-        return _store_collections(new_catalog)
+        public_catalog_entry: PublicCatalog = store_new_public_catalog(fetched_catalog['title'], url,
+                                                                       fetched_catalog['summary'],
+                                                                       return_as_dict=False)
     except CatalogAlreadyExistsError:
-        already_existing_catalog: PublicCatalog = PublicCatalog.query.filter_by(url=url).first()
-        return _store_collections(already_existing_catalog)
+        public_catalog_entry: PublicCatalog = PublicCatalog.query.filter_by(url=url).first()
+    # committed together with the collections
+    public_catalog_entry.collections_etag = fetched_catalog['etag']
+    public_catalog_entry.collections_last_modified = fetched_catalog['last_modified']
+    public_catalog_entry.collections_hash = fetched_catalog['collections_hash']
+    return _store_collections(public_catalog_entry, fetched_catalog['collections'], prune,
+                              fetched_catalog['collection_hashes'], fetched_catalog['unchanged_collection_ids'],
+                              fetched_catalog['retry_collection_ids'])
 
 
 def search_collections(bbox: shapely.geometry.polygon.Polygon or list[float], time_interval_timestamp: str,
-                       public_catalog_id: int = None) -> dict[str, any] or list[any]:
+                       public_catalog_id: int = None, geojson: bool = False) -> dict[str, any] or list[any]:
+    """
+    Search stored public collections by spatial and temporal extent, grouped by their catalog.
+
+    One query serializes the matching collections in the database, a second one fetches their catalogs
+    together with the number of stored search parameters of each catalog.
+
+    :param bbox: Bounding box as [min_x, min_y, max_x, max_y] or a shapely polygon
+    :param time_interval_timestamp: Time interval as start/end, use .. for open ranges
+    :param public_catalog_id: Only search the collections of this catalog
+    :param geojson: Render the spatial extents as GeoJSON instead of WKT
+    :return: List of catalogs with their matching collections, or the single catalog if public_catalog_id is given
+    """
     if public_catalog_id:
-        try:
-            get_public_catalog_by_id_as_dict(public_catalog_id)
-        except CatalogDoesNotExistError:
+        if db.session.query(PublicCatalog.id).filter_by(id=public_catalog_id).first() is None:
             raise CatalogDoesNotExistError
 
-    if isinstance(bbox, list):
-        bbox = shapely.geometry.box(*bbox)
-    a = db.session.query(PublicCollection).filter(PublicCollection.spatial_extent.ST_Intersects(
-        f"SRID=4326;{bbox.wkt}"))
+    a = db.session.query(*PublicCollection.serialization_columns(geojson)).filter(
+        PublicCollection.spatial_extent_intersects(bbox))
     if public_catalog_id:
         a = a.filter(PublicCollection.parent_catalog == public_catalog_id)
     time_start, time_end = process_timestamp.process_timestamp_dual_string(time_interval_timestamp)
@@ -222,24 +539,31 @@ def search_collections(bbox: shapely.geometry.polygon.Polygon or list[float], ti
             or_(PublicCollection.temporal_extent_start <= time_end, PublicCollection.temporal_extent_start == None))
     else:
         pass
-    data = a.all()
+    collections = [PublicCollection.row_as_dict(row) for row in a]
+
+    number_of_stored_search_parameters = db.session.query(
+        StoredSearchParameters.associated_catalog_id,
+        func.count(StoredSearchParameters.id).label("count")
+    ).group_by(StoredSearchParameters.associated_catalog_id).subquery()
+    catalogs = db.session.query(
+        PublicCatalog, func.coalesce(number_of_stored_search_parameters.c.count, 0)
+    ).outerjoin(
+        number_of_stored_search_parameters,
+        number_of_stored_search_parameters.c.associated_catalog_id == PublicCatalog.id
+    ).filter(PublicCatalog.id.in_({collection["parent_catalog"] for collection in collections})).all()
+    catalogs_by_id = {catalog.id: catalog.as_dict(number) for catalog, number in catalogs}
+
     grouped_data = {}
-    for item in data:
-        item: PublicCollection
-        if item.parent_catalog in grouped_data:
-            grouped_data[item.parent_catalog]["collections"].append(item.as_dict())
-        else:
-            grouped_data[item.parent_catalog] = {}
-            grouped_data[item.parent_catalog]["catalog"] = PublicCatalog.query.filter_by(
-                id=item.parent_catalog).first().as_dict()
-            grouped_data[item.parent_catalog]["collections"] = []
-            grouped_data[item.parent_catalog]["collections"].append(item.as_dict())
+    for collection in collections:
+        group = grouped_data.get(collection["parent_catalog"])
+        if group is None:
+            group = grouped_data[collection["parent_catalog"]] = {
+                "catalog": catalogs_by_id[collection["parent_catalog"]],
+                "collections": []
+            }
+        group["collections"].append(collection)
     if not public_catalog_id:
-        keys = list(grouped_data.keys())
-        out = []
-        for i in keys:
-            out.append(grouped_data[i])
-        return out
+        return list(grouped_data.values())
     else:
         try:
             return grouped_data[public_catalog_id]
@@ -247,73 +571,139 @@ def search_collections(bbox: shapely.geometry.polygon.Polygon or list[float], ti
             return []
 
 
-def get_collections_from_public_catalog_id(public_catalog_id: int):
+def get_collections_from_public_catalog_id(public_catalog_id: int, geojson: bool = False):
     try:
         get_public_catalog_by_id_as_dict(public_catalog_id)
     except CatalogDoesNotExistError:
         raise PublicCatalogDoesNotExistError
-    data = PublicCollection.query.filter_by(parent_catalog=public_catalog_id).all()
-    out = []
-    for item in data:
-        out.append(item.as_dict())
-    return out
-
-
-def get_all_stored_public_collections_as_list_of_dict():
-    public_collections = PublicCollection.query.all()
-    out = []
-    for public_collection in public_collections:
-        out.append(public_collection.as_dict())
-    return out
-
-
-def _get_all_available_collections_from_public_catalog(public_catalogue_entry: PublicCatalog) -> List[Dict[
-    any, any]]:
-    """
-    Get all available collections from a public catalog.
-
-    :param public_catalogue_entry: PublicCatalog object
-    :return: List of all collections in the catalog
-    """
-    logging.info("Getting collections from catalog: " + public_catalogue_entry.name)
-    url = public_catalogue_entry.url
-    # if url ends with /, remove it
-    if url.endswith('/'):
-        url = url[:-1]
-    collections_url = url + '/collections'
-    response = requests.get(collections_url)
-    response_result = response.json()
-    # for each collection, check if it is empty
-    collections = response_result['collections']
-    collections_to_return = []
-    for collection in collections:
+    data = db.session.query(*PublicCollection.serialization_columns(geojson)).filter(
+        PublicCollection.parent_catalog == public_catalog_id)
+    return [PublicCollection.row_as_dict(row) for row in data]
+
+
+def get_all_stored_public_collections_as_list_of_dict(geojson: bool = False):
+    data = db.session.query(*PublicCollection.serialization_columns(geojson))
+    return [PublicCollection.row_as_dict(row) for row in data]
+
+
+def _public_collections_query(public_catalog_id: int = None, geojson: bool = False):
+    """
+    Query the public collections, with their _id as pagination cursor.
+
+    :param public_catalog_id: Only query the collections of this catalog
+    :param geojson: Render the spatial extents as GeoJSON instead of WKT
+    """
+    if public_catalog_id is not None:
         try:
-            # get the item link
-            links = collection['links']
-            # find link with rel type 'item'
-            item_link = None
-            for link in links:
-                if link['rel'] == 'items':
-                    item_link = link['href']
-                    break
-            # if item link is not found, skip this collection
-            if item_link is None:
-                logging.info("Skipping collection without item link: " + collection['title'])
-                continue
-            # if item link is found, check if it is empty
-            item_link_response = requests.get(item_link)
-            if item_link_response.status_code != 200:
-                logging.info("Skipping collection with not-public item link: " + collection['title'])
-                continue
-            item_link_response_json = item_link_response.json()
-            if len(item_link_response_json['features']) == 0:
-                logging.info("Skipping empty collection: " + collection['title'])
-                continue
-            collections_to_return.append(collection)
-        except Exception as e:
-            logging.error("Skipping collection with error: " + collection['title'])
-            logging.error(e)
-    return collections_to_return
+            get_public_catalog_by_id_as_dict(public_catalog_id)
+        except CatalogDoesNotExistError:
+            raise PublicCatalogDoesNotExistError
+    query = db.session.query(*PublicCollection.serialization_columns(geojson), PublicCollection._id)
+    if public_catalog_id is not None:
+        query = query.filter(PublicCollection.parent_catalog == public_catalog_id)
+    return query
+
+
+def get_public_collections_page(limit: int = None, next_token: str = None, public_catalog_id: int = None,
+                                geojson: bool = False) -> Dict[str, any]:
+    """
+    Get a page of the stored public collections.
+
+    :param limit: Page size
+    :param next_token: Token of the page to get, as returned with the previous page
+    :param public_catalog_id: Only list the collections of this catalog
+    :param geojson: Render the spatial extents as GeoJSON instead of WKT
+    :return: Dict with the collections as `items` and the `next` token
+    """
+    return pagination.paginate(_public_collections_query(public_catalog_id, geojson), PublicCollection._id,
+                               PublicCollection.row_as_dict, limit, next_token)
+
+
+def iterate_public_collections(limit: int = None, next_token: str = None, public_catalog_id: int = None,
+                               geojson: bool = False) -> Iterator[Dict[any, any]]:
+    """
+    Iterate over the stored public collections using a server-side cursor.
+
+    :param limit: Maximum number of collections, all when None
+    :param next_token: Start after the page this token was returned with
+    :param public_catalog_id: Only list the collections of this catalog
+    :param geojson: Render the spatial extents as GeoJSON instead of WKT
+    :return: Iterator of collections
+    """
+    return pagination.iterate(_public_collections_query(public_catalog_id, geojson), PublicCollection._id,
+                              PublicCollection.row_as_dict, limit, next_token)
+
+
+def _get_available_collections(collections: List[Dict[any, any]],
+                               sync_context: _SyncContext) -> Tuple[List[Dict[any, any]], List[str]]:
+    """
+    Get the collections of a public catalog which have public items.
+
+    :param collections: Collections as returned by the catalog
+    :param sync_context: Context of the sync
+    :return: List of available collections, in the order of the catalog, and the ids of the collections
+        whose probe failed, which are not known to be available or not
+    """
+    # check all collections for emptiness at once
+    with ThreadPoolExecutor(max_workers=sync_context.probe_workers) as executor:
+        has_items = list(executor.map(lambda c: _does_collection_have_items(c, sync_context), collections))
+    return [collection for collection, check in zip(collections, has_items) if check], \
+        [collection['id'] for collection, check in zip(collections, has_items) if check is None]
+
+
+def _does_collection_have_items(collection: Dict[any, any], sync_context: _SyncContext) -> Optional[bool]:
+    """
+    Probe the items link of a collection for a single item.
+
+    :param collection: Collection as returned by the catalog
+    :param sync_context: Context of the sync
+    :return: True if the collection has a public items link with at least one item, False otherwise, None
+        when the probe failed, e.g. timed out or the catalog answered with a server error
+    """
+    collection_name = collection.get('title') or collection.get('id')
+    try:
+        # find link with rel type 'items'
+        item_link = None
+        for link in collection.get('links', []):
+            if link.get('rel') == 'items':
+                item_link = link['href']
+                break
+        # if item link is not found, skip this collection
+        if item_link is None:
+            logging.info("Skipping collection without item link: " + str(collection_name))
+            return False
+        # only a single item is needed to know the collection is not empty
+        item_link_response = sync_context.get(_with_query_parameter(item_link, 'limit', '1'),
+                                              timeout=sync_context.probe_timeout)
+        if item_link_response.status_code >= 500 or item_link_response.status_code == 429:
+            logging.warning("Could not probe collection: " + str(collection_name))
+            return None
+        if item_link_response.status_code != 200:
+            logging.info("Skipping collection with not-public item link: " + str(collection_name))
+            return False
+        if len(item_link_response.json()['features']) == 0:
+            logging.info("Skipping empty collection: " + str(collection_name))
+            return False
+        return True
+    except Exception as e:
+        logging.error("Skipping collection with error: " + str(collection_name))
+        logging.error(e)
+        return None
+
+
+def _with_query_parameter(url: str, name: str, value: str) -> str:
+    """
+    Set a query parameter on a url, replacing any existing value.
+
+    :param url: Url to set the parameter on
+    :param name: Name of the query parameter
+    :param value: Value of the query parameter
+    :return: The url with the parameter set
+    """
+    parsed_url = urlparse(url)
+    query = dict(parse_qsl(parsed_url.query))
+    query[name] = value
+    return urlunparse(parsed_url._replace(query=urlencode(query)))
 
 
 def get_all_stored_public_catalogs_as_list_of_dict() -> List[Dict[any, any]]:
@@ -406,150 +796,85 @@ def update_specific_collections_via_catalog_id(catalog_id: int,
     if public_catalogue_entry is None:
         raise CatalogDoesNotExistError("No catalogue entry found for id: " +
                                        str(catalog_id))
-    stored_search_parameters: [StoredSearchParameters
-                               ] = StoredSearchParameters.query.filter_by(
-        associated_catalog_id=catalog_id).all()
-    stored_search_parameters_to_run = []
-    if collections is None or len(collections) == 0:
-        stored_search_parameters_to_run = stored_search_parameters
-        return _run_ingestion_task_force_update(
-            stored_search_parameters_to_run)
-    else:
-        for stored_search_parameter in stored_search_parameters:
-            used_search_parameters = json.loads(
-                stored_search_parameter.used_search_parameters)
-            used_search_parameters_collections = used_search_parameters[
-                'collections']
-            # if any collection in used_search_parameters_collections is in collections, then add to
-            # stored_search_parameters_to_run
-            check = any(item in used_search_parameters_collections
-                        for item in collections)
-            if check:
-                stored_search_parameters_to_run.append(stored_search_parameter)
-
-        return _run_ingestion_task_force_update(
-            stored_search_parameters_to_run)
+    query = StoredSearchParameters.query.filter_by(associated_catalog_id=catalog_id)
+    if collections:
+        # containment on the indexed parameters, matching any of the collections
+        query = query.filter(or_(*[
+            StoredSearchParameters.used_search_parameters.contains({"collections": [collection]})
+            for collection in collections]))
+    return _run_ingestion_task_force_update(query.all())
 
 
-def _call_ingestion_microservice(parameters) -> int:
+def _call_ingestion_microservice(parameters, covered_search_parameters: List[int] = None) -> int:
     """
     Call the ingestion microservice to load collections into the database.
 
-    Also saves the search parameters used to load the collections into the database so
-    the update can be called using the same parameters.
+    The call is queued and made by an ingestion worker, see ingestion_queue_service.
+    The parameters are kept on the status entry so the ingestion can be queued again after a crash.
+    A call identical to an unfinished one made less than INGESTION_DEDUP_WINDOW seconds before joins it,
+    and gets its work session id.
 
     :param parameters: STAC Filter parameters
+    :param covered_search_parameters: Ids of the stored search parameters run by this ingestion
     :return: Work session id which can be used to check the status of the ingestion
     """
     souce_stac_catalog_url = parameters['source_stac_catalog_url']
     target_stac_catalog_url = current_app.config['WRITE_STAC_API_SERVER']
     update = parameters['update']
-    callback_id = make_stac_ingestion_status_entry(souce_stac_catalog_url, target_stac_catalog_url, update)
+    dedup_window = current_app.config['INGESTION_DEDUP_WINDOW']
+    if dedup_window <= 0:
+        callback_id = make_stac_ingestion_status_entry(souce_stac_catalog_url, target_stac_catalog_url, update,
+                                                       parameters, covered_search_parameters)
+    else:
+        dedup_key = canonical_hash({**{k: v for k, v in parameters.items() if k != 'callback_id'},
+                                    'target_stac_catalog_url': target_stac_catalog_url})
+        callback_id, created = make_or_join_stac_ingestion_status_entry(
+            souce_stac_catalog_url, target_stac_catalog_url, update, parameters, dedup_key, dedup_window,
+            covered_search_parameters)
+        if not created:
+            return callback_id
     parameters['callback_id'] = callback_id
-    microservice_endpoint = current_app.config['STAC_SELECTIVE_INGESTER_ENDPOINT']
-
-    def run_async(_parameters, _app):
-        try:
-            response = requests.post(
-                microservice_endpoint,
-                json=_parameters, timeout=None)
-            if response.status_code != 200:
-                error_msg = response.text
-                with _app.app_context():
-                    set_stac_ingestion_status_entry(int(callback_id), error_message=error_msg)
-                    return
-            response_json = response.json()
-            newly_stored_collections = response_json['newly_stored_collections']
-            newly_stored_collections_count = response_json['newly_stored_collections_count']
-            updated_collections_count = response_json['updated_collections_count']
-            updated_collections = response_json['updated_collections']
-            newly_stored_items_count = response_json['newly_stored_items_count']
-            updated_items_count = response_json['updated_items_count']
-            already_stored_items_count = response_json['already_stored_items_count']
-            with _app.app_context():
-                set_stac_ingestion_status_entry(int(callback_id), newly_stored_collections_count,
-                                                newly_stored_collections,
-                                                updated_collections_count, updated_collections,
-                                                newly_stored_items_count,
-                                                updated_items_count, already_stored_items_count)
-            return response_json
-
-        except Exception as e:
-            with _app.app_context():
-                err = str({
-                    "error": "Unable to reach ingestion microservice"
-                })
-                set_stac_ingestion_status_entry(int(callback_id), error_message=err)
-            logging.error("Error: " + str(e))
-
-    app = current_app._get_current_object()  # TODO: Is there a better way to do this?
-    thread = Thread(target=run_async, args=(parameters, app))
-    thread.start()
+    # the user is waiting for this ingestion, unlike the planned bulk updates
+    ingestion_queue_service.enqueue_ingestion(callback_id, parameters, priority=True)
     return callback_id
 
 
 def _store_search_parameters(associated_catalogue_id,
-                             parameters: dict) -> None:
+                             parameters: dict) -> List[int]:
     """
     Store the search parameters used to load the collections into the database.
 
+    Parameters with collections are stored once per collection. All rows are written by a single statement,
+    and searches which are already stored, identified by their parameters_hash, are skipped.
+
     :param associated_catalogue_id: Catalogue id of the catalogue the collections were loaded from
     :param parameters: STAC Filter parameters
+    :return: Ids of the newly stored search parameters
     """
-    try:
-        for collection in parameters['collections']:
-            filtered_parameters = parameters.copy()
-            filtered_parameters['collections'] = [collection]
-
-            try:
-                stored_search_parameters = StoredSearchParameters()
-                stored_search_parameters.associated_catalog_id = associated_catalogue_id
-                stored_search_parameters.used_search_parameters = json.dumps(
-                    filtered_parameters)
-                stored_search_parameters.collection = collection
-                try:
-                    stored_search_parameters.bbox = json.dumps(
-                        filtered_parameters['bbox'])
-                except KeyError:
-                    pass
-                try:
-                    stored_search_parameters.datetime = json.dumps(
-                        filtered_parameters['datetime'])
-                except KeyError:
-                    pass
-
-                db.session.add(stored_search_parameters)
-                db.session.commit()
-            except sqlalchemy.exc.IntegrityError:
-                # exact same search parameters already exist, no need to store them again
-                pass
-            finally:
-                db.session.rollback()
-    except KeyError:
-        filtered_parameters = parameters.copy()
-        try:
-            stored_search_parameters = StoredSearchParameters()
-            stored_search_parameters.associated_catalog_id = associated_catalogue_id
-            stored_search_parameters.used_search_parameters = json.dumps(
-                filtered_parameters)
-            try:
-                stored_search_parameters.bbox = json.dumps(
-                    filtered_parameters['bbox'])
-            except KeyError:
-                pass
-            try:
-                stored_search_parameters.datetime = json.dumps(
-                    filtered_parameters['datetime'])
-            except KeyError:
-                pass
-
-            db.session.add(stored_search_parameters)
-            db.session.commit()
-        except sqlalchemy.exc.IntegrityError:
-            # exact same search parameters already exist, no need to store them again
-            pass
-        finally:
-            db.session.rollback()
+    if 'collections' in parameters:
+        searches = [(collection, {**parameters, 'collections': [collection]})
+                    for collection in parameters['collections']]
+    else:
+        searches = [("", parameters.copy())]
+    rows = {}
+    for collection, filtered_parameters in searches:
+        parameters_hash = canonical_hash(filtered_parameters)
+        rows[parameters_hash] = {
+            "associated_catalog_id": associated_catalogue_id,
+            "used_search_parameters": filtered_parameters,
+            "parameters_hash": parameters_hash,
+            "collection": collection,
+            "bbox": filtered_parameters.get('bbox'),
+            "datetime": filtered_parameters.get('datetime'),
+        }
+    if not rows:
+        return []
+    statement = insert(StoredSearchParameters).values(list(rows.values())) \
+        .on_conflict_do_nothing(index_elements=[StoredSearchParameters.parameters_hash]) \
+        .returning(StoredSearchParameters.id)
+    stored_ids = [i for i, in db.session.execute(statement)]
+    db.session.commit()
+    return stored_ids
 
 
 def remove_search_params_for_collection_id(collection_id: str) -> int:
@@ -571,26 +896,48 @@ def remove_search_params_for_collection_id(collection_id: str) -> int:
 
 def _run_ingestion_task_force_update(
         stored_search_parameters: [StoredSearchParameters
-                                   ]) -> list[int]:
+                                   ], spread_seconds: float = 0) -> list[int]:
     """
     Run the ingestion task for a list of stored search parameters but force update.
 
+    The stored parameters are planned into the minimal set of ingestions first, see
+    ingestion_planning.plan_ingestions, and every planned ingestion records the stored parameters it covers.
+
     :param stored_search_parameters: List of stored search parameters to run the ingestion task for
+    :param spread_seconds: Spread the start of the ingestions over this many seconds
     :return: List of work session ids which can be used to check the status of the ingestion
     """
-    responses_from_ingestion_microservice = []
-    for i in stored_search_parameters:
-        try:
-            used_search_parameters = json.loads(i.used_search_parameters)
-            used_search_parameters["target_stac_catalog_url"] = current_app.config["READ_STAC_API_SERVER"]
-            used_search_parameters["update"] = True
-            microservice_response = _call_ingestion_microservice(
-                used_search_parameters)
-            responses_from_ingestion_microservice.append(
-                microservice_response)
-        except ValueError:
-            pass
-    return responses_from_ingestion_microservice
+    used_search_parameters = [(i.id, dict(i.used_search_parameters)) for i in stored_search_parameters]
+    planned_ingestions = plan_ingestions(used_search_parameters,
+                                         current_app.config['INGESTION_PLAN_MAX_COLLECTIONS_PER_REQUEST'],
+                                         current_app.config['INGESTION_PLAN_MERGE_SLACK'])
+    target_stac_catalog_url = current_app.config["READ_STAC_API_SERVER"]
+    for planned_ingestion in planned_ingestions:
+        planned_ingestion.parameters["target_stac_catalog_url"] = target_stac_catalog_url
+        planned_ingestion.parameters["update"] = True
+    callback_ids = make_stac_ingestion_status_entries(
+        target_stac_catalog_url, True,
+        [(planned.parameters, planned.covered_parameter_ids) for planned in planned_ingestions])
+    ingestions = []
+    for callback_id, planned_ingestion in zip(callback_ids, planned_ingestions):
+        if callback_id is None:
+            continue
+        planned_ingestion.parameters['callback_id'] = callback_id
+        ingestions.append((callback_id, planned_ingestion.parameters))
+    ingestion_queue_service.enqueue_ingestions(ingestions, spread_seconds)
+    return [callback_id for callback_id, _ in ingestions]
+
+
+def refresh_stored_search_parameters(stored_search_parameters: [StoredSearchParameters],
+                                     spread_seconds: float = 0) -> list[int]:
+    """
+    Refresh stored search parameters, e.g. on a schedule, spreading the ingestions over spread_seconds.
+
+    :param stored_search_parameters: Stored search parameters to refresh
+    :param spread_seconds: Spread the start of the ingestions over this many seconds
+    :return: List of work session ids which can be used to check the status of the ingestion
+    """
+    return _run_ingestion_task_force_update(stored_search_parameters, spread_seconds)
 
 
 def remove_collection_from_public_catalog(catalog_id: int, collection_id: str):
@@ -642,11 +989,8 @@ def run_search_parameters(parameter_id: int) -> int:
     stored_search_parameters = StoredSearchParameters.query.filter_by(id=parameter_id).first()
     if stored_search_parameters is None:
         raise StoredSearchParametersDoesNotExistError
-    try:
-        used_search_parameters = json.loads(stored_search_parameters.used_search_parameters)
-        used_search_parameters["target_stac_catalog_url"] = current_app.config["READ_STAC_API_SERVER"]
-        used_search_parameters["update"] = True
-        microservice_response = _call_ingestion_microservice(used_search_parameters)
-        return microservice_response
-    except ValueError:
-        pass
+    used_search_parameters = dict(stored_search_parameters.used_search_parameters)
+    used_search_parameters["target_stac_catalog_url"] = current_app.config["READ_STAC_API_SERVER"]
+    used_search_parameters["update"] = True
+    microservice_response = _call_ingestion_microservice(used_search_parameters, [parameter_id])
+    return microservice_response
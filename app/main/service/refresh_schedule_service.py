@@ -0,0 +1,238 @@
+import datetime
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from .public_catalogs_service import refresh_stored_search_parameters
+from .. import db
+from ..custom_exceptions import *
+from ..model.public_catalogs_model import PublicCatalog, StoredSearchParameters
+from ..model.refresh_schedule_model import RefreshSchedule, RefreshRun
+from ..model.status_reporting_model import StacIngestionStatus
+from ..util.cron import CronSchedule
+from ..util.http_client import get_http_client
+
+
+def get_all_refresh_schedules() -> List[Dict[any, any]]:
+    a: [RefreshSchedule] = RefreshSchedule.query.order_by(RefreshSchedule.id).all()
+    return [i.as_dict() for i in a]
+
+
+def get_refresh_schedule_by_id(schedule_id: int) -> Dict[any, any]:
+    a: RefreshSchedule = RefreshSchedule.query.get(schedule_id)
+    if a is None:
+        raise RefreshScheduleDoesNotExistError
+    return a.as_dict()
+
+
+def make_refresh_schedule(cron: str, public_catalog_id: int = None, stored_search_parameters_id: int = None,
+                          window_seconds: int = 0, enabled: bool = True) -> Dict[any, any]:
+    """
+    Schedule the refresh of the stored search parameters of a public catalog, or of a single one of them.
+
+    :param cron: Five field cron expression of the runs, in UTC
+    :param public_catalog_id: Refresh all the stored search parameters of this catalog
+    :param stored_search_parameters_id: Refresh only these stored search parameters
+    :param window_seconds: Spread the ingestions of a run over this many seconds
+    :param enabled: Whether the schedule runs
+    :return: The schedule
+    """
+    if (public_catalog_id is None) == (stored_search_parameters_id is None):
+        raise ValueError("Either a public catalog or stored search parameters must be scheduled")
+    if public_catalog_id is not None and PublicCatalog.query.get(public_catalog_id) is None:
+        raise CatalogDoesNotExistError
+    if stored_search_parameters_id is not None and \
+            StoredSearchParameters.query.get(stored_search_parameters_id) is None:
+        raise StoredSearchParametersDoesNotExistError
+    refresh_schedule = RefreshSchedule()
+    refresh_schedule.cron = cron
+    refresh_schedule.public_catalog_id = public_catalog_id
+    refresh_schedule.stored_search_parameters_id = stored_search_parameters_id
+    refresh_schedule.window_seconds = max(0, window_seconds)
+    refresh_schedule.enabled = enabled
+    refresh_schedule.next_run_at = _next_run_at(cron, datetime.datetime.utcnow())
+    db.session.add(refresh_schedule)
+    db.session.commit()
+    return refresh_schedule.as_dict()
+
+
+def remove_refresh_schedule(schedule_id: int) -> Dict[any, any]:
+    a: RefreshSchedule = RefreshSchedule.query.get(schedule_id)
+    if a is None:
+        raise RefreshScheduleDoesNotExistError
+    db.session.delete(a)
+    db.session.commit()
+    return a.as_dict()
+
+
+def get_refresh_runs(schedule_id: int) -> List[Dict[any, any]]:
+    if RefreshSchedule.query.get(schedule_id) is None:
+        raise RefreshScheduleDoesNotExistError
+    a: [RefreshRun] = RefreshRun.query.filter_by(schedule_id=schedule_id).order_by(RefreshRun.id.desc()).all()
+    return [i.as_dict() for i in a]
+
+
+def _next_run_at(cron: str, after: datetime.datetime) -> datetime.datetime:
+    # schedules with the same expression do not all fire in the same second
+    jitter = random.uniform(0, current_app.config['REFRESH_SCHEDULE_JITTER'])
+    return CronSchedule(cron).next_after(after) + datetime.timedelta(seconds=jitter)
+
+
+def _get_upstream_updated(collections: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+    """
+    Get the `updated` timestamps of collections from their source catalogs.
+
+    :param collections: Source catalog urls and ids of the collections
+    :return: Timestamp of every collection, None when unknown
+    """
+    http_client = get_http_client()
+
+    def fetch(collection: Tuple[str, str]) -> Optional[str]:
+        url, collection_id = collection
+        try:
+            response = http_client.get(url.rstrip('/') + '/collections/' + collection_id)
+            if response.status_code != 200:
+                return None
+            return response.json().get('updated')
+        except Exception as e:
+            logging.warning(f"Unable to get collection {collection_id} of {url}: " + str(e))
+            return None
+
+    with ThreadPoolExecutor(max_workers=current_app.config['REFRESH_UPSTREAM_WORKERS']) as executor:
+        return dict(zip(collections, executor.map(fetch, collections)))
+
+
+def _run_refresh_schedule(refresh_schedule: RefreshSchedule) -> RefreshRun:
+    """
+    Refresh the stored search parameters of a schedule whose upstream collection changed.
+
+    Search parameters of a single collection are skipped when the `updated` timestamp of the collection
+    upstream is the one seen by the last successful refresh. The others are refreshed by planned
+    ingestions spread over the window of the schedule.
+    """
+    query = StoredSearchParameters.query
+    if refresh_schedule.stored_search_parameters_id is not None:
+        query = query.filter_by(id=refresh_schedule.stored_search_parameters_id)
+    else:
+        query = query.filter_by(associated_catalog_id=refresh_schedule.public_catalog_id)
+    stored_search_parameters: [StoredSearchParameters] = query.all()
+
+    def collection_of(parameters: StoredSearchParameters) -> Optional[Tuple[str, str]]:
+        collections = parameters.used_search_parameters.get('collections')
+        source_url = parameters.used_search_parameters.get('source_stac_catalog_url')
+        if source_url is None or collections is None or len(collections) != 1:
+            return None
+        return source_url, collections[0]
+
+    collections = {collection_of(i) for i in stored_search_parameters} - {None}
+    upstream_updated = _get_upstream_updated(sorted(collections))
+    to_run = []
+    seen_updated = {}
+    for parameters in stored_search_parameters:
+        updated = upstream_updated.get(collection_of(parameters))
+        if updated is not None and updated == parameters.upstream_updated:
+            continue
+        to_run.append(parameters)
+        if updated is not None:
+            seen_updated[str(parameters.id)] = updated
+
+    refresh_run = RefreshRun()
+    refresh_run.schedule_id = refresh_schedule.id
+    refresh_run.time_started = datetime.datetime.utcnow()
+    refresh_run.parameters_scheduled = len(to_run)
+    refresh_run.parameters_skipped = len(stored_search_parameters) - len(to_run)
+    refresh_run.upstream_updated = seen_updated
+    try:
+        callback_ids = refresh_stored_search_parameters(to_run, refresh_schedule.window_seconds) if to_run else []
+        refresh_run.callback_ids = ",".join(str(i) for i in callback_ids)
+        if not callback_ids:
+            refresh_run.time_finished = refresh_run.time_started
+            refresh_run.ingestions_succeeded = 0
+            refresh_run.ingestions_failed = 0
+    except Exception as e:
+        logging.error(f"Refresh schedule {refresh_schedule.id} failed: " + str(e))
+        db.session.rollback()
+        refresh_run.error_message = str(e)
+        refresh_run.time_finished = datetime.datetime.utcnow()
+    db.session.add(refresh_run)
+    db.session.commit()
+    return refresh_run
+
+
+def finish_refresh_runs() -> List[int]:
+    """
+    Finish the refresh runs whose ingestions are all finished.
+
+    The upstream timestamps seen by a run are stored on the search parameters covered by its successful
+    ingestions, so the next runs skip them until their collection changes upstream. Ingestions whose status
+    was removed, e.g. by the status retention, are counted neither as succeeded nor as failed, and are
+    reported in the error message of the run.
+
+    :return: Ids of the finished runs
+    """
+    finished = []
+    for refresh_run in RefreshRun.query.filter(RefreshRun.time_finished.is_(None)).all():
+        callback_ids = [int(i) for i in refresh_run.callback_ids.split(",") if i]
+        statuses: [StacIngestionStatus] = StacIngestionStatus.query.filter(
+            StacIngestionStatus.id.in_(callback_ids)).all()
+        if any(status.time_finished is None for status in statuses):
+            continue
+        succeeded = [status for status in statuses if not status.error_message]
+        refreshed_ids = {int(i) for status in succeeded
+                         for i in (status.covered_search_parameters or "").split(",") if i}
+        seen_updated = refresh_run.upstream_updated or {}
+        for parameters in StoredSearchParameters.query.filter(
+                StoredSearchParameters.id.in_([int(i) for i in seen_updated if int(i) in refreshed_ids])):
+            parameters.upstream_updated = seen_updated[str(parameters.id)]
+        refresh_run.ingestions_succeeded = len(succeeded)
+        refresh_run.ingestions_failed = len(statuses) - len(succeeded)
+        missing = sorted(set(callback_ids) - {status.id for status in statuses})
+        if missing:
+            logging.warning(f"Refresh run {refresh_run.id} has no status for ingestions {missing}")
+            refresh_run.error_message = "Unknown result of ingestions whose status was removed: " + \
+                                        ", ".join(str(i) for i in missing)
+        refresh_run.time_finished = max([status.time_finished for status in statuses],
+                                        default=datetime.datetime.utcnow())
+        db.session.commit()
+        finished.append(refresh_run.id)
+    return finished
+
+
+def run_due_refresh_schedules() -> List[int]:
+    """
+    Run the enabled schedules which are due, after finishing the previous runs.
+
+    Due schedules are claimed by moving them to their next run in one transaction, skipping the ones another
+    scheduler is claiming, so several schedulers can run at once without running a schedule twice.
+
+    :return: Ids of the started runs
+    """
+    finish_refresh_runs()
+    now = datetime.datetime.utcnow()
+    due: [RefreshSchedule] = RefreshSchedule.query.filter(
+        RefreshSchedule.enabled.is_(True), RefreshSchedule.next_run_at <= now
+    ).order_by(RefreshSchedule.next_run_at).with_for_update(skip_locked=True).all()
+    for refresh_schedule in due:
+        refresh_schedule.last_run_at = now
+        refresh_schedule.next_run_at = _next_run_at(refresh_schedule.cron, now)
+    db.session.commit()
+    return [_run_refresh_schedule(refresh_schedule).id for refresh_schedule in due]
+
+
+def run_refresh_scheduler():
+    """
+    Run the due refresh schedules every REFRESH_SCHEDULER_POLL_INTERVAL seconds, until stopped.
+    """
+    while True:
+        try:
+            run_due_refresh_schedules()
+        except Exception as e:
+            logging.error("Refresh scheduler failed: " + str(e))
+            db.session.rollback()
+        finally:
+            db.session.remove()
+        time.sleep(current_app.config['REFRESH_SCHEDULER_POLL_INTERVAL'])
@@ -1,6 +1,13 @@
+import logging
+import multiprocessing
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import mimetypes
+from threading import Lock
 
 import pystac
 from flask import current_app
@@ -14,8 +21,109 @@ stac_extensions = {
     "view": "https://stac-extensions.github.io/view/v1.0.0/schema.json",
 }
 
+_pool = None
+_pool_lock = Lock()
 
-def create_STAC_Item(metadata):
+
+def _workers():
+    return current_app.config["STAC_GENERATOR_WORKERS"] or os.cpu_count()
+
+
+def _get_pool():
+    """
+    Pool of the processes generating items, started on first use and shared by the requests of this process.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # the web process runs threads, which forked children could inherit in a locked state
+            _pool = ProcessPoolExecutor(max_workers=_workers(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool):
+    """
+    Forget a broken pool, so the next call to _get_pool starts a new one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _generate_item(metadata, connection_string):
+    try:
+        return create_STAC_Item(metadata, connection_string), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def generate_STAC_Items(documents, ordered=True):
+    """
+    Generate the STAC items of many metadata documents over a pool of STAC_GENERATOR_WORKERS processes.
+
+    Documents are read from the iterator as the pool needs them, so no more than a few per process are held
+    at once.
+
+    :param documents: Metadata documents, or objects with the document as `metadata`
+    :param ordered: Return the results in the order of the documents, otherwise as they are generated
+    :return: Iterator of the item, or the error, of every document with its index in `documents`
+    """
+    pool = _get_pool()
+    connection_string = current_app.config["AZURE_STORAGE_CONNECTION_STRING"]
+    window = _workers() * 4
+    pending = deque() if ordered else set()
+    indexes = {}
+    pools = {}
+
+    def result(future):
+        try:
+            item, error = future.result()
+        except BrokenProcessPool as e:
+            # a process of the pool died, e.g. killed when out of memory
+            _discard_pool(pools.pop(future))
+            item, error = None, f"{type(e).__name__}: {e}"
+        except Exception as e:
+            item, error = None, f"{type(e).__name__}: {e}"
+        pools.pop(future, None)
+        if error is not None:
+            logging.error(f"Generating the STAC item of document {indexes[future]} failed: {error}")
+            return {"index": indexes.pop(future), "error": error}
+        return {"index": indexes.pop(future), "item": item}
+
+    for index, document in enumerate(documents):
+        if isinstance(document, dict) and "metadata" in document:
+            document = document["metadata"]
+        try:
+            future = pool.submit(_generate_item, document, connection_string)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            pool = _get_pool()
+            future = pool.submit(_generate_item, document, connection_string)
+        indexes[future] = index
+        pools[future] = pool
+        if ordered:
+            pending.append(future)
+            if len(pending) >= window:
+                yield result(pending.popleft())
+        else:
+            pending.add(future)
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield result(future)
+    if ordered:
+        while pending:
+            yield result(pending.popleft())
+    else:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield result(future)
+
+
+def create_STAC_Item(metadata, connection_string=None):
     # EPSG (Source and destination)
     src_crs = return_epsg_from_wkt(metadata["staticVariables"]["wkt"])
     destination_crs = "epsg:4326"  # All STAC Items are in EPSG:4326
@@ -61,7 +169,8 @@ def create_STAC_Item(metadata):
         properties=properties,
     )
 
-    connection_string = current_app.config["AZURE_STORAGE_CONNECTION_STRING"]
+    if connection_string is None:
+        connection_string = current_app.config["AZURE_STORAGE_CONNECTION_STRING"]
     # split the connection string by ;
     account_key = connection_string.split("AccountKey=")[1].split(";")[0]
     connection_string_split = connection_string.split(";")
@@ -0,0 +1,165 @@
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import exists
+from sqlalchemy.orm import aliased
+
+from . import stac_service
+from .. import db
+from ..custom_exceptions import *
+from ..model.stac_outbox_model import StacOutboxOperation, PENDING, DELIVERING, DELIVERED, FAILED
+
+CREATE_COLLECTION = "create_collection"
+UPDATE_COLLECTION = "update_collection"
+REMOVE_COLLECTION = "remove_collection"
+
+
+def add_stac_outbox_operation(operation: str, collection_id: str,
+                              payload: Dict[str, any] = None) -> StacOutboxOperation:
+    """
+    Record a write to the STAC API in the current transaction, to be delivered by the outbox relay once the
+    transaction is committed. The caller commits.
+
+    :param operation: One of CREATE_COLLECTION, UPDATE_COLLECTION and REMOVE_COLLECTION
+    :param collection_id: Id of the written collection
+    :param payload: Collection to send to the STAC API
+    :return: The operation, whose id is known after a flush
+    """
+    stac_outbox_operation = StacOutboxOperation()
+    stac_outbox_operation.operation = operation
+    stac_outbox_operation.collection_id = collection_id
+    stac_outbox_operation.payload = payload
+    stac_outbox_operation.state = PENDING
+    stac_outbox_operation.time_created = datetime.datetime.utcnow()
+    stac_outbox_operation.next_attempt_at = stac_outbox_operation.time_created
+    db.session.add(stac_outbox_operation)
+    db.session.flush()
+    return stac_outbox_operation
+
+
+def get_stac_outbox_operation_by_id(operation_id: int) -> Dict[any, any]:
+    a: StacOutboxOperation = StacOutboxOperation.query.get(operation_id)
+    if a is None:
+        raise StacOutboxOperationDoesNotExistError
+    return a.as_dict()
+
+
+def _claim_stac_outbox_operations(batch_size: int) -> List[Tuple[int, str, str, Dict[str, any]]]:
+    """
+    Claim the next operations to deliver, at most one per collection so the writes of a collection are
+    delivered in order.
+
+    Claimed operations are leased for STAC_OUTBOX_LEASE_SECONDS, after which a relay which died is assumed
+    and they are claimed again. Rows claimed by another relay are skipped.
+    """
+    now = datetime.datetime.utcnow()
+    earlier = aliased(StacOutboxOperation)
+    undelivered = (PENDING, DELIVERING)
+    operations: [StacOutboxOperation] = StacOutboxOperation.query.filter(
+        StacOutboxOperation.state.in_(undelivered),
+        StacOutboxOperation.next_attempt_at <= now,
+        ~exists().where(earlier.collection_id == StacOutboxOperation.collection_id,
+                        earlier.id < StacOutboxOperation.id,
+                        earlier.state.in_(undelivered))
+    ).order_by(StacOutboxOperation.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    claimed = [(i.id, i.operation, i.collection_id, i.payload) for i in operations]
+    for operation in operations:
+        operation.state = DELIVERING
+        operation.attempts += 1
+        operation.next_attempt_at = now + datetime.timedelta(seconds=current_app.config['STAC_OUTBOX_LEASE_SECONDS'])
+    db.session.commit()
+    return claimed
+
+
+def _deliver(operation: str, collection_id: str, payload: Dict[str, any]) -> Dict[str, any]:
+    if operation == CREATE_COLLECTION:
+        try:
+            return stac_service.create_new_collection_on_stac_api(payload)
+        except CollectionAlreadyExistsError:
+            return stac_service.update_existing_collection_on_stac_api(payload)
+    if operation == UPDATE_COLLECTION:
+        try:
+            return stac_service.update_existing_collection_on_stac_api(payload)
+        except (CollectionAlreadyExistsError, PrivateCollectionDoesNotExistError):
+            # the STAC API reports a missing collection on update as a conflict
+            return stac_service.create_new_collection_on_stac_api(payload)
+    if operation == REMOVE_COLLECTION:
+        try:
+            return stac_service.remove_private_collection_by_id_on_stac_api(collection_id)
+        except PrivateCollectionDoesNotExistError:
+            return {"message": "Collection does not exist on STAC API"}
+    raise ValueError("Unknown outbox operation " + operation)
+
+
+def relay_stac_outbox() -> int:
+    """
+    Deliver a batch of STAC_OUTBOX_BATCH_SIZE operations to the STAC API, STAC_OUTBOX_WORKERS at once.
+
+    No database transaction is open while the STAC API is called. Operations failing because the STAC API
+    is unavailable are tried again with an exponential backoff, up to STAC_OUTBOX_MAX_ATTEMPTS times.
+    Operations the STAC API refuses are failed at once.
+
+    :return: Number of operations claimed
+    """
+    claimed = _claim_stac_outbox_operations(current_app.config['STAC_OUTBOX_BATCH_SIZE'])
+    if not claimed:
+        return 0
+    app = current_app._get_current_object()
+
+    def deliver(operation: Tuple[int, str, str, Dict[str, any]]) -> Tuple[Optional[Dict[str, any]], str, bool]:
+        _, name, collection_id, payload = operation
+        with app.app_context():
+            try:
+                response = _deliver(name, collection_id, payload)
+            except InvalidCollectionPayloadError:
+                return None, "Invalid collection payload", False
+            except Exception as e:
+                return None, str(e), True
+        error_code = response.get("error_code") if isinstance(response, dict) else None
+        if error_code is not None:
+            return response, f"STAC API answered {error_code}", error_code >= 500 or error_code == 429
+        return response, None, False
+
+    with ThreadPoolExecutor(max_workers=current_app.config['STAC_OUTBOX_WORKERS']) as executor:
+        results = dict(zip([i[0] for i in claimed], executor.map(deliver, claimed)))
+
+    now = datetime.datetime.utcnow()
+    for operation in StacOutboxOperation.query.filter(StacOutboxOperation.id.in_(results.keys())):
+        response, error, retry = results[operation.id]
+        operation.response = response
+        operation.last_error = error
+        if error is None:
+            operation.state = DELIVERED
+            operation.time_delivered = now
+        elif retry and operation.attempts < current_app.config['STAC_OUTBOX_MAX_ATTEMPTS']:
+            operation.state = PENDING
+            backoff = current_app.config['STAC_OUTBOX_BACKOFF'] * 2 ** (operation.attempts - 1)
+            operation.next_attempt_at = now + datetime.timedelta(seconds=min(backoff, 3600))
+            logging.warning(f"Outbox operation {operation.id} failed, trying again: {error}")
+        else:
+            operation.state = FAILED
+            logging.error(f"Outbox operation {operation.id} failed: {error}")
+    db.session.commit()
+    return len(claimed)
+
+
+def run_stac_outbox_relay():
+    """
+    Deliver the outbox to the STAC API until stopped, waiting STAC_OUTBOX_POLL_INTERVAL seconds when it is
+    empty. Several relays can run at once.
+    """
+    while True:
+        try:
+            claimed = relay_stac_outbox()
+        except Exception as e:
+            logging.error("Outbox relay failed: " + str(e))
+            db.session.rollback()
+            claimed = 0
+        finally:
+            db.session.remove()
+        if not claimed:
+            time.sleep(current_app.config['STAC_OUTBOX_POLL_INTERVAL'])
@@ -1,25 +1,41 @@
-from typing import Dict, Tuple
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import urljoin
 
 import requests
 from flask import Response
-from flask import current_app
+from flask import current_app, stream_with_context
 
 from . import public_catalogs_service
 from ..custom_exceptions import *
+from ..util import http_client
+from ..util.pagination import NDJSON_MIMETYPE
+from ..util import proxy
+from ..util import response_cache
+
+# query parameters of the items of a collection forwarded to the read STAC API
+ITEMS_QUERY_PARAMETERS = ("limit", "token", "bbox", "datetime")
+SEARCH_AGGREGATIONS = ("collection", "datetime")
+# length of the RFC 3339 prefix identifying an interval of the temporal histogram
+_HISTOGRAM_INTERVALS = {"year": 4, "month": 7, "day": 10, "hour": 13}
+# fields needed by the aggregations, requested through the fields extension when no feature is returned
+_AGGREGATION_FIELDS = ["id", "collection", "properties.datetime", "properties.start_datetime"]
 
 
 def get_all_collections() -> dict[str, any]:
-    response = requests.get(urljoin(current_app.config["READ_STAC_API_SERVER"], "collections/"))
+    response = http_client.get(urljoin(current_app.config["READ_STAC_API_SERVER"], "collections/"))
     if response.status_code in range(200, 203):
         collection_json = response.json()
-        public_collections: [] = public_catalogs_service.get_public_collections()
-        public_collections_ids = [collection["id"] for collection in public_collections]
+        parent_catalogs = public_catalogs_service.get_parent_catalogs_of_public_collections(
+            [collection["id"] for collection in collection_json["collections"]])
         for collection in collection_json["collections"]:
             collection["management_metadata"] = {}
-            if collection["id"] in public_collections_ids:
-                index = public_collections_ids.index(collection["id"])
-                collection["management_metadata"]["parent_catalog_id"] = public_collections[index]["parent_catalog"]
+            if collection["id"] in parent_catalogs:
+                collection["management_metadata"]["parent_catalog_id"] = parent_catalogs[collection["id"]]
                 collection["management_metadata"]["is_public"] = True
             else:
                 collection["management_metadata"]["is_public"] = False
@@ -32,7 +48,7 @@ def get_all_collections() -> dict[str, any]:
 
 def get_collection_by_id(
         collection_id: str) -> dict[str, any]:
-    response = requests.get(urljoin(current_app.config["READ_STAC_API_SERVER"], "collections/") + collection_id)
+    response = http_client.get(urljoin(current_app.config["READ_STAC_API_SERVER"], "collections/") + collection_id)
     if response.status_code in range(200, 203):
         collection_json = response.json()
         return collection_json
@@ -46,13 +62,40 @@ def get_collection_by_id(
         return resp
 
 
+def _items_url(collection_id: str) -> str:
+    return urljoin(current_app.config["READ_STAC_API_SERVER"], "collections/") + collection_id + "/items"
+
+
+def _items_link_replacements(collection_id: str, portal_items_url: str) -> Dict[str, str]:
+    """
+    Replacements pointing the links to the items of a collection on the read STAC API, like the next page,
+    at the portal. Links to single items are left alone.
+    """
+    upstream_items_url = _items_url(collection_id)
+    return {upstream_items_url + "?": portal_items_url + "?", upstream_items_url + '"': portal_items_url + '"'}
+
+
 def get_items_by_collection_id(
-        collection_id: str) -> dict[str, any]:
-    response = requests.get(
-        urljoin(current_app.config["READ_STAC_API_SERVER"], "collections/") + collection_id + "/items")
+        collection_id: str, parameters: Dict[str, str] = None, portal_items_url: str = None) -> dict[str, any]:
+    """
+    Get a page of the items of a collection from the read STAC API.
+
+    :param collection_id: Id of the collection
+    :param parameters: Query parameters forwarded to the STAC API, see ITEMS_QUERY_PARAMETERS
+    :param portal_items_url: Url of the items of the collection on the portal, which the links to other pages
+        are rewritten to
+    :return: FeatureCollection of the items
+    """
+    response = http_client.get(_items_url(collection_id), params=parameters)
 
     if response.status_code in range(200, 203):
         collection_json = response.json()
+        if portal_items_url is not None:
+            upstream_items_url = _items_url(collection_id)
+            for link in collection_json.get("links", []):
+                href = link.get("href", "")
+                if href == upstream_items_url or href.startswith(upstream_items_url + "?"):
+                    link["href"] = portal_items_url + href[len(upstream_items_url):]
         return collection_json
     elif response.status_code == 404:
         raise CollectionDoesNotExistError
@@ -64,10 +107,182 @@ def get_items_by_collection_id(
         return resp
 
 
+def stream_items_by_collection_id(collection_id: str, parameters: Dict[str, str],
+                                  portal_items_url: str) -> Response:
+    """
+    Forward a page of the items of a collection from the read STAC API as it arrives, without decoding it.
+
+    Memory use does not depend on the size of the page. The links to other pages are rewritten to the portal.
+
+    :param collection_id: Id of the collection
+    :param parameters: Query parameters forwarded to the STAC API, see ITEMS_QUERY_PARAMETERS
+    :param portal_items_url: Url of the items of the collection on the portal
+    :return: Streamed response
+    """
+    response = http_client.get(_items_url(collection_id), params=parameters, stream=True)
+    if response.status_code in (404, 424):
+        response.close()
+        raise CollectionDoesNotExistError
+    replacements = _items_link_replacements(collection_id, portal_items_url)
+    return proxy.stream_upstream_response(response, current_app.config["STAC_PROXY_CHUNK_SIZE"],
+                                          {old.encode(): new.encode() for old, new in replacements.items()})
+
+
+def _search_body(search: Dict[str, any]) -> Dict[str, any]:
+    body = {k: v for k, v in search.items() if v not in (None, [], "", "{}")}
+    if isinstance(body.get("intersects"), str):
+        try:
+            body["intersects"] = json.loads(body["intersects"])
+        except ValueError:
+            raise InvalidSearchArgumentsError("intersects must be a GeoJSON geometry")
+    return body
+
+
+def _search_pages(search: Dict[str, any]) -> Iterator[Dict[str, any]]:
+    """
+    Pages of a search on the read STAC API. A page is requested only once the previous one is consumed, by
+    following its next link, which may be a GET or a POST with a body to merge into the search.
+    """
+    method, url, body = "POST", urljoin(current_app.config["READ_STAC_API_SERVER"], "search"), search
+    while True:
+        response = http_client.request(method, url, json=body)
+        if response.status_code not in range(200, 203):
+            raise StacSearchFailedError(f"STAC API search answered {response.status_code}: {response.text}")
+        page = response.json()
+        yield page
+        next_link = next((link for link in page.get("links", []) if link.get("rel") == "next"), None)
+        if next_link is None or not page.get("features"):
+            return
+        method = next_link.get("method", "GET").upper()
+        url = next_link["href"]
+        if method == "GET":
+            body = None
+        elif next_link.get("merge"):
+            body = {**search, **next_link.get("body", {})}
+        else:
+            body = next_link.get("body", search)
+
+
+class _SearchAggregations:
+    """
+    Aggregations of the features of a search, computed one feature at a time.
+    """
+
+    def __init__(self, aggregations: List[str], interval: str):
+        self.collections = Counter() if "collection" in aggregations else None
+        self.histogram = Counter() if "datetime" in aggregations else None
+        self.interval = interval
+
+    def add(self, feature: Dict[str, any]):
+        if self.collections is not None:
+            self.collections[feature.get("collection")] += 1
+        if self.histogram is not None:
+            properties = feature.get("properties") or {}
+            timestamp = properties.get("datetime") or properties.get("start_datetime")
+            if timestamp:
+                # STAC API timestamps are UTC, so their prefix is the interval
+                self.histogram[timestamp[:_HISTOGRAM_INTERVALS[self.interval]]] += 1
+
+    def as_dict(self) -> Dict[str, any]:
+        result = {}
+        if self.collections is not None:
+            result["collection"] = [{"collection": k, "count": v} for k, v in self.collections.most_common()]
+        if self.histogram is not None:
+            result["datetime"] = {"interval": self.interval,
+                                  "buckets": [{"key": k, "count": v} for k, v in sorted(self.histogram.items())]}
+        return result
+
+
+def search_items(search: Dict[str, any], max_items: Optional[int] = None, aggregations: List[str] = None,
+                 interval: str = "day", features: bool = True, ndjson: bool = False):
+    """
+    Search items across collections on the read STAC API.
+
+    Pages are requested from the STAC API as the response is streamed, so neither the portal nor the client
+    holds more than a page. Aggregations are computed on the fly and sent after the features.
+
+    :param search: Item search, see StacGeneratorDto.item_search. `limit` is the size of the pages.
+    :param max_items: Stop after this many items, STAC_SEARCH_MAX_ITEMS when None, no limit when 0
+    :param aggregations: Aggregations to compute, among SEARCH_AGGREGATIONS
+    :param interval: Interval of the temporal histogram, one of year, month, day and hour
+    :param features: Whether to return the features, only the aggregations otherwise
+    :param ndjson: Stream the features as newline delimited JSON, without aggregations
+    :return: Streamed FeatureCollection or NDJSON, or the aggregations when no feature is returned
+    """
+    aggregations = aggregations or []
+    unknown = set(aggregations) - set(SEARCH_AGGREGATIONS)
+    if unknown:
+        raise InvalidSearchArgumentsError("Unknown aggregations: " + ", ".join(sorted(unknown)))
+    if interval not in _HISTOGRAM_INTERVALS:
+        raise InvalidSearchArgumentsError("interval must be one of " + ", ".join(_HISTOGRAM_INTERVALS))
+    if ndjson and aggregations:
+        raise InvalidSearchArgumentsError("Aggregations are not available as NDJSON")
+    if not features and not aggregations:
+        raise InvalidSearchArgumentsError("At least one aggregation is needed when no feature is returned")
+    if max_items is None:
+        max_items = current_app.config["STAC_SEARCH_MAX_ITEMS"]
+    if max_items < 0:
+        raise InvalidSearchArgumentsError("max_items must not be negative")
+
+    body = _search_body(search)
+    if not features:
+        body["fields"] = {"include": _AGGREGATION_FIELDS}
+    pages = _search_pages(body)
+    # the first page is requested now, so a failing search is answered with an error status
+    pages = chain([next(pages)], pages)
+    aggregator = _SearchAggregations(aggregations, interval)
+
+    def features_of(page_features: List[Dict[str, any]], returned: int) -> List[Dict[str, any]]:
+        if max_items:
+            page_features = page_features[:max_items - returned]
+        for feature in page_features:
+            aggregator.add(feature)
+        return page_features
+
+    if not features:
+        returned = 0
+        for page in pages:
+            returned += len(features_of(page.get("features", []), returned))
+            if max_items and returned >= max_items:
+                break
+        return {"numberReturned": returned, "aggregations": aggregator.as_dict()}
+
+    def body_chunks() -> Iterator[str]:
+        returned = 0
+        error = None
+        if not ndjson:
+            yield '{"type": "FeatureCollection", "features": ['
+        try:
+            for page in pages:
+                page_features = features_of(page.get("features", []), returned)
+                if page_features:
+                    if ndjson:
+                        yield "".join(json.dumps(feature) + "\n" for feature in page_features)
+                    else:
+                        yield ("," if returned else "") + ",".join(json.dumps(feature) for feature in page_features)
+                returned += len(page_features)
+                if max_items and returned >= max_items:
+                    break
+        except Exception as e:
+            # the status is already sent, the error ends the document
+            logging.error("STAC API search failed while streaming: " + str(e))
+            error = str(e)
+        if not ndjson:
+            trailer = {"numberReturned": returned}
+            if aggregations:
+                trailer["aggregations"] = aggregator.as_dict()
+            if error is not None:
+                trailer["error"] = error
+            yield "], " + json.dumps(trailer)[1:]
+
+    mimetype = NDJSON_MIMETYPE if ndjson else "application/geo+json"
+    return Response(stream_with_context(body_chunks()), mimetype=mimetype)
+
+
 def get_item_from_collection(
         collection_id: str,
         item_id: str) -> dict[str, any]:
-    response = requests.get(
+    response = http_client.get(
         urljoin(current_app.config["READ_STAC_API_SERVER"], "collections/") + collection_id + "/items/" + item_id)
 
     if response.status_code in range(200, 203):
@@ -91,8 +306,9 @@ def get_item_from_collection(
 def create_new_collection_on_stac_api(
         collection_data: Dict[str,
                               any]) -> dict[str, any]:
-    response = requests.post(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/"),
-                             json=collection_data)
+    response = http_client.post(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/"),
+                                json=collection_data)
+    response_cache.invalidate("collections", response_cache.collection_scope(collection_data.get("id")))
 
     if response.status_code in range(200, 203):
         collection_json = response.json()
@@ -110,7 +326,8 @@ def create_new_collection_on_stac_api(
 def update_existing_collection_on_stac_api(
         collection_data: Dict[str,
                               any]) -> dict[str, any]:
-    response = requests.put(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/"), json=collection_data)
+    response = http_client.put(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/"), json=collection_data)
+    response_cache.invalidate("collections", response_cache.collection_scope(collection_data.get("id")))
 
     if response.status_code in range(200, 203):
         collection_json = response.json()
@@ -140,7 +357,8 @@ def remove_public_collection_by_id_on_stac_api(
     :param collection_id: Collection ID to remove.
     :return: Either a tuple containing stac server response and status code, or a Response object.
     """
-    response = requests.delete(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id)
+    response = http_client.delete(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id)
+    response_cache.invalidate("collections", response_cache.collection_scope(collection_id))
 
     public_catalogs_service.remove_search_params_for_collection_id(
         collection_id)
@@ -158,7 +376,8 @@ def remove_public_collection_by_id_on_stac_api(
 
 
 def remove_private_collection_by_id_on_stac_api(collection_id: str) -> Dict[str, any]:
-    response = requests.delete(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id)
+    response = http_client.delete(urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id)
+    response_cache.invalidate("collections", response_cache.collection_scope(collection_id))
     if response.status_code in range(200, 203):
         collection_json = response.json()
         return collection_json
@@ -175,9 +394,10 @@ def remove_private_collection_by_id_on_stac_api(collection_id: str) -> Dict[str,
 def add_item_to_collection_on_stac_api(
         collection_id: str,
         item_data: Dict[str, any]) -> Dict[str, any]:
-    response = requests.post(
+    response = http_client.post(
         urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id + "/items",
         json=item_data, headers={"Content-Type": "application/json"})
+    response_cache.invalidate(response_cache.collection_scope(collection_id))
 
     if response.status_code in range(200, 203):
         collection_json = response.json()
@@ -196,13 +416,92 @@ def add_item_to_collection_on_stac_api(
         return resp
 
 
+def _post_item(url: str, item: Dict[str, any]) -> Tuple[Optional[int], Optional[str]]:
+    try:
+        response = http_client.post(url, json=item)
+    except Exception as e:
+        return None, str(e)
+    if response.status_code in range(200, 203):
+        return response.status_code, None
+    return response.status_code, response.text
+
+
+def add_items_to_collection_on_stac_api(collection_id: str, items: Iterable[any]) -> Iterator[Dict[str, any]]:
+    """
+    Add many items to a collection on the STAC API, STAC_BULK_ITEMS_CHUNK_SIZE at a time.
+
+    Every chunk is sent in one request to the bulk items endpoint of the transaction extension. When the STAC
+    API has no such endpoint, or refuses a chunk, the items of the chunk are posted one by one,
+    STAC_BULK_ITEMS_WORKERS at once, which also tells which of them were refused. Items are read from the
+    iterator one chunk at a time.
+
+    :param collection_id: Id of the collection
+    :param items: Items, anything else is reported as failed
+    :return: Iterator of the result of every item, with its index in `items`
+    """
+    app = current_app._get_current_object()
+    collection_url = urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id
+    chunk_size = current_app.config["STAC_BULK_ITEMS_CHUNK_SIZE"]
+    bulk = True
+
+    def post_item(item: Dict[str, any]) -> Tuple[Optional[int], Optional[str]]:
+        with app.app_context():
+            return _post_item(collection_url + "/items", item)
+
+    def failed(index: int, item_id: Optional[str], error_code: Optional[int], message: str) -> Dict[str, any]:
+        return {"index": index, "id": item_id, "status": "failed", "error_code": error_code, "message": message}
+
+    indexed_items = enumerate(items)
+    with ThreadPoolExecutor(max_workers=current_app.config["STAC_BULK_ITEMS_WORKERS"]) as executor:
+        while True:
+            chunk = list(islice(indexed_items, chunk_size))
+            if not chunk:
+                return
+            valid = []
+            for index, item in chunk:
+                if not isinstance(item, dict) or not item.get("id"):
+                    yield failed(index, None, None, "Item must be a JSON object with an id")
+                    continue
+                item.setdefault("collection", collection_id)
+                valid.append((index, item))
+            if not valid:
+                continue
+            ids = [item["id"] for _, item in valid]
+            # the bulk endpoint is keyed by id, so a chunk repeating an id is posted item by item
+            if bulk and len(set(ids)) == len(ids):
+                try:
+                    response = http_client.post(collection_url + "/bulk_items",
+                                                json={"items": dict(zip(ids, (item for _, item in valid))),
+                                                      "method": "insert"})
+                except requests.exceptions.RequestException as e:
+                    # whether the chunk was stored is unknown, posting its items tells it item by item
+                    logging.warning(f"Bulk items request for {collection_id} failed, posting items: " + str(e))
+                    response = None
+                if response is not None and response.status_code in range(200, 203):
+                    response_cache.invalidate(response_cache.collection_scope(collection_id))
+                    for index, item in valid:
+                        yield {"index": index, "id": item["id"], "status": "created"}
+                    continue
+                if response is not None and response.status_code in (404, 405):
+                    logging.info(f"No bulk items endpoint on the STAC API for {collection_id}, posting items")
+                    bulk = False
+            results = executor.map(post_item, [item for _, item in valid])
+            for (index, item), (status_code, message) in zip(valid, results):
+                if message is None:
+                    yield {"index": index, "id": item["id"], "status": "created"}
+                else:
+                    yield failed(index, item["id"], status_code, message)
+            response_cache.invalidate(response_cache.collection_scope(collection_id))
+
+
 def update_item_in_collection_on_stac_api(
         collection_id: str, item_id: str,
         item_data: Dict[str, any]) -> Tuple[Dict[str, any], int] or Response:
-    response = requests.put(
+    response = http_client.put(
         urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id + "/items/" +
         item_id,
         json=item_data)
+    response_cache.invalidate(response_cache.collection_scope(collection_id))
 
     if response.status_code in range(200, 203):
         collection_json = response.json()
@@ -222,8 +521,9 @@ def update_item_in_collection_on_stac_api(
 def remove_item_from_collection_on_stac_api(
         collection_id: str,
         item_id: str) -> Tuple[Dict[str, any], int] or Response:
-    response = requests.delete(
+    response = http_client.delete(
         urljoin(current_app.config["WRITE_STAC_API_SERVER"], "collections/") + collection_id + "/items/" + item_id)
+    response_cache.invalidate(response_cache.collection_scope(collection_id))
 
     if response.status_code in range(200, 203):
         collection_json = response.json()
@@ -1,9 +1,21 @@
 import datetime
-from typing import Dict, Tuple, List
+import json
+from typing import Dict, Iterator, Optional, Tuple, List
+
+import sqlalchemy
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 
 from app.main.model.public_catalogs_model import PublicCatalog
 from .. import db
-from ..model.status_reporting_model import StacIngestionStatus
+from ..model.status_reporting_model import StacIngestionStatus, StacIngestionRollup, PublicCatalogsSyncRun, \
+    QUEUED, RUNNING, FINISHED, FAILED
+from ..util import pagination
+from ..util import server_sent_events
+from ..util.redis_connection import get_redis_connection
+
+STAC_INGESTION_STATUS_CHANNEL = "status_reporting:stac_ingestion_status"
 
 
 def get_all_stac_ingestion_statuses() -> List[Dict[any, any]]:
@@ -11,29 +23,145 @@ def get_all_stac_ingestion_statuses() -> List[Dict[any, any]]:
     return [i.as_dict() for i in a]
 
 
+def get_stac_ingestion_statuses_page(limit: int = None, next_token: str = None) -> Dict[str, any]:
+    """
+    Get a page of the stac ingestion statuses, oldest first.
+
+    :param limit: Page size
+    :param next_token: Token of the page to get, as returned with the previous page
+    :return: Dict with the statuses as `items` and the `next` token
+    """
+    query = db.session.query(*StacIngestionStatus.__table__.columns)
+    return pagination.paginate(query, StacIngestionStatus.id, StacIngestionStatus.row_as_dict, limit, next_token)
+
+
+def iterate_stac_ingestion_statuses(limit: int = None, next_token: str = None) -> Iterator[Dict[any, any]]:
+    """
+    Iterate over the stac ingestion statuses, oldest first, using a server-side cursor.
+
+    :param limit: Maximum number of statuses, all when None
+    :param next_token: Start after the page this token was returned with
+    :return: Iterator of statuses
+    """
+    query = db.session.query(*StacIngestionStatus.__table__.columns)
+    return pagination.iterate(query, StacIngestionStatus.id, StacIngestionStatus.row_as_dict, limit, next_token)
+
+
 def get_stac_ingestion_status_by_id(id: str) -> Dict[any, any]:
     a: StacIngestionStatus = StacIngestionStatus.query.filter_by(id=id).first()
     return a.as_dict()
 
 
+def _new_stac_ingestion_status(source_stac_api_url: str, target_stac_api_url: str, update: bool,
+                               ingestion_parameters: Dict[any, any] = None,
+                               covered_search_parameters: List[int] = None) -> StacIngestionStatus:
+    stac_ingestion_status: StacIngestionStatus = StacIngestionStatus()
+    stac_ingestion_status.source_stac_api_url = source_stac_api_url
+    stac_ingestion_status.target_stac_api_url = target_stac_api_url
+    stac_ingestion_status.update = update
+    if ingestion_parameters is not None:
+        stac_ingestion_status.ingestion_parameters = json.dumps(ingestion_parameters)
+    if covered_search_parameters is not None:
+        stac_ingestion_status.covered_search_parameters = ",".join(str(i) for i in covered_search_parameters)
+    stac_ingestion_status.state = QUEUED
+    stac_ingestion_status.time_queued = datetime.datetime.utcnow()
+    stac_ingestion_status.time_started = stac_ingestion_status.time_queued
+    return stac_ingestion_status
+
+
 def make_stac_ingestion_status_entry(source_stac_api_url: str,
                                      target_stac_api_url: str,
-                                     update: bool) -> int:
+                                     update: bool,
+                                     ingestion_parameters: Dict[any, any] = None,
+                                     covered_search_parameters: List[int] = None) -> int:
     public_catalogue_entry: PublicCatalog = PublicCatalog.query.filter(
         PublicCatalog.url == source_stac_api_url).first()
 
     if public_catalogue_entry is None:
         raise ValueError("Target STAC API URL not found in public catalogs.")
-    stac_ingestion_status: StacIngestionStatus = StacIngestionStatus()
-    stac_ingestion_status.source_stac_api_url = source_stac_api_url
-    stac_ingestion_status.target_stac_api_url = target_stac_api_url
-    stac_ingestion_status.update = update
-    stac_ingestion_status.time_started = datetime.datetime.utcnow()
+    stac_ingestion_status = _new_stac_ingestion_status(source_stac_api_url, target_stac_api_url, update,
+                                                       ingestion_parameters, covered_search_parameters)
     db.session.add(stac_ingestion_status)
     db.session.commit()
+    _publish_stac_ingestion_status(stac_ingestion_status)
     return stac_ingestion_status.id
 
 
+def make_or_join_stac_ingestion_status_entry(source_stac_api_url: str,
+                                             target_stac_api_url: str,
+                                             update: bool,
+                                             ingestion_parameters: Dict[any, any],
+                                             dedup_key: str,
+                                             dedup_window: int,
+                                             covered_search_parameters: List[int] = None) -> Tuple[int, bool]:
+    """
+    Make the status entry of an ingestion, unless the same ingestion is already in flight.
+
+    Ingestions with the same dedup_key are the same work. While one of them is unfinished and was queued less
+    than dedup_window seconds ago, new requests join it: its coalesced_requests is incremented and its id is
+    returned. The unique index on the dedup_key of unfinished statuses settles concurrent requests.
+
+    :param dedup_key: Key of the ingestion, e.g. the canonical hash of its parameters and target
+    :param dedup_window: Seconds during which duplicates join the ingestion
+    :return: Id of the status, and whether it was made by this call
+    """
+    public_catalogue_entry: PublicCatalog = PublicCatalog.query.filter(
+        PublicCatalog.url == source_stac_api_url).first()
+    if public_catalogue_entry is None:
+        raise ValueError("Target STAC API URL not found in public catalogs.")
+    for _ in range(3):
+        now = datetime.datetime.utcnow()
+        in_flight: StacIngestionStatus = StacIngestionStatus.query.filter(
+            StacIngestionStatus.dedup_key == dedup_key,
+            StacIngestionStatus.time_finished.is_(None)).with_for_update().first()
+        if in_flight is not None and in_flight.dedup_expires > now:
+            in_flight.coalesced_requests = (in_flight.coalesced_requests or 0) + 1
+            db.session.commit()
+            _publish_stac_ingestion_status(in_flight)
+            return in_flight.id, False
+        if in_flight is not None:
+            # past its window, the ingestion is left to run on its own
+            in_flight.dedup_key = None
+        stac_ingestion_status = _new_stac_ingestion_status(source_stac_api_url, target_stac_api_url, update,
+                                                           ingestion_parameters, covered_search_parameters)
+        stac_ingestion_status.dedup_key = dedup_key
+        stac_ingestion_status.dedup_expires = now + datetime.timedelta(seconds=dedup_window)
+        db.session.add(stac_ingestion_status)
+        try:
+            db.session.commit()
+        except sqlalchemy.exc.IntegrityError:
+            # a concurrent request made it first, join it
+            db.session.rollback()
+            continue
+        _publish_stac_ingestion_status(stac_ingestion_status)
+        return stac_ingestion_status.id, True
+    raise ValueError("Could not make the stac ingestion status of " + dedup_key)
+
+
+def make_stac_ingestion_status_entries(target_stac_api_url: str, update: bool,
+                                       ingestions: List[Tuple[Dict[any, any], List[int]]]) -> List[Optional[int]]:
+    """
+    Make the status entries of many ingestions in a single transaction.
+
+    :param target_stac_api_url: Url of the STAC API the ingestions write to
+    :param update: Whether the ingestions update existing records
+    :param ingestions: Parameters of every ingestion, with the ids of the stored search parameters it covers
+    :return: Status ids in the order of ingestions, None for ingestions whose source catalog is not stored
+    """
+    source_urls = {parameters['source_stac_catalog_url'] for parameters, _ in ingestions}
+    stored_urls = {url for url, in db.session.query(PublicCatalog.url).filter(PublicCatalog.url.in_(source_urls))}
+    statuses = [_new_stac_ingestion_status(parameters['source_stac_catalog_url'], target_stac_api_url, update,
+                                           parameters, covered_search_parameters)
+                if parameters['source_stac_catalog_url'] in stored_urls else None
+                for parameters, covered_search_parameters in ingestions]
+    db.session.add_all([status for status in statuses if status is not None])
+    db.session.commit()
+    for status in statuses:
+        if status is not None:
+            _publish_stac_ingestion_status(status)
+    return [status.id if status is not None else None for status in statuses]
+
+
 def set_stac_ingestion_status_entry(
         status_id: int, newly_stored_collections_count: int = 0,
         newly_stored_collections: List[str] = None, updated_collections_count: int = 0,
@@ -42,6 +170,7 @@ def set_stac_ingestion_status_entry(
         already_stored_items_count: int = 0,
         error_message=None) -> Tuple[Dict[any, any]]:
     a: StacIngestionStatus = StacIngestionStatus.query.get(status_id)
+    was_finished = a.time_finished is not None
     a.newly_stored_collections_count = newly_stored_collections_count
     if newly_stored_collections is not None:
         a.newly_stored_collections = ",".join(newly_stored_collections)
@@ -52,13 +181,215 @@ def set_stac_ingestion_status_entry(
     a.updated_items_count = updated_items_count
     a.already_stored_items_count = already_stored_items_count
     a.time_finished = datetime.datetime.utcnow()
+    a.time_updated = a.time_finished
+    a.estimated_time_finished = None
     if error_message is not None:
         a.error_message = error_message
+    a.state = FAILED if a.error_message else FINISHED
     db.session.add(a)
+    if not was_finished and a.source_stac_api_url is not None:
+        _add_to_stac_ingestion_rollup(a)
     db.session.commit()
+    _publish_stac_ingestion_status(a)
     return a.as_dict()
 
 
+def set_stac_ingestion_status_running(status_id: int) -> Dict[any, any]:
+    """
+    Mark a queued stac ingestion as running, when an ingestion worker starts it.
+
+    :param status_id: Callback id of the ingestion
+    :return: The status
+    """
+    a: StacIngestionStatus = StacIngestionStatus.query.get(status_id)
+    if a is None:
+        raise AttributeError("No stac ingestion status with id " + str(status_id))
+    if a.time_finished is not None or a.state == RUNNING:
+        return a.as_dict()
+    a.state = RUNNING
+    a.time_started = datetime.datetime.utcnow()
+    a.time_updated = a.time_started
+    db.session.commit()
+    _publish_stac_ingestion_status(a)
+    return a.as_dict()
+
+
+def set_stac_ingestion_status_queued(status_id: int) -> Dict[any, any]:
+    """
+    Mark a running stac ingestion as queued again, when its call is deferred before the ingestion started.
+
+    :param status_id: Callback id of the ingestion
+    :return: The status
+    """
+    a: StacIngestionStatus = StacIngestionStatus.query.get(status_id)
+    if a is None:
+        raise AttributeError("No stac ingestion status with id " + str(status_id))
+    if a.time_finished is not None or a.state != RUNNING:
+        return a.as_dict()
+    a.state = QUEUED
+    # back to the value it had while queued, so the next start sets it again
+    a.time_started = a.time_queued
+    a.time_updated = datetime.datetime.utcnow()
+    db.session.commit()
+    _publish_stac_ingestion_status(a)
+    return a.as_dict()
+
+
+def _add_to_stac_ingestion_rollup(status: StacIngestionStatus):
+    duration = (status.time_finished - status.time_started).total_seconds() if status.time_started else 0
+    values = dict(runs=1,
+                  failures=1 if status.error_message else 0,
+                  newly_stored_items_count=status.newly_stored_items_count or 0,
+                  updated_items_count=status.updated_items_count or 0,
+                  total_duration_seconds=duration,
+                  last_time_finished=status.time_finished)
+    statement = insert(StacIngestionRollup).values(source_stac_api_url=status.source_stac_api_url, **values)
+    rollup = StacIngestionRollup.__table__.c
+    statement = statement.on_conflict_do_update(
+        index_elements=[rollup.source_stac_api_url],
+        set_={name: func.greatest(rollup[name], statement.excluded[name]) if name == "last_time_finished"
+              else rollup[name] + statement.excluded[name]
+              for name in values})
+    db.session.execute(statement)
+
+
+def get_stac_ingestion_summary() -> List[Dict[any, any]]:
+    """
+    Get the totals of the ingestions of every source catalog, with the number of queued and running ingestions.
+
+    Reads the rollups and the unfinished statuses only, so the cost does not grow with the history.
+
+    :return: Summary of every source catalog which was ever ingested from
+    """
+    unfinished: Dict[str, Dict[str, int]] = {}
+    for source_stac_api_url, state, count in db.session.query(
+            StacIngestionStatus.source_stac_api_url, StacIngestionStatus.state, func.count()) \
+            .filter(StacIngestionStatus.time_finished.is_(None)) \
+            .group_by(StacIngestionStatus.source_stac_api_url, StacIngestionStatus.state):
+        counts = unfinished.setdefault(source_stac_api_url, {QUEUED: 0, RUNNING: 0})
+        counts[QUEUED if state == QUEUED else RUNNING] += count
+    summary = []
+    for rollup in StacIngestionRollup.query.order_by(StacIngestionRollup.source_stac_api_url):
+        entry = rollup.as_dict()
+        counts = unfinished.pop(rollup.source_stac_api_url, {QUEUED: 0, RUNNING: 0})
+        entry.update({state: str(count) for state, count in counts.items()})
+        summary.append(entry)
+    for source_stac_api_url, counts in unfinished.items():
+        if source_stac_api_url is not None:
+            entry = {"source_stac_api_url": source_stac_api_url, "runs": "0"}
+            entry.update({state: str(count) for state, count in counts.items()})
+            summary.append(entry)
+    return summary
+
+
+def remove_old_stac_ingestion_statuses(retention_days: int = None) -> int:
+    """
+    Remove the finished stac ingestion statuses started more than retention_days ago.
+
+    Rows are removed STATUS_RETENTION_BATCH_SIZE at a time, each batch in its own transaction, so the
+    table is never locked for long. Their totals stay in the rollups.
+
+    :param retention_days: Days to keep, defaults to STATUS_RETENTION_DAYS, 0 keeps everything
+    :return: Number of removed statuses
+    """
+    if retention_days is None:
+        retention_days = current_app.config['STATUS_RETENTION_DAYS']
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=retention_days)
+    batch_size = max(1, current_app.config['STATUS_RETENTION_BATCH_SIZE'])
+    removed = 0
+    while True:
+        batch = db.session.query(StacIngestionStatus.id).filter(
+            StacIngestionStatus.time_finished.isnot(None),
+            StacIngestionStatus.time_started < cutoff).limit(batch_size).scalar_subquery()
+        count = StacIngestionStatus.query.filter(StacIngestionStatus.id.in_(batch)).delete(synchronize_session=False)
+        db.session.commit()
+        removed += count
+        if count < batch_size:
+            return removed
+
+
+# partial counts the ingestion microservice may report with its progress
+PROGRESS_COUNT_FIELDS = ("newly_stored_collections_count", "updated_collections_count", "newly_stored_items_count",
+                         "updated_items_count", "already_stored_items_count")
+PROGRESS_LIST_FIELDS = ("newly_stored_collections", "updated_collections")
+
+
+def report_stac_ingestion_progress(status_id: int, items_processed: int, items_total: int = None,
+                                   **counts) -> Dict[any, any]:
+    """
+    Record the progress reported by the ingestion microservice for a running ingestion.
+
+    The rate is averaged over the whole run, and the estimated time of finish is only known when the
+    microservice reports the total number of items. Progress of finished ingestions is ignored.
+
+    :param status_id: Callback id of the ingestion
+    :param items_processed: Number of items processed so far
+    :param items_total: Number of items to process, if known
+    :param counts: Partial counts of the ingestion, among PROGRESS_COUNT_FIELDS and PROGRESS_LIST_FIELDS
+    :return: The status
+    """
+    a: StacIngestionStatus = StacIngestionStatus.query.get(status_id)
+    if a is None:
+        raise AttributeError("No stac ingestion status with id " + str(status_id))
+    if a.time_finished is not None:
+        return a.as_dict()
+    now = datetime.datetime.utcnow()
+    a.items_processed = items_processed
+    if items_total is not None:
+        a.items_total = items_total
+    elapsed = (now - a.time_started).total_seconds() if a.time_started is not None else 0
+    a.items_per_second = items_processed / elapsed if elapsed > 0 else None
+    if a.items_total is not None and a.items_per_second:
+        remaining = max(0, a.items_total - items_processed)
+        a.estimated_time_finished = now + datetime.timedelta(seconds=remaining / a.items_per_second)
+    for name in PROGRESS_COUNT_FIELDS:
+        if counts.get(name) is not None:
+            setattr(a, name, counts[name])
+    for name in PROGRESS_LIST_FIELDS:
+        if counts.get(name) is not None:
+            setattr(a, name, ",".join(counts[name]))
+    a.time_updated = now
+    db.session.commit()
+    _publish_stac_ingestion_status(a)
+    return a.as_dict()
+
+
+def _publish_stac_ingestion_status(status: StacIngestionStatus):
+    server_sent_events.publish(get_redis_connection(), STAC_INGESTION_STATUS_CHANNEL, status.as_dict())
+
+
+def stream_stac_ingestion_statuses(status_id: int = None):
+    """
+    Stream the changes of stac ingestion statuses as Server-Sent Events.
+
+    The stream starts with the current state of the unfinished ingestions, or of the requested one.
+
+    :param status_id: Only stream the changes of this ingestion
+    :return: Iterator of events
+    """
+
+    def initial() -> List[Dict[any, any]]:
+        try:
+            if status_id is not None:
+                return [get_stac_ingestion_status_by_id(status_id)]
+            return [i.as_dict() for i in get_unfinished_stac_ingestion_statuses()]
+        finally:
+            db.session.remove()
+
+    # the initial state is read once subscribed, so no change is lost in between
+    return server_sent_events.stream_channel(
+        get_redis_connection(), STAC_INGESTION_STATUS_CHANNEL, "stac_ingestion_status",
+        current_app.config['STATUS_EVENTS_HEARTBEAT'], initial,
+        accept=(lambda message: message["id"] == str(status_id)) if status_id is not None else None,
+        event_id=lambda message: message["id"])
+
+
+def get_unfinished_stac_ingestion_statuses() -> List[StacIngestionStatus]:
+    return StacIngestionStatus.query.filter(StacIngestionStatus.time_finished.is_(None)).all()
+
+
 def remove_stac_ingestion_status_entry(
         status_id: str) -> Tuple[Dict[any, any]]:
     a: StacIngestionStatus = StacIngestionStatus.query.filter_by(
@@ -66,3 +397,60 @@ def remove_stac_ingestion_status_entry(
     db.session.delete(a)
     db.session.commit()
     return a.as_dict()
+
+
+def get_all_public_catalogs_sync_runs() -> List[Dict[any, any]]:
+    a: [PublicCatalogsSyncRun] = PublicCatalogsSyncRun.query.order_by(PublicCatalogsSyncRun.id.desc()).all()
+    return [i.as_dict() for i in a]
+
+
+def get_public_catalogs_sync_run_by_id(id: str) -> Dict[any, any]:
+    a: PublicCatalogsSyncRun = PublicCatalogsSyncRun.query.filter_by(id=id).first()
+    return a.as_dict()
+
+
+def make_public_catalogs_sync_run_entry(max_workers: int, per_host_limit: int) -> int:
+    public_catalogs_sync_run: PublicCatalogsSyncRun = PublicCatalogsSyncRun()
+    public_catalogs_sync_run.max_workers = max_workers
+    public_catalogs_sync_run.per_host_limit = per_host_limit
+    public_catalogs_sync_run.time_started = datetime.datetime.utcnow()
+    db.session.add(public_catalogs_sync_run)
+    db.session.commit()
+    return public_catalogs_sync_run.id
+
+
+def set_public_catalogs_sync_run_entry(sync_run_id: int, finished: bool = False, error_message: str = None,
+                                       **counters: int) -> Dict[any, any]:
+    """
+    Update the progress counters of a public catalogs sync run.
+
+    :param sync_run_id: Id of the sync run
+    :param finished: Mark the sync run as finished
+    :param error_message: Error which stopped the sync run, if any
+    :param counters: Counter columns to set, e.g. catalogs_fetched=10
+    :return: The sync run as a dict
+    """
+    a: PublicCatalogsSyncRun = PublicCatalogsSyncRun.query.get(sync_run_id)
+    for counter, value in counters.items():
+        setattr(a, counter, value)
+    if finished:
+        a.time_finished = datetime.datetime.utcnow()
+    if error_message is not None:
+        a.error_message = error_message
+    db.session.add(a)
+    db.session.commit()
+    return a.as_dict()
+
+
+def get_last_public_catalogs_lookup_validators() -> Tuple[str, str]:
+    """
+    Get the HTTP validators of the catalogs lookup api response seen by the last sync run.
+
+    :return: ETag and Last-Modified values, both None if no sync run recorded any
+    """
+    a: PublicCatalogsSyncRun = PublicCatalogsSyncRun.query.filter(
+        (PublicCatalogsSyncRun.lookup_etag != None) | (PublicCatalogsSyncRun.lookup_last_modified != None)
+    ).order_by(PublicCatalogsSyncRun.id.desc()).first()
+    if a is None:
+        return None, None
+    return a.lookup_etag, a.lookup_last_modified
@@ -3,13 +3,15 @@ from typing import Dict, Any
 import requests
 from flask import current_app
 
+from ..util import http_client
+
 
 def validate_json(data: Dict[str, Any]) -> tuple[str, int]:
     STAC_VALIDATOR_ENDPOINT = current_app.config["STAC_VALIDATOR_ENDPOINT"]
 
     try:
         validate_endpoint = f"{STAC_VALIDATOR_ENDPOINT}"
-        response = requests.post(
+        response = http_client.post(
             validate_endpoint, json=data, timeout=120)
         return response.json(), response.status_code
     except requests.exceptions.RequestException as e:
@@ -0,0 +1,20 @@
+import hashlib
+import json
+
+
+def canonical_json(data: any) -> str:
+    """
+    Serialize data to JSON in a canonical form: sorted keys and no insignificant whitespace.
+
+    Equal data always gives the same string, whatever the key order it was built with.
+    """
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def canonical_hash(data: any) -> str:
+    """
+    Hash data in its canonical JSON form.
+
+    :return: Hex encoded sha256 of the canonical JSON
+    """
+    return hashlib.sha256(canonical_json(data).encode('utf-8')).hexdigest()
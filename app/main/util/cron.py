@@ -0,0 +1,86 @@
+import datetime
+from typing import Set
+
+from ..custom_exceptions import InvalidCronExpressionError
+
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+# minute, hour, day of month, month, day of week (0 and 7 are Sunday)
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+class CronSchedule:
+    """
+    Five field cron expression, e.g. `30 2 * * 1-5`, or one of the @hourly, @daily, @weekly, @monthly and
+    @yearly aliases.
+
+    Fields accept `*`, single values, ranges `a-b`, steps `*/n` or `a-b/n` and comma separated lists of
+    those. Like cron, a day matches when either the day of month or the day of week matches, if both are
+    restricted. Times are naive UTC datetimes.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = _ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise InvalidCronExpressionError(f"Cron expression must have 5 fields: {expression}")
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            _parse_field(field, minimum, maximum) for field, (minimum, maximum) in zip(fields, _FIELD_RANGES)]
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, day: datetime.datetime) -> bool:
+        day_matches = day.day in self.days
+        # python counts weekdays from Monday, cron from Sunday
+        weekday_matches = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_matches and weekday_matches
+        return day_matches or weekday_matches
+
+    def next_after(self, after: datetime.datetime) -> datetime.datetime:
+        """
+        Get the first time matching the expression strictly after `after`.
+        """
+        start = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        # any valid expression matches within 8 years, e.g. February 29th
+        for _ in range(366 * 8):
+            if day.month in self.months and self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += datetime.timedelta(days=1)
+        raise InvalidCronExpressionError(f"Cron expression never matches: {self.expression}")
+
+
+def _parse_field(field: str, minimum: int, maximum: int) -> Set[int]:
+    values = set()
+    for part in field.split(","):
+        try:
+            if "/" in part:
+                part, step = part.split("/")
+                step = int(step)
+            else:
+                step = 1
+            if part == "*":
+                start, end = minimum, maximum
+            elif "-" in part:
+                start, end = (int(i) for i in part.split("-"))
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise InvalidCronExpressionError(f"Invalid cron field: {field}")
+        if step < 1 or start < minimum or end > maximum or start > end:
+            raise InvalidCronExpressionError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
@@ -257,6 +257,31 @@ class PublicCatalogsDto:
             ),
         },
     )
+    refresh_schedule = api.model(
+        "refresh_schedule",
+        {
+            "cron": fields.String(
+                required=True,
+                description="cron expression of the refreshes, in UTC",
+                example="0 3 * * *",
+            ),
+            "public_catalog_id": fields.Integer(
+                required=False,
+                description="refresh all the stored search parameters of this public catalog",
+            ),
+            "stored_search_parameters_id": fields.Integer(
+                required=False,
+                description="refresh only these stored search parameters",
+            ),
+            "window_seconds": fields.Integer(
+                required=False,
+                default=0,
+                description="spread the ingestions of a refresh over this many seconds",
+                example=3600,
+            ),
+            "enabled": fields.Boolean(required=False, default=True),
+        },
+    )
     collection_search = api.model(
         "collection_search",
         {
@@ -304,6 +329,38 @@ class StatusReportingDto:
             ),
         },
     )
+    stac_ingestion_progress_post = api.model(
+        "stac_ingestion_progress_post",
+        {
+            "items_processed": fields.Integer(
+                required=True, min=0, description="number of items processed so far", example=1200
+            ),
+            "items_total": fields.Integer(
+                required=False, min=0, description="number of items to process, if known", example=50000
+            ),
+            "newly_stored_collections_count": fields.Integer(
+                required=False, min=0, description="number of newly stored collections so far"
+            ),
+            "newly_stored_collections": fields.List(
+                fields.String, required=False, description="newly stored collections so far"
+            ),
+            "updated_collections_count": fields.Integer(
+                required=False, min=0, description="updated collections count so far"
+            ),
+            "updated_collections": fields.List(
+                fields.String, required=False, description="updated collections so far"
+            ),
+            "newly_stored_items_count": fields.Integer(
+                required=False, min=0, description="newly stored items count so far"
+            ),
+            "updated_items_count": fields.Integer(
+                required=False, min=0, description="updated items count so far"
+            ),
+            "already_stored_items_count": fields.Integer(
+                required=False, min=0, description="already stored items count so far"
+            ),
+        },
+    )
 
 
 class FileDto:
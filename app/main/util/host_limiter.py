@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class HostConcurrencyLimiter:
+    """
+    Bound the number of concurrent requests made to any single host.
+
+    Share one instance between all workers of a pool, then wrap every outbound call in `limit(url)`.
+    """
+
+    def __init__(self, limit_per_host: int):
+        self.limit_per_host = max(1, limit_per_host)
+        self._semaphores: Dict[str, BoundedSemaphore] = {}
+        self._lock = Lock()
+
+    def _get_semaphore(self, url: str) -> BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = BoundedSemaphore(self.limit_per_host)
+            return self._semaphores[host]
+
+    @contextmanager
+    def limit(self, url: str):
+        """
+        Block until a slot for the host of the url is free and hold it for the duration of the block.
+
+        :param url: Url that is about to be requested
+        """
+        semaphore = self._get_semaphore(url)
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
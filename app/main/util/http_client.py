@@ -0,0 +1,153 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Tuple
+from urllib.parse import urlparse
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# passed as timeout to use the configured connect and read timeouts
+DEFAULT_TIMEOUT = object()
+
+_client = None
+_client_pid = None
+_client_lock = Lock()
+
+
+class HttpClient:
+    """
+    Pool of keep-alive sessions used for all outbound HTTP calls of a process.
+
+    Every upstream (scheme and host) gets its own session, so connections to the STAC API, the validator or
+    the gdal info service are reused instead of paying for a new TCP and TLS handshake on every call.
+    Idempotent requests are retried with exponential backoff on connection errors and 502/503/504 responses,
+    other requests only when the connection could not be established. Responses are negotiated with gzip.
+
+    Sessions are safe to share between threads and, once gevent has patched the standard library, greenlets.
+    Only the lookup of the session is guarded by a lock, and it never does IO while holding it.
+    """
+
+    def __init__(self, pool_maxsize: int, connect_timeout: float, read_timeout: float, retries: int,
+                 backoff_factor: float, max_upstreams: int):
+        self.pool_maxsize = pool_maxsize
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_upstreams = max(1, max_upstreams)
+        self._sessions: OrderedDict[str, requests.Session] = OrderedDict()
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config) -> 'HttpClient':
+        return cls(config['HTTP_POOL_MAXSIZE'], config['HTTP_CONNECT_TIMEOUT'], config['HTTP_READ_TIMEOUT'],
+                   config['HTTP_RETRIES'], config['HTTP_BACKOFF_FACTOR'], config['HTTP_MAX_UPSTREAMS'])
+
+    def _make_session(self) -> requests.Session:
+        retry = Retry(total=self.retries, connect=self.retries, read=self.retries, status=self.retries,
+                      backoff_factor=self.backoff_factor, status_forcelist=(502, 503, 504),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.headers['Accept-Encoding'] = 'gzip, deflate'
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session_for(self, url: str) -> requests.Session:
+        """
+        Get the session of the upstream serving url.
+
+        Only the most recently used HTTP_MAX_UPSTREAMS sessions are kept open.
+        """
+        parsed = urlparse(url)
+        upstream = f"{parsed.scheme}://{parsed.netloc}"
+        evicted = None
+        with self._lock:
+            session = self._sessions.get(upstream)
+            if session is None:
+                session = self._make_session()
+                self._sessions[upstream] = session
+                if len(self._sessions) > self.max_upstreams:
+                    _, evicted = self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(upstream)
+        if evicted is not None:
+            evicted.close()
+        return session
+
+    def request(self, method: str, url: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+        """
+        Make a request through the session of its upstream.
+
+        :param method: HTTP method
+        :param url: Url to request
+        :param timeout: Timeout in seconds, or a (connect, read) tuple, or None to wait forever.
+            Defaults to HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT.
+        :param kwargs: Any other argument accepted by requests
+        :return: The response
+        """
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.timeout
+        return self.session_for(url).request(method, url, timeout=timeout, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+def get_http_client(config=None) -> HttpClient:
+    """
+    Get the HTTP client of this process, creating it on first use.
+
+    Processes forked after the client was created, like preloaded gunicorn workers, get their own client
+    instead of sharing the sockets of their parent.
+
+    :param config: Config to build the client from, defaults to the config of the current app
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = HttpClient.from_config(config if config is not None else current_app.config)
+            _client_pid = pid
+        return _client
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    return get_http_client().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return get_http_client().get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return get_http_client().post(url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    return get_http_client().put(url, **kwargs)
+
+
+def delete(url: str, **kwargs) -> requests.Response:
+    return get_http_client().delete(url, **kwargs)
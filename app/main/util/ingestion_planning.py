@@ -0,0 +1,195 @@
+import datetime
+import math
+from typing import Dict, List, Optional, Tuple
+
+from .canonical_json import canonical_json
+from .process_timestamp import process_timestamp_dual_string, process_timestamp_single_string
+from ..custom_exceptions import ConvertingTimestampError
+
+# parameters which do not change what an ingestion fetches
+_IGNORED_PARAMETERS = ("bbox", "datetime", "collections", "update", "callback_id", "target_stac_catalog_url")
+_WORLD = (-180.0, -90.0, 180.0, 90.0)
+
+
+class SearchWindow:
+    """
+    Spatial and temporal window of a stored search, as a box over x, y and time.
+
+    Open time bounds are infinite. The original bbox and datetime strings are kept, so merged windows are
+    sent to the ingester exactly as the user wrote them.
+    """
+
+    def __init__(self, bbox: Optional[List[float]], start: Tuple[float, Optional[str]],
+                 end: Tuple[float, Optional[str]]):
+        self.bbox = bbox
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_parameters(cls, parameters: Dict[any, any]) -> Optional['SearchWindow']:
+        """
+        Make the window of search parameters, or None when its bbox or datetime cannot be interpreted.
+        """
+        bbox = parameters.get("bbox")
+        if bbox is not None and (len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]):
+            return None
+        interval = parameters.get("datetime")
+        try:
+            if not interval:
+                start, end = (-math.inf, None), (math.inf, None)
+            elif "/" in interval:
+                start_datetime, end_datetime = process_timestamp_dual_string(interval)
+                start_string, end_string = interval.split("/")
+                start = (_timestamp(start_datetime, -math.inf), None if start_string == ".." else start_string)
+                end = (_timestamp(end_datetime, math.inf), None if end_string == ".." else end_string)
+            else:
+                instant = _timestamp(process_timestamp_single_string(interval), None)
+                start, end = (instant, interval), (instant, interval)
+        except (ConvertingTimestampError, ValueError):
+            return None
+        if start[0] > end[0]:
+            return None
+        return cls(bbox, start, end)
+
+    def intervals(self) -> List[Tuple[float, float]]:
+        minx, miny, maxx, maxy = self.bbox if self.bbox is not None else _WORLD
+        return [(minx, maxx), (miny, maxy), (self.start[0], self.end[0])]
+
+    def envelope(self, other: 'SearchWindow') -> 'SearchWindow':
+        if self.bbox is None or other.bbox is None:
+            bbox = None
+        else:
+            bbox = [min(self.bbox[0], other.bbox[0]), min(self.bbox[1], other.bbox[1]),
+                    max(self.bbox[2], other.bbox[2]), max(self.bbox[3], other.bbox[3])]
+        return SearchWindow(bbox, min(self.start, other.start, key=lambda b: b[0]),
+                            max(self.end, other.end, key=lambda b: b[0]))
+
+    def can_merge(self, other: 'SearchWindow', slack: float) -> bool:
+        """
+        Whether both windows can be fetched by a single request over their envelope.
+
+        Windows are merged when the envelope is exactly their union: one contains the other, or they overlap
+        or touch and only differ along one axis. With a positive slack, overlapping windows are also merged
+        when the envelope is at most slack times bigger than their union.
+        """
+        own, others = self.intervals(), other.intervals()
+        if any(a[0] > b[1] or b[0] > a[1] for a, b in zip(own, others)):
+            return False
+        differing = [(a, b) for a, b in zip(own, others) if a != b]
+        if len(differing) <= 1:
+            return True
+        if all(a[0] <= b[0] and b[1] <= a[1] for a, b in differing) or \
+                all(b[0] <= a[0] and a[1] <= b[1] for a, b in differing):
+            return True
+        if slack <= 0:
+            return False
+        # identical axes scale every volume equally, so only the differing ones are compared
+        own_volume = math.prod(a[1] - a[0] for a, _ in differing)
+        other_volume = math.prod(b[1] - b[0] for _, b in differing)
+        overlap_volume = math.prod(min(a[1], b[1]) - max(a[0], b[0]) for a, b in differing)
+        envelope_volume = math.prod(max(a[1], b[1]) - min(a[0], b[0]) for a, b in differing)
+        union_volume = own_volume + other_volume - overlap_volume
+        if not math.isfinite(envelope_volume) or union_volume <= 0:
+            return False
+        return envelope_volume <= union_volume * (1 + slack)
+
+    def apply_to(self, parameters: Dict[any, any]) -> Dict[any, any]:
+        parameters = {k: v for k, v in parameters.items() if k not in ("bbox", "datetime")}
+        if self.bbox is not None:
+            parameters["bbox"] = self.bbox
+        if self.start[1] is not None or self.end[1] is not None:
+            if self.start[1] is not None and self.start[1] == self.end[1]:
+                parameters["datetime"] = self.start[1]
+            else:
+                parameters["datetime"] = f"{self.start[1] or '..'}/{self.end[1] or '..'}"
+        return parameters
+
+
+class PlannedIngestion:
+    """
+    Single request to the ingester, covering one or more stored search parameters.
+    """
+
+    def __init__(self, parameters: Dict[any, any], covered_parameter_ids: List[int]):
+        self.parameters = parameters
+        self.covered_parameter_ids = covered_parameter_ids
+
+
+def plan_ingestions(stored_parameters: List[Tuple[int, Dict[any, any]]], max_collections_per_request: int,
+                    merge_slack: float = 0) -> List[PlannedIngestion]:
+    """
+    Plan the minimal set of ingester requests covering stored search parameters.
+
+    Parameters are grouped by source catalog, collection and the rest of their parameters. The windows of a
+    group are merged until no two of them can be merged any more, see SearchWindow.can_merge. Collections
+    of the same catalog left with identical windows are then batched into requests of up to
+    max_collections_per_request collections.
+
+    :param stored_parameters: Ids and used search parameters of the stored search parameters
+    :param max_collections_per_request: Maximum number of collections sent in one request
+    :param merge_slack: Fraction of extra volume a merge may fetch beyond the windows it covers
+    :return: Planned requests, each with the ids of the stored parameters it covers
+    """
+    templates: Dict[str, Dict[any, any]] = {}
+    groups: Dict[Tuple[str, Optional[str]], List[Tuple[SearchWindow, List[int]]]] = {}
+    planned: List[PlannedIngestion] = []
+    for parameter_id, parameters in stored_parameters:
+        window = SearchWindow.from_parameters(parameters)
+        collections = parameters.get("collections")
+        if window is None or (collections is not None and len(collections) != 1):
+            planned.append(PlannedIngestion(parameters, [parameter_id]))
+            continue
+        rest_key = canonical_json({k: v for k, v in parameters.items() if k not in _IGNORED_PARAMETERS})
+        templates.setdefault(rest_key, parameters)
+        collection = collections[0] if collections is not None else None
+        groups.setdefault((rest_key, collection), []).append((window, [parameter_id]))
+
+    # collections of a catalog which end up with the same window are fetched together
+    batches: Dict[Tuple[str, str], List[Tuple[Optional[str], SearchWindow, List[int]]]] = {}
+    for (rest_key, collection), windows in groups.items():
+        for window, parameter_ids in _merge_windows(windows, merge_slack):
+            window_key = canonical_json([window.bbox, window.start, window.end])
+            batches.setdefault((rest_key, window_key), []).append((collection, window, parameter_ids))
+
+    batch_size = max(1, max_collections_per_request)
+    for (rest_key, _), entries in batches.items():
+        template = templates[rest_key]
+        for collection, window, parameter_ids in entries:
+            if collection is None:
+                # parameters without collections ingest the whole catalog
+                parameters = window.apply_to(template)
+                parameters.pop("collections", None)
+                planned.append(PlannedIngestion(parameters, sorted(parameter_ids)))
+        entries = [entry for entry in entries if entry[0] is not None]
+        for i in range(0, len(entries), batch_size):
+            chunk = entries[i:i + batch_size]
+            parameters = chunk[0][1].apply_to(template)
+            parameters["collections"] = [collection for collection, _, _ in chunk]
+            planned.append(PlannedIngestion(parameters, sorted(j for _, _, ids in chunk for j in ids)))
+    return planned
+
+
+def _merge_windows(windows: List[Tuple[SearchWindow, List[int]]],
+                   slack: float) -> List[Tuple[SearchWindow, List[int]]]:
+    merged = list(windows)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                if merged[i][0].can_merge(merged[j][0], slack):
+                    merged[i] = (merged[i][0].envelope(merged[j][0]), merged[i][1] + merged[j][1])
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+def _timestamp(value: Optional[datetime.datetime], default: Optional[float]) -> Optional[float]:
+    if value is None:
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy.orm import Query
+
+from ..custom_exceptions import InvalidPaginationArgumentsError
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def encode_next_token(after: any) -> str:
+    """
+    Encode the key of the last returned row into an opaque `next` token.
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": after}).encode('utf-8')).decode('ascii')
+
+
+def decode_next_token(next_token: Optional[str]) -> any:
+    """
+    Decode a `next` token made by encode_next_token.
+
+    :param next_token: Token as sent by the client, or None for the first page
+    :return: Key of the last row of the previous page, or None
+    """
+    if not next_token:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(next_token.encode('ascii')))["after"]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise InvalidPaginationArgumentsError("Invalid next token")
+
+
+def parse_pagination_arguments(args) -> Tuple[Optional[int], Optional[str], bool]:
+    """
+    Read the pagination arguments of a listing request.
+
+    :param args: Query arguments of the request
+    :return: limit (None when not given), next token (None when not given) and whether NDJSON was requested
+    """
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise InvalidPaginationArgumentsError("limit must be an integer")
+        if limit < 1:
+            raise InvalidPaginationArgumentsError("limit must be greater than 0")
+    next_token = args.get('next') or None
+    ndjson = args.get('format', '').lower() == 'ndjson'
+    return limit, next_token, ndjson
+
+
+def paginate(query: Query, key_column, serialize: Callable[[any], Dict[any, any]], limit: Optional[int] = None,
+             next_token: Optional[str] = None) -> Dict[str, any]:
+    """
+    Return a single page of a query using keyset pagination.
+
+    Rows are ordered by key_column and the page starts after the key stored in next_token, so
+    fetching any page costs the same as fetching the first one.
+
+    :param query: Query selecting key_column among its columns
+    :param key_column: Unique, sortable column used as the cursor
+    :param serialize: Function turning a row into a dict
+    :param limit: Page size, capped at PAGINATION_MAX_LIMIT
+    :param next_token: Token returned with the previous page
+    :return: Dict with the serialized `items` and the `next` token, None on the last page
+    """
+    if limit is None:
+        limit = current_app.config['PAGINATION_DEFAULT_LIMIT']
+    limit = min(limit, current_app.config['PAGINATION_MAX_LIMIT'])
+    query = _after(query, key_column, decode_next_token(next_token))
+    rows = query.limit(limit + 1).all()
+    next_page = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_page = encode_next_token(rows[-1]._mapping[key_column])
+    return {
+        "items": [serialize(row) for row in rows],
+        "next": next_page
+    }
+
+
+def iterate(query: Query, key_column, serialize: Callable[[any], Dict[any, any]], limit: Optional[int] = None,
+            next_token: Optional[str] = None) -> Iterator[Dict[any, any]]:
+    """
+    Iterate over the serialized rows of a query using a server-side cursor.
+
+    Rows are fetched in batches of STREAM_BATCH_SIZE, so memory use does not grow with the table.
+    The arguments are validated before the first row is fetched.
+
+    :param query: Query selecting key_column among its columns
+    :param key_column: Unique, sortable column the rows are ordered by
+    :param serialize: Function turning a row into a dict
+    :param limit: Maximum number of rows, all rows when None
+    :param next_token: Only return rows after the one this token was made for
+    :return: Iterator of serialized rows
+    """
+    query = _after(query, key_column, decode_next_token(next_token))
+    if limit is not None:
+        query = query.limit(limit)
+    query = query.yield_per(current_app.config['STREAM_BATCH_SIZE'])
+    return (serialize(row) for row in query)
+
+
+def ndjson_response(rows: Iterator[Dict[any, any]]) -> Response:
+    """
+    Stream rows to the client as newline delimited JSON.
+    """
+    lines = (json.dumps(row) + "\n" for row in rows)
+    return Response(stream_with_context(lines), mimetype=NDJSON_MIMETYPE)
+
+
+def iterate_ndjson(lines: Iterable[bytes]) -> Iterator[any]:
+    """
+    Parse newline delimited JSON one line at a time, skipping blank lines.
+
+    :param lines: Lines, e.g. the stream of a request
+    :return: Iterator of the parsed lines, None for the lines which are not valid JSON
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _after(query: Query, key_column, after: any) -> Query:
+    query = query.order_by(key_column)
+    if after is not None:
+        query = query.filter(key_column > after)
+    return query
@@ -0,0 +1,67 @@
+import re
+from typing import Dict, Iterable, Iterator
+
+import requests
+from flask import Response
+
+# headers describing the upstream body, forwarded as they are
+_FORWARDED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+# validators of the upstream body, which no longer match it once rewritten
+_VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+
+
+def rewrite_stream(chunks: Iterable[bytes], replacements: Dict[bytes, bytes]) -> Iterator[bytes]:
+    """
+    Replace byte strings in a stream of chunks, including occurrences split between two chunks.
+
+    Only the last `longest replaced string - 1` bytes of a chunk are held back until the next one, so the
+    stream keeps flowing with a constant memory cost.
+    """
+    if not replacements:
+        yield from chunks
+        return
+    pattern = re.compile(b"|".join(re.escape(old) for old in sorted(replacements, key=len, reverse=True)))
+    keep = max(len(old) for old in replacements) - 1
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        # any occurrence starting before limit is complete in the buffer
+        limit = len(buffer) - keep
+        parts = []
+        position = 0
+        for match in pattern.finditer(buffer):
+            if match.start() >= limit:
+                break
+            parts.append(buffer[position:match.start()])
+            parts.append(replacements[match.group()])
+            position = match.end()
+        flushed = max(position, limit)
+        parts.append(buffer[position:flushed])
+        buffer = buffer[flushed:]
+        output = b"".join(parts)
+        if output:
+            yield output
+    if buffer:
+        yield pattern.sub(lambda match: replacements[match.group()], buffer)
+
+
+def stream_upstream_response(upstream: requests.Response, chunk_size: int,
+                             replacements: Dict[bytes, bytes] = None) -> Response:
+    """
+    Forward a response requested with stream=True to the client chunk by chunk, without decoding it.
+
+    :param upstream: Upstream response, closed once forwarded
+    :param chunk_size: Size of the chunks read from upstream
+    :param replacements: Byte strings to replace in the body, e.g. upstream links. The validators of the
+        upstream body are then left out.
+    """
+
+    def body():
+        try:
+            yield from rewrite_stream(upstream.iter_content(chunk_size=chunk_size), replacements or {})
+        finally:
+            upstream.close()
+
+    forwarded = [name for name in _FORWARDED_HEADERS if not replacements or name not in _VALIDATOR_HEADERS]
+    headers = {name: upstream.headers[name] for name in forwarded if name in upstream.headers}
+    return Response(body(), status=upstream.status_code, headers=headers)
@@ -0,0 +1,36 @@
+import os
+from threading import Lock
+from typing import Dict, Tuple
+
+import redis
+from flask import current_app
+
+_connections: Dict[Tuple[int, str], redis.Redis] = {}
+_connections_lock = Lock()
+
+
+def get_redis_connection(url: str = None) -> redis.Redis:
+    """
+    Get the Redis connection of this process for url.
+
+    Connections hold a pool of sockets, so they are shared by the whole process and recreated after a fork.
+    A `fakeredis://` url gives an in-memory stand-in shared by the whole process, which needs the fakeredis
+    package and is only meant for tests and local development.
+
+    :param url: Redis url, defaults to REDIS_URL
+    """
+    if url is None:
+        url = current_app.config['REDIS_URL']
+    key = (os.getpid(), url)
+    connection = _connections.get(key)
+    if connection is None:
+        with _connections_lock:
+            connection = _connections.get(key)
+            if connection is None:
+                if url.startswith("fakeredis://"):
+                    import fakeredis
+                    connection = fakeredis.FakeRedis()
+                else:
+                    connection = redis.Redis.from_url(url)
+                _connections[key] = connection
+    return connection
@@ -0,0 +1,44 @@
+import time
+from typing import List
+
+import redis
+
+
+class RedisSemaphore:
+    """
+    Counting semaphore shared between processes through Redis.
+
+    Holders are stored in a sorted set scored by the expiry of their lease, so a slot taken by a process
+    which died is given back once its lease runs out.
+    """
+
+    def __init__(self, connection: redis.Redis, key: str, limit: int, lease_seconds: int):
+        self.connection = connection
+        self.key = key
+        self.limit = max(1, limit)
+        self.lease_seconds = lease_seconds
+
+    def acquire(self, holder: str) -> bool:
+        """
+        Take a slot for holder, without waiting.
+
+        :return: Whether a slot was free
+        """
+
+        def take_slot(pipeline):
+            now = time.time()
+            if pipeline.zscore(self.key, holder) is None and pipeline.zcount(self.key, now, "+inf") >= self.limit:
+                return False
+            pipeline.multi()
+            pipeline.zremrangebyscore(self.key, "-inf", now)
+            pipeline.zadd(self.key, {holder: now + self.lease_seconds})
+            pipeline.expire(self.key, self.lease_seconds)
+            return True
+
+        return self.connection.transaction(take_slot, self.key, value_from_callable=True)
+
+    def release(self, holder: str):
+        self.connection.zrem(self.key, holder)
+
+    def holders(self) -> List[str]:
+        return [holder.decode() for holder in self.connection.zrangebyscore(self.key, time.time(), "+inf")]
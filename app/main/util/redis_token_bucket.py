@@ -0,0 +1,42 @@
+import math
+import time
+
+import redis
+
+
+class RedisTokenBucket:
+    """
+    Token bucket rate limiter shared between processes through Redis.
+
+    The bucket holds up to `capacity` tokens and refills at `rate` tokens per second. The state is a hash of
+    the number of tokens and the time it was computed at, so no process has to refill it periodically.
+    """
+
+    def __init__(self, connection: redis.Redis, key: str, rate: float, capacity: int):
+        self.connection = connection
+        self.key = key
+        self.rate = rate
+        self.capacity = max(1, capacity)
+
+    def take(self) -> float:
+        """
+        Take a token, without waiting.
+
+        :return: 0 when a token was taken, otherwise the seconds until one is available
+        """
+
+        def take_token(pipeline):
+            now = time.time()
+            tokens, timestamp = pipeline.hmget(self.key, "tokens", "timestamp")
+            tokens = float(tokens) if tokens is not None else self.capacity
+            timestamp = float(timestamp) if timestamp is not None else now
+            tokens = min(self.capacity, tokens + max(0.0, now - timestamp) * self.rate)
+            if tokens < 1:
+                return (1 - tokens) / self.rate
+            pipeline.multi()
+            pipeline.hset(self.key, mapping={"tokens": tokens - 1, "timestamp": now})
+            # a full bucket is the same as no bucket
+            pipeline.expire(self.key, math.ceil(self.capacity / self.rate) + 1)
+            return 0.0
+
+        return self.connection.transaction(take_token, self.key, value_from_callable=True)
@@ -0,0 +1,198 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+import redis
+from flask import Response, current_app, request
+
+from .canonical_json import canonical_hash
+from .redis_connection import get_redis_connection
+
+# scope bumped to invalidate every entry
+GLOBAL_SCOPE = "all"
+
+_cache = None
+_cache_lock = Lock()
+
+
+def _get_generation(connection: redis.Redis, prefix: str, scope: str) -> Optional[str]:
+    try:
+        global_generation, scope_generation = connection.mget(
+            [f"{prefix}:generation:{GLOBAL_SCOPE}", f"{prefix}:generation:{scope}"])
+    except redis.RedisError as e:
+        logging.warning("Could not read cache generation: " + str(e))
+        return None
+    return f"{int(global_generation or 0)}.{int(scope_generation or 0)}"
+
+
+def _invalidate_scopes(connection: redis.Redis, prefix: str, scopes: List[str]):
+    try:
+        pipeline = connection.pipeline()
+        for scope in scopes:
+            pipeline.incr(f"{prefix}:generation:{scope}")
+        pipeline.execute()
+    except redis.RedisError as e:
+        logging.error("Could not invalidate cache scopes " + ", ".join(scopes) + ": " + str(e))
+
+
+class LocalCache:
+    """
+    In-process LRU cache with a TTL per entry.
+
+    Every entry belongs to a scope. Invalidating a scope bumps its generation, which is part of the key of
+    its entries, so they are never looked up again and age out of the LRU.
+    The generations are kept in Redis, so an invalidation made by any process, like an ingestion worker or
+    the outbox relay, reaches the entries of every web worker. Nothing is cached while Redis is unavailable.
+    """
+
+    def __init__(self, max_entries: int, redis_url: str, prefix: str = "stac_cache"):
+        self.max_entries = max(1, max_entries)
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = Lock()
+
+    def generation(self, scope: str) -> Optional[str]:
+        return _get_generation(get_redis_connection(self.redis_url), self.prefix, scope)
+
+    def get(self, key: str) -> Optional[Dict[str, any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, any], ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scopes: List[str]):
+        _invalidate_scopes(get_redis_connection(self.redis_url), self.prefix, scopes)
+
+
+class RedisCache:
+    """
+    Cache stored in Redis, shared by all workers, with the same scopes as LocalCache.
+
+    Entries expire through the Redis TTL. Redis errors are logged and treated as cache misses.
+    """
+
+    def __init__(self, connection: redis.Redis, prefix: str = "stac_cache"):
+        self.connection = connection
+        self.prefix = prefix
+
+    def generation(self, scope: str) -> Optional[str]:
+        return _get_generation(self.connection, self.prefix, scope)
+
+    def get(self, key: str) -> Optional[Dict[str, any]]:
+        try:
+            value = self.connection.get(f"{self.prefix}:{key}")
+        except redis.RedisError as e:
+            logging.warning("Could not read cache entry: " + str(e))
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Dict[str, any], ttl: int):
+        try:
+            self.connection.set(f"{self.prefix}:{key}", json.dumps(value), ex=ttl)
+        except redis.RedisError as e:
+            logging.warning("Could not store cache entry: " + str(e))
+
+    def invalidate(self, scopes: List[str]):
+        _invalidate_scopes(self.connection, self.prefix, scopes)
+
+
+def get_response_cache(config=None) -> Optional[LocalCache or RedisCache]:
+    """
+    Get the response cache configured by STAC_CACHE_BACKEND, or None when caching is disabled.
+
+    :param config: Config to build the cache from, defaults to the config of the current app
+    """
+    global _cache
+    if config is None:
+        config = current_app.config
+    backend = config['STAC_CACHE_BACKEND']
+    if backend == "redis":
+        return RedisCache(get_redis_connection(config['REDIS_URL']))
+    if backend != "local":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LocalCache(config['STAC_CACHE_MAX_ENTRIES'], config['REDIS_URL'])
+    return _cache
+
+
+def invalidate(*scopes: str, config=None):
+    """
+    Invalidate every cached response of the given scopes.
+
+    :param scopes: Scopes to invalidate, GLOBAL_SCOPE invalidates everything
+    :param config: Config of the cache, defaults to the config of the current app
+    """
+    cache = get_response_cache(config)
+    if cache is not None:
+        cache.invalidate(list(scopes))
+
+
+def collection_scope(collection_id: str) -> str:
+    return f"collection:{collection_id}"
+
+
+def cached_response(route: str, scope: Callable[..., str], per_host: bool = False):
+    """
+    Cache the successful responses of a resource method, and answer conditional requests.
+
+    Responses get an ETag computed from their body. A request whose If-None-Match matches it is answered
+    with a 304 and no body. Only responses with status 200 which are not upstream errors are cached, and
+    Response objects, like streamed ones, are returned untouched.
+
+    :param route: Name of the route, its TTL is read from STAC_CACHE_TTL_<ROUTE>
+    :param scope: Function of the view arguments giving the scope of the response, used for invalidation
+    :param per_host: Cache the responses of every host apart, for responses with links to the portal
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            key = None
+            entry = None
+            if cache is not None:
+                generation = cache.generation(scope(**kwargs))
+                if generation is not None:
+                    key = f"{route}:{generation}:{request.full_path}"
+                    if per_host:
+                        key = f"{route}:{generation}:{request.host_url}{request.full_path}"
+                    entry = cache.get(key)
+            if entry is None:
+                result = f(*args, **kwargs)
+                if isinstance(result, Response):
+                    # streamed responses are forwarded as they are
+                    return result
+                body, status = result
+                if status != 200 or not isinstance(body, dict) or "error_code" in body:
+                    return body, status
+                entry = {"body": body, "etag": canonical_hash(body)}
+                if key is not None:
+                    cache.set(key, entry, current_app.config[f"STAC_CACHE_TTL_{route.upper()}"])
+            headers = {"ETag": f'"{entry["etag"]}"', "Cache-Control": "no-cache"}
+            if request.if_none_match.contains(entry["etag"]):
+                return Response(status=304, headers=headers)
+            return entry["body"], 200, headers
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,88 @@
+import json
+import logging
+from typing import Callable, Iterable, Iterator, Optional
+
+import redis
+from flask import Response
+
+EVENT_STREAM_MIMETYPE = "text/event-stream"
+
+
+def format_event(data: any, event: str = None, event_id: any = None) -> str:
+    """
+    Format data as a single Server-Sent Event.
+    """
+    lines = []
+    if event is not None:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_channel(connection: redis.Redis, channel: str, event: str, heartbeat: float,
+                   initial_messages: Callable[[], Iterable[dict]] = lambda: (),
+                   accept: Callable[[dict], bool] = None,
+                   event_id: Callable[[dict], any] = None) -> Iterator[str]:
+    """
+    Relay the JSON messages published on a Redis channel as Server-Sent Events.
+
+    The channel is subscribed to when this is called, and the initial messages are only built afterwards, so
+    nothing published in between is lost. A comment is sent when nothing was published for `heartbeat`
+    seconds, to keep proxies from closing the connection and to notice clients which went away.
+
+    :param connection: Redis connection
+    :param channel: Channel to subscribe to
+    :param event: Name of the sent events
+    :param heartbeat: Seconds between two heartbeats
+    :param initial_messages: Function building the messages sent before the published ones
+    :param accept: Filter of the messages to send
+    :param event_id: Function giving the id of the event of a message
+    """
+    pubsub = connection.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+    try:
+        initial = list(initial_messages())
+    except Exception:
+        pubsub.close()
+        raise
+
+    def events() -> Iterator[str]:
+        try:
+            for message in initial:
+                yield format_event(message, event, event_id(message) if event_id else None)
+            while True:
+                published = pubsub.get_message(timeout=heartbeat)
+                if published is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                try:
+                    message = json.loads(published["data"])
+                except (TypeError, ValueError):
+                    logging.warning(f"Ignoring malformed message on {channel}")
+                    continue
+                if accept is None or accept(message):
+                    yield format_event(message, event, event_id(message) if event_id else None)
+        finally:
+            pubsub.close()
+
+    return events()
+
+
+def event_stream_response(events: Iterator[str]) -> Response:
+    return Response(events, mimetype=EVENT_STREAM_MIMETYPE,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def publish(connection: redis.Redis, channel: str, message: dict) -> Optional[int]:
+    """
+    Publish a JSON message, logging instead of raising when Redis is unavailable.
+
+    :return: Number of subscribers which received it
+    """
+    try:
+        return connection.publish(channel, json.dumps(message))
+    except redis.RedisError as e:
+        logging.warning(f"Could not publish on {channel}: " + str(e))
+        return None
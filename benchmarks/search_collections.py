@@ -0,0 +1,113 @@
+"""
+Benchmark of public collection search against a seeded database.
+
+Seeds a benchmark catalog with collections scattered over the globe, then measures the latency of
+public_catalogs_service.search_collections twice: once with the extent indexes dropped inside a
+transaction that is rolled back afterwards, and once with the indexes in place.
+
+Run against a disposable database: FLASK_ENV=dev python3 -m benchmarks.search_collections
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import time
+
+import geoalchemy2
+from shapely.geometry import MultiPolygon, box
+from sqlalchemy.dialects.postgresql import insert
+
+from app.main import create_app, db
+from app.main.model.public_catalogs_model import PublicCatalog, PublicCollection
+from app.main.service import public_catalogs_service
+
+BENCHMARK_CATALOG_URL = "benchmark://search-collections"
+EXTENT_INDEXES = ["idx_public_collections_spatial_extent", "ix_public_collections_temporal_extent_start",
+                  "ix_public_collections_temporal_extent_end"]
+
+
+def remove_benchmark_catalog():
+    """Remove the benchmark catalog, its collections go with it through ON DELETE CASCADE."""
+    PublicCatalog.query.filter_by(url=BENCHMARK_CATALOG_URL).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def seed(number_of_collections: int, rng: random.Random, chunk_size: int = 5000) -> int:
+    """Seed the benchmark catalog, return its id."""
+    remove_benchmark_catalog()
+    catalog = public_catalogs_service.store_new_public_catalog("benchmark", BENCHMARK_CATALOG_URL,
+                                                               "search_collections benchmark",
+                                                               return_as_dict=False)
+    epoch = datetime.datetime(2000, 1, 1)
+    for chunk_start in range(0, number_of_collections, chunk_size):
+        rows = []
+        for i in range(chunk_start, min(chunk_start + chunk_size, number_of_collections)):
+            min_x, min_y = rng.uniform(-180, 175), rng.uniform(-90, 85)
+            start = epoch + datetime.timedelta(days=rng.randint(0, 8000))
+            rows.append({
+                "id": f"benchmark-collection-{i}",
+                "type": "Collection",
+                "title": f"Benchmark collection {i}",
+                "description": "",
+                "temporal_extent_start": start,
+                "temporal_extent_end": start + datetime.timedelta(days=rng.randint(1, 1000)),
+                "spatial_extent": geoalchemy2.shape.from_shape(
+                    MultiPolygon([box(min_x, min_y, min_x + rng.uniform(0.1, 5), min_y + rng.uniform(0.1, 5))]),
+                    srid=4326),
+                "parent_catalog": catalog.id,
+            })
+        db.session.execute(insert(PublicCollection.__table__).values(rows))
+        db.session.commit()
+    db.session.execute("ANALYZE public_collections")
+    db.session.commit()
+    return catalog.id
+
+
+def measure(catalog_id: int, number_of_searches: int, rng: random.Random) -> dict:
+    """Run random searches, return latency percentiles in milliseconds."""
+    latencies = []
+    for _ in range(number_of_searches):
+        min_x, min_y = rng.uniform(-180, 170), rng.uniform(-90, 80)
+        start = datetime.datetime(2000, 1, 1) + datetime.timedelta(days=rng.randint(0, 8000))
+        interval = f"{start.isoformat()}Z/{(start + datetime.timedelta(days=365)).isoformat()}Z"
+        started = time.perf_counter()
+        public_catalogs_service.search_collections([min_x, min_y, min_x + 10, min_y + 10], interval, catalog_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {"p50_ms": round(quantiles[49], 2), "p99_ms": round(quantiles[98], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collections", type=int, default=100000)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark catalog afterwards")
+    args = parser.parse_args()
+
+    app = create_app(os.getenv('FLASK_ENV') or 'dev')
+    with app.app_context():
+        rng = random.Random(args.seed)
+        catalog_id = seed(args.collections, rng)
+        try:
+            for index in EXTENT_INDEXES:
+                db.session.execute(f"DROP INDEX IF EXISTS {index}")
+            without_indexes = measure(catalog_id, args.searches, random.Random(args.seed))
+        finally:
+            # restores the dropped indexes
+            db.session.rollback()
+        with_indexes = measure(catalog_id, args.searches, random.Random(args.seed))
+        print(json.dumps({
+            "collections": args.collections,
+            "searches": args.searches,
+            "without_indexes": without_indexes,
+            "with_indexes": with_indexes,
+        }, indent=2))
+        if not args.keep:
+            remove_benchmark_catalog()
+
+
+if __name__ == "__main__":
+    main()
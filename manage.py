@@ -1,11 +1,14 @@
 import os
 
+import click
 from flask_cli import FlaskGroup
 from flask_cors import CORS
 from flask_migrate import Migrate
 
 from app import blueprint
 from app.main import create_app, db
+from app.main.service import ingestion_queue_service, refresh_schedule_service, stac_outbox_service, \
+    status_reporting_service
 
 app = create_app(os.getenv('FLASK_ENV') or 'dev')
 app.register_blueprint(blueprint)
@@ -23,5 +26,46 @@ def run():
     app.run(host='0.0.0.0', port=5000)
 
 
+@cli.command("ingestion_worker")
+@click.option("--burst", is_flag=True, help="Stop once the queue is empty")
+def ingestion_worker(burst):
+    """Run a worker processing the queued ingestions."""
+    ingestion_queue_service.run_ingestion_worker(burst)
+
+
+@cli.command("recover_ingestions")
+def recover_ingestions():
+    """Queue again the ingestions interrupted by a crash."""
+    ingestion_queue_service.recover_ingestions()
+
+
+@cli.command("refresh_scheduler")
+@click.option("--once", is_flag=True, help="Run the due schedules once and stop")
+def refresh_scheduler(once):
+    """Run the due refresh schedules of the stored search parameters."""
+    if once:
+        refresh_schedule_service.run_due_refresh_schedules()
+    else:
+        refresh_schedule_service.run_refresh_scheduler()
+
+
+@cli.command("outbox_relay")
+@click.option("--once", is_flag=True, help="Deliver a single batch and stop")
+def outbox_relay(once):
+    """Deliver the private collection writes of the outbox to the STAC API."""
+    if once:
+        stac_outbox_service.relay_stac_outbox()
+    else:
+        stac_outbox_service.run_stac_outbox_relay()
+
+
+@cli.command("prune_statuses")
+@click.option("--days", type=int, default=None, help="Days to keep, defaults to STATUS_RETENTION_DAYS")
+def prune_statuses(days):
+    """Remove the old finished stac ingestion statuses."""
+    removed = status_reporting_service.remove_old_stac_ingestion_statuses(days)
+    click.echo(f"Removed {removed} stac ingestion statuses")
+
+
 if __name__ == '__main__':
     cli()
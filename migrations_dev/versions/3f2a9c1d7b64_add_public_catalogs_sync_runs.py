@@ -0,0 +1,36 @@
+"""add public catalogs sync runs
+
+Revision ID: 3f2a9c1d7b64
+Revises: e1bbc5bcbbbf
+Create Date: 2022-11-07 10:12:31.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b64'
+down_revision = 'e1bbc5bcbbbf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('public_catalogs_sync_runs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('time_started', sa.DateTime(), nullable=True),
+    sa.Column('time_finished', sa.DateTime(), nullable=True),
+    sa.Column('max_workers', sa.Integer(), nullable=True),
+    sa.Column('per_host_limit', sa.Integer(), nullable=True),
+    sa.Column('catalogs_total', sa.Integer(), nullable=True),
+    sa.Column('catalogs_fetched', sa.Integer(), nullable=True),
+    sa.Column('catalogs_skipped', sa.Integer(), nullable=True),
+    sa.Column('catalogs_stored', sa.Integer(), nullable=True),
+    sa.Column('collections_stored', sa.Integer(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('public_catalogs_sync_runs')
@@ -0,0 +1,29 @@
+"""add collection counts to sync runs
+
+Revision ID: 8d41c0e5a2f7
+Revises: 3f2a9c1d7b64
+Create Date: 2022-11-09 15:40:02.118274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8d41c0e5a2f7'
+down_revision = '3f2a9c1d7b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('public_catalogs_sync_runs', sa.Column('collections_inserted', sa.Integer(), nullable=True))
+    op.add_column('public_catalogs_sync_runs', sa.Column('collections_updated', sa.Integer(), nullable=True))
+    op.add_column('public_catalogs_sync_runs', sa.Column('collections_unchanged', sa.Integer(), nullable=True))
+    op.add_column('public_catalogs_sync_runs', sa.Column('collections_pruned', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('public_catalogs_sync_runs', 'collections_pruned')
+    op.drop_column('public_catalogs_sync_runs', 'collections_unchanged')
+    op.drop_column('public_catalogs_sync_runs', 'collections_updated')
+    op.drop_column('public_catalogs_sync_runs', 'collections_inserted')
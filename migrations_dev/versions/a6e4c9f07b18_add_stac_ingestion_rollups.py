@@ -0,0 +1,53 @@
+"""add stac ingestion rollups and status indexes
+
+Revision ID: a6e4c9f07b18
+Revises: f3b8d1c6e2a9
+Create Date: 2022-11-22 15:37:51.274806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a6e4c9f07b18'
+down_revision = 'f3b8d1c6e2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_stac_ingestion_status_time_started', 'stac_ingestion_status', ['time_started'])
+    op.create_index('ix_stac_ingestion_status_unfinished', 'stac_ingestion_status', ['source_stac_api_url'],
+                    postgresql_where=sa.text('time_finished IS NULL'))
+    op.create_table('stac_ingestion_rollups',
+                    sa.Column('source_stac_api_url', sa.Text(), nullable=False),
+                    sa.Column('runs', sa.Integer(), nullable=False),
+                    sa.Column('failures', sa.Integer(), nullable=False),
+                    sa.Column('newly_stored_items_count', sa.BigInteger(), nullable=False),
+                    sa.Column('updated_items_count', sa.BigInteger(), nullable=False),
+                    sa.Column('total_duration_seconds', sa.Float(), nullable=False),
+                    sa.Column('last_time_finished', sa.DateTime(), nullable=True),
+                    sa.ForeignKeyConstraint(['source_stac_api_url'], ['public_catalogs.url'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('source_stac_api_url')
+                    )
+    # build the rollups of the ingestions finished so far
+    op.execute("""
+        INSERT INTO stac_ingestion_rollups (source_stac_api_url, runs, failures, newly_stored_items_count,
+                                            updated_items_count, total_duration_seconds, last_time_finished)
+        SELECT source_stac_api_url,
+               count(*),
+               count(*) FILTER (WHERE coalesce(error_message, '') <> ''),
+               coalesce(sum(newly_stored_items_count), 0),
+               coalesce(sum(updated_items_count), 0),
+               coalesce(sum(extract(epoch FROM time_finished - time_started)), 0),
+               max(time_finished)
+        FROM stac_ingestion_status
+        WHERE time_finished IS NOT NULL AND source_stac_api_url IS NOT NULL
+        GROUP BY source_stac_api_url
+    """)
+
+
+def downgrade():
+    op.drop_table('stac_ingestion_rollups')
+    op.drop_index('ix_stac_ingestion_status_unfinished', table_name='stac_ingestion_status')
+    op.drop_index('ix_stac_ingestion_status_time_started', table_name='stac_ingestion_status')
@@ -0,0 +1,42 @@
+"""add stac outbox
+
+Revision ID: a9d2e6f4b8c1
+Revises: f6b1d8e4c3a7
+Create Date: 2022-11-28 09:51:14.602735
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'a9d2e6f4b8c1'
+down_revision = 'f6b1d8e4c3a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stac_outbox',
+                    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+                    sa.Column('operation', sa.Text(), nullable=False),
+                    sa.Column('collection_id', sa.Text(), nullable=False),
+                    sa.Column('payload', postgresql.JSONB(), nullable=True),
+                    sa.Column('state', sa.Text(), nullable=False),
+                    sa.Column('attempts', sa.Integer(), nullable=False),
+                    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+                    sa.Column('time_created', sa.DateTime(), nullable=False),
+                    sa.Column('time_delivered', sa.DateTime(), nullable=True),
+                    sa.Column('last_error', sa.Text(), nullable=True),
+                    sa.Column('response', postgresql.JSONB(), nullable=True),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index(op.f('ix_stac_outbox_collection_id'), 'stac_outbox', ['collection_id'])
+    op.create_index('ix_stac_outbox_undelivered', 'stac_outbox', ['next_attempt_at'],
+                    postgresql_where=sa.text("state IN ('pending', 'delivering')"))
+
+
+def downgrade():
+    op.drop_index('ix_stac_outbox_undelivered', table_name='stac_outbox')
+    op.drop_index(op.f('ix_stac_outbox_collection_id'), table_name='stac_outbox')
+    op.drop_table('stac_outbox')
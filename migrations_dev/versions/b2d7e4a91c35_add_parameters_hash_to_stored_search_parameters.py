@@ -0,0 +1,57 @@
+"""add parameters hash to stored search parameters
+
+Revision ID: b2d7e4a91c35
+Revises: a6e4c9f07b18
+Create Date: 2022-11-23 10:05:42.518317
+
+"""
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b2d7e4a91c35'
+down_revision = 'a6e4c9f07b18'
+branch_labels = None
+depends_on = None
+
+
+def _parameters_hash(used_search_parameters: str) -> str:
+    # same as app.main.util.canonical_json.canonical_hash, copied so the migration does not change with the app
+    data = json.loads(used_search_parameters)
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    op.add_column('stored_search_parameters', sa.Column('parameters_hash', sa.Text(), nullable=True))
+    connection = op.get_bind()
+    seen = set()
+    duplicates = []
+    rows = connection.execute(sa.text("SELECT id, used_search_parameters FROM stored_search_parameters ORDER BY id"))
+    for row_id, used_search_parameters in rows.fetchall():
+        parameters_hash = _parameters_hash(used_search_parameters)
+        if parameters_hash in seen:
+            # the same search stored with another key order, the oldest row is kept
+            duplicates.append(row_id)
+            continue
+        seen.add(parameters_hash)
+        connection.execute(sa.text("UPDATE stored_search_parameters SET parameters_hash = :hash WHERE id = :id"),
+                           {"hash": parameters_hash, "id": row_id})
+    if duplicates:
+        connection.execute(sa.text("DELETE FROM stored_search_parameters WHERE id = ANY(:ids)"),
+                           {"ids": duplicates})
+    op.alter_column('stored_search_parameters', 'parameters_hash', nullable=False)
+    op.create_unique_constraint('stored_search_parameters_parameters_hash_key', 'stored_search_parameters',
+                                ['parameters_hash'])
+    op.execute("ALTER TABLE stored_search_parameters "
+               "DROP CONSTRAINT IF EXISTS stored_search_parameters_used_search_parameters_key")
+
+
+def downgrade():
+    op.create_unique_constraint('stored_search_parameters_used_search_parameters_key', 'stored_search_parameters',
+                                ['used_search_parameters'])
+    op.drop_constraint('stored_search_parameters_parameters_hash_key', 'stored_search_parameters', type_='unique')
+    op.drop_column('stored_search_parameters', 'parameters_hash')
@@ -0,0 +1,35 @@
+"""add public catalog fingerprints
+
+Revision ID: b7e3f19a0c52
+Revises: 8d41c0e5a2f7
+Create Date: 2022-11-14 09:27:45.630118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f19a0c52'
+down_revision = '8d41c0e5a2f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('public_catalogs', sa.Column('collections_etag', sa.Text(), nullable=True))
+    op.add_column('public_catalogs', sa.Column('collections_last_modified', sa.Text(), nullable=True))
+    op.add_column('public_catalogs', sa.Column('collections_hash', sa.Text(), nullable=True))
+    op.add_column('public_collections', sa.Column('content_hash', sa.Text(), nullable=True))
+    op.add_column('public_catalogs_sync_runs', sa.Column('catalogs_unchanged', sa.Integer(), nullable=True))
+    op.add_column('public_catalogs_sync_runs', sa.Column('lookup_etag', sa.Text(), nullable=True))
+    op.add_column('public_catalogs_sync_runs', sa.Column('lookup_last_modified', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('public_catalogs_sync_runs', 'lookup_last_modified')
+    op.drop_column('public_catalogs_sync_runs', 'lookup_etag')
+    op.drop_column('public_catalogs_sync_runs', 'catalogs_unchanged')
+    op.drop_column('public_collections', 'content_hash')
+    op.drop_column('public_catalogs', 'collections_hash')
+    op.drop_column('public_catalogs', 'collections_last_modified')
+    op.drop_column('public_catalogs', 'collections_etag')
@@ -0,0 +1,36 @@
+"""add collection extent indexes
+
+Revision ID: c4a8e27d91b3
+Revises: b7e3f19a0c52
+Create Date: 2022-11-16 11:05:12.904471
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8e27d91b3'
+down_revision = 'b7e3f19a0c52'
+branch_labels = None
+depends_on = None
+
+# databases made with db.create_all() already have the GiST indexes, hence IF NOT EXISTS
+INDEXES = [
+    ('idx_public_collections_spatial_extent', 'public_collections', 'spatial_extent', 'gist'),
+    ('idx_private_collections_spatial_extent', 'private_collections', 'spatial_extent', 'gist'),
+    ('ix_public_collections_temporal_extent_start', 'public_collections', 'temporal_extent_start', 'btree'),
+    ('ix_public_collections_temporal_extent_end', 'public_collections', 'temporal_extent_end', 'btree'),
+    ('ix_private_collections_temporal_extent_start', 'private_collections', 'temporal_extent_start', 'btree'),
+    ('ix_private_collections_temporal_extent_end', 'private_collections', 'temporal_extent_end', 'btree'),
+]
+
+
+def upgrade():
+    for name, table, column, method in INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING {method} ({column})')
+    op.execute('ANALYZE public_collections')
+    op.execute('ANALYZE private_collections')
+
+
+def downgrade():
+    for name, _, _, _ in reversed(INDEXES):
+        op.execute(f'DROP INDEX IF EXISTS {name}')
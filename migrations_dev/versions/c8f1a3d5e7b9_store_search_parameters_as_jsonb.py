@@ -0,0 +1,39 @@
+"""store search parameters as jsonb
+
+Revision ID: c8f1a3d5e7b9
+Revises: b2d7e4a91c35
+Create Date: 2022-11-23 16:48:19.730254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1a3d5e7b9'
+down_revision = 'b2d7e4a91c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('stored_search_parameters', 'used_search_parameters', type_=postgresql.JSONB(),
+                    postgresql_using='used_search_parameters::jsonb')
+    # the empty string was used for missing values, which is not JSON
+    for column in ('bbox', 'datetime'):
+        op.alter_column('stored_search_parameters', column, type_=postgresql.JSONB(), server_default=None,
+                        postgresql_using=f"NULLIF({column}, '')::jsonb")
+    op.execute("UPDATE stored_search_parameters SET bbox = NULL WHERE bbox = '[]'::jsonb")
+    op.create_index('ix_stored_search_parameters_used_search_parameters', 'stored_search_parameters',
+                    ['used_search_parameters'], postgresql_using='gin',
+                    postgresql_ops={'used_search_parameters': 'jsonb_path_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_stored_search_parameters_used_search_parameters', table_name='stored_search_parameters')
+    op.alter_column('stored_search_parameters', 'used_search_parameters', type_=sa.Text(),
+                    postgresql_using='used_search_parameters::text')
+    op.alter_column('stored_search_parameters', 'bbox', type_=sa.Text(),
+                    postgresql_using="coalesce(bbox::text, '[]')")
+    op.alter_column('stored_search_parameters', 'datetime', type_=sa.Text(),
+                    postgresql_using="coalesce(datetime::text, '')")
@@ -0,0 +1,32 @@
+"""add state to stac ingestion status
+
+Revision ID: d4a9b2c6f1e3
+Revises: c8f1a3d5e7b9
+Create Date: 2022-11-24 11:12:36.904118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9b2c6f1e3'
+down_revision = 'c8f1a3d5e7b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('stac_ingestion_status', sa.Column('state', sa.Text(), nullable=True))
+    op.add_column('stac_ingestion_status', sa.Column('time_queued', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE stac_ingestion_status
+        SET time_queued = time_started,
+            state = CASE WHEN time_finished IS NULL THEN 'running'
+                         WHEN coalesce(error_message, '') <> '' THEN 'failed'
+                         ELSE 'finished' END
+    """)
+
+
+def downgrade():
+    op.drop_column('stac_ingestion_status', 'time_queued')
+    op.drop_column('stac_ingestion_status', 'state')
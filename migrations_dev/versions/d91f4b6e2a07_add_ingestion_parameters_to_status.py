@@ -0,0 +1,23 @@
+"""add ingestion parameters to stac ingestion status
+
+Revision ID: d91f4b6e2a07
+Revises: c4a8e27d91b3
+Create Date: 2022-11-17 09:41:26.518332
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd91f4b6e2a07'
+down_revision = 'c4a8e27d91b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('stac_ingestion_status', sa.Column('ingestion_parameters', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('stac_ingestion_status', 'ingestion_parameters')
@@ -0,0 +1,23 @@
+"""add covered search parameters to stac ingestion status
+
+Revision ID: e5c2a7d3f914
+Revises: d91f4b6e2a07
+Create Date: 2022-11-18 14:22:07.145563
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e5c2a7d3f914'
+down_revision = 'd91f4b6e2a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('stac_ingestion_status', sa.Column('covered_search_parameters', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('stac_ingestion_status', 'covered_search_parameters')
@@ -0,0 +1,30 @@
+"""add dedup key to stac ingestion status
+
+Revision ID: e7c3f5a8b2d6
+Revises: d4a9b2c6f1e3
+Create Date: 2022-11-24 17:40:02.361975
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3f5a8b2d6'
+down_revision = 'd4a9b2c6f1e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('stac_ingestion_status', sa.Column('dedup_key', sa.Text(), nullable=True))
+    op.add_column('stac_ingestion_status', sa.Column('dedup_expires', sa.DateTime(), nullable=True))
+    op.add_column('stac_ingestion_status', sa.Column('coalesced_requests', sa.Integer(), nullable=True))
+    op.create_index('ix_stac_ingestion_status_dedup_key', 'stac_ingestion_status', ['dedup_key'], unique=True,
+                    postgresql_where=sa.text('time_finished IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_stac_ingestion_status_dedup_key', table_name='stac_ingestion_status')
+    op.drop_column('stac_ingestion_status', 'coalesced_requests')
+    op.drop_column('stac_ingestion_status', 'dedup_expires')
+    op.drop_column('stac_ingestion_status', 'dedup_key')
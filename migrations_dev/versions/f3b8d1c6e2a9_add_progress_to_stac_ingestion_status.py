@@ -0,0 +1,31 @@
+"""add progress to stac ingestion status
+
+Revision ID: f3b8d1c6e2a9
+Revises: e5c2a7d3f914
+Create Date: 2022-11-21 10:48:33.902614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d1c6e2a9'
+down_revision = 'e5c2a7d3f914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('stac_ingestion_status', sa.Column('items_processed', sa.Integer(), nullable=True))
+    op.add_column('stac_ingestion_status', sa.Column('items_total', sa.Integer(), nullable=True))
+    op.add_column('stac_ingestion_status', sa.Column('items_per_second', sa.Float(), nullable=True))
+    op.add_column('stac_ingestion_status', sa.Column('estimated_time_finished', sa.DateTime(), nullable=True))
+    op.add_column('stac_ingestion_status', sa.Column('time_updated', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('stac_ingestion_status', 'time_updated')
+    op.drop_column('stac_ingestion_status', 'estimated_time_finished')
+    op.drop_column('stac_ingestion_status', 'items_per_second')
+    op.drop_column('stac_ingestion_status', 'items_total')
+    op.drop_column('stac_ingestion_status', 'items_processed')
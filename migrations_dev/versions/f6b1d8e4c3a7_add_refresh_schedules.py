@@ -0,0 +1,65 @@
+"""add refresh schedules
+
+Revision ID: f6b1d8e4c3a7
+Revises: e7c3f5a8b2d6
+Create Date: 2022-11-25 10:26:53.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'f6b1d8e4c3a7'
+down_revision = 'e7c3f5a8b2d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('stored_search_parameters', sa.Column('upstream_updated', sa.Text(), nullable=True))
+    op.create_table('refresh_schedules',
+                    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+                    sa.Column('public_catalog_id', sa.Integer(), nullable=True),
+                    sa.Column('stored_search_parameters_id', sa.Integer(), nullable=True),
+                    sa.Column('cron', sa.Text(), nullable=False),
+                    sa.Column('window_seconds', sa.Integer(), nullable=False),
+                    sa.Column('enabled', sa.Boolean(), nullable=False),
+                    sa.Column('next_run_at', sa.DateTime(), nullable=True),
+                    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+                    sa.Column('added_on', sa.DateTime(), nullable=False),
+                    sa.ForeignKeyConstraint(['public_catalog_id'], ['public_catalogs.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['stored_search_parameters_id'], ['stored_search_parameters.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index(op.f('ix_refresh_schedules_public_catalog_id'), 'refresh_schedules', ['public_catalog_id'])
+    op.create_index(op.f('ix_refresh_schedules_stored_search_parameters_id'), 'refresh_schedules',
+                    ['stored_search_parameters_id'])
+    op.create_index(op.f('ix_refresh_schedules_next_run_at'), 'refresh_schedules', ['next_run_at'])
+    op.create_table('refresh_runs',
+                    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+                    sa.Column('schedule_id', sa.Integer(), nullable=False),
+                    sa.Column('time_started', sa.DateTime(), nullable=False),
+                    sa.Column('time_finished', sa.DateTime(), nullable=True),
+                    sa.Column('parameters_scheduled', sa.Integer(), nullable=False),
+                    sa.Column('parameters_skipped', sa.Integer(), nullable=False),
+                    sa.Column('ingestions_succeeded', sa.Integer(), nullable=True),
+                    sa.Column('ingestions_failed', sa.Integer(), nullable=True),
+                    sa.Column('callback_ids', sa.Text(), nullable=True),
+                    sa.Column('upstream_updated', postgresql.JSONB(), nullable=True),
+                    sa.Column('error_message', sa.Text(), nullable=True),
+                    sa.ForeignKeyConstraint(['schedule_id'], ['refresh_schedules.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index(op.f('ix_refresh_runs_schedule_id'), 'refresh_runs', ['schedule_id'])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_refresh_runs_schedule_id'), table_name='refresh_runs')
+    op.drop_table('refresh_runs')
+    op.drop_index(op.f('ix_refresh_schedules_next_run_at'), table_name='refresh_schedules')
+    op.drop_index(op.f('ix_refresh_schedules_stored_search_parameters_id'), table_name='refresh_schedules')
+    op.drop_index(op.f('ix_refresh_schedules_public_catalog_id'), table_name='refresh_schedules')
+    op.drop_table('refresh_schedules')
+    op.drop_column('stored_search_parameters', 'upstream_updated')